@@ -1,41 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
 from datetime import datetime
 import uuid
 
-from core.database import get_supabase
+from core.database import get_db
+from core.engines.base import NotFoundError
+from core.projections import AGENT_COLUMNS
 from models.agent import AgentCreate, Agent, AgentUpdate, AgentType, AgentStatus
-from models.conversation import ConversationCreate, Conversation, ConversationStatus
-from services.auth_service import AuthService
+from models.conversation import ChatRequest, ChatTurn, ConversationStatus, ConversationType
+from services.auth_service import Principal, get_principal
 from services.agent_service import AgentService
+from services.agent_counters import success_rate
+from services.agent_cache import agent_cache
+from services.analytics_cache import analytics_cache
+from services.data_version import conditional_get, data_versions
+from services.purge_worker import purge_worker
 
 # Create router
 router = APIRouter()
 
-# Security
-security = HTTPBearer()
-
 # Services
-auth_service = AuthService()
 agent_service = AgentService()
 
 @router.post("/", response_model=Agent, status_code=status.HTTP_201_CREATED)
 async def create_agent(
     agent_data: AgentCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Create a new AI agent"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
         # Validate user owns the agent
         if str(agent_data.user_id) != user_id:
@@ -44,7 +38,7 @@ async def create_agent(
                 detail="Cannot create agent for another user"
             )
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Create agent record
         agent_id = str(uuid.uuid4())
@@ -60,7 +54,9 @@ async def create_agent(
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('agents').insert(agent_record).execute()
+        result = await db.table('agents').insert(agent_record).execute()
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -79,7 +75,10 @@ async def create_agent(
             config=created_agent['config'],
             status=AgentStatus(created_agent['status']),
             created_at=datetime.fromisoformat(created_agent['created_at']),
-            updated_at=datetime.fromisoformat(created_agent['updated_at']) if created_agent['updated_at'] else None
+            updated_at=datetime.fromisoformat(created_agent['updated_at']) if created_agent['updated_at'] else None,
+            last_active=datetime.fromisoformat(created_agent['last_active']) if created_agent.get('last_active') else None,
+            total_conversations=created_agent.get('total_conversations') or 0,
+            success_rate=success_rate(created_agent)
         )
         
     except HTTPException:
@@ -90,24 +89,16 @@ async def create_agent(
             detail=f"Failed to create agent: {str(e)}"
         )
 
-@router.get("/", response_model=List[Agent])
-async def get_user_agents(credentials: HTTPAuthorizationCredentials = Depends(security)):
+@router.get("/", response_model=List[Agent], dependencies=[Depends(conditional_get)])
+async def get_user_agents(principal: Principal = Depends(get_principal)):
     """Get all agents for the current user"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        db = get_db()
         
         # Get user's agents
-        result = supabase.table('agents').select('*').eq('user_id', user_id).execute()
+        result = await db.table('agents').select(AGENT_COLUMNS).eq('user_id', user_id).neq('status', AgentStatus.DELETED.value).execute()
         
         agents = []
         for agent_data in result.data:
@@ -120,7 +111,10 @@ async def get_user_agents(credentials: HTTPAuthorizationCredentials = Depends(se
                 config=agent_data['config'],
                 status=AgentStatus(agent_data['status']),
                 created_at=datetime.fromisoformat(agent_data['created_at']),
-                updated_at=datetime.fromisoformat(agent_data['updated_at']) if agent_data['updated_at'] else None
+                updated_at=datetime.fromisoformat(agent_data['updated_at']) if agent_data['updated_at'] else None,
+                last_active=datetime.fromisoformat(agent_data['last_active']) if agent_data.get('last_active') else None,
+                total_conversations=agent_data.get('total_conversations') or 0,
+                success_rate=success_rate(agent_data)
             )
             agents.append(agent)
         
@@ -137,33 +131,21 @@ async def get_user_agents(credentials: HTTPAuthorizationCredentials = Depends(se
 @router.get("/{agent_id}", response_model=Agent)
 async def get_agent(
     agent_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Get a specific agent by ID"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        user_id = principal.user_id
         
         # Get agent
-        result = supabase.table('agents').select('*').eq('id', agent_id).execute()
+        agent_data = await agent_cache.get(agent_id)
         
-        if not result.data:
+        if not agent_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        agent_data = result.data[0]
-        
         # Check if user owns the agent
         if agent_data['user_id'] != user_id:
             raise HTTPException(
@@ -180,7 +162,10 @@ async def get_agent(
             config=agent_data['config'],
             status=AgentStatus(agent_data['status']),
             created_at=datetime.fromisoformat(agent_data['created_at']),
-            updated_at=datetime.fromisoformat(agent_data['updated_at']) if agent_data['updated_at'] else None
+            updated_at=datetime.fromisoformat(agent_data['updated_at']) if agent_data['updated_at'] else None,
+            last_active=datetime.fromisoformat(agent_data['last_active']) if agent_data.get('last_active') else None,
+            total_conversations=agent_data.get('total_conversations') or 0,
+            success_rate=success_rate(agent_data)
         )
         
     except HTTPException:
@@ -195,33 +180,23 @@ async def get_agent(
 async def update_agent(
     agent_id: str,
     agent_update: AgentUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Update an agent"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if agent exists and user owns it
-        result = supabase.table('agents').select('*').eq('id', agent_id).execute()
+        agent_data = await agent_cache.get(agent_id)
         
-        if not result.data:
+        if not agent_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        agent_data = result.data[0]
-        
         if agent_data['user_id'] != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -242,7 +217,10 @@ async def update_agent(
         update_data['updated_at'] = datetime.utcnow().isoformat()
         
         # Update agent
-        result = supabase.table('agents').update(update_data).eq('id', agent_id).execute()
+        result = await db.table('agents').update(update_data).eq('id', agent_id).execute()
+        await agent_cache.invalidate(agent_id)
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -261,7 +239,10 @@ async def update_agent(
             config=updated_agent['config'],
             status=AgentStatus(updated_agent['status']),
             created_at=datetime.fromisoformat(updated_agent['created_at']),
-            updated_at=datetime.fromisoformat(updated_agent['updated_at']) if updated_agent['updated_at'] else None
+            updated_at=datetime.fromisoformat(updated_agent['updated_at']) if updated_agent['updated_at'] else None,
+            last_active=datetime.fromisoformat(updated_agent['last_active']) if updated_agent.get('last_active') else None,
+            total_conversations=updated_agent.get('total_conversations') or 0,
+            success_rate=success_rate(updated_agent)
         )
         
     except HTTPException:
@@ -272,46 +253,43 @@ async def update_agent(
             detail=f"Failed to update agent: {str(e)}"
         )
 
-@router.delete("/{agent_id}")
+@router.delete("/{agent_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_agent(
     agent_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Delete an agent"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if agent exists and user owns it
-        result = supabase.table('agents').select('*').eq('id', agent_id).execute()
+        agent_data = await agent_cache.get(agent_id)
         
-        if not result.data:
+        if not agent_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        agent_data = result.data[0]
-        
         if agent_data['user_id'] != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied"
             )
         
-        # Delete agent
-        supabase.table('agents').delete().eq('id', agent_id).execute()
+        # Soft-delete now; the purge worker removes its data in chunks
+        await db.table('agents').update({
+            'status': AgentStatus.DELETED.value,
+            'updated_at': datetime.utcnow().isoformat()
+        }).eq('id', agent_id).execute()
+        await agent_cache.invalidate(agent_id)
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
+        job = await purge_worker.enqueue('agent', agent_id, user_id)
         
-        return {"message": "Agent deleted successfully"}
+        return {"message": "Agent deletion scheduled", "purge_job_id": job['id']}
         
     except HTTPException:
         raise
@@ -321,65 +299,73 @@ async def delete_agent(
             detail=f"Failed to delete agent: {str(e)}"
         )
 
-@router.post("/{agent_id}/chat", response_model=Conversation)
+@router.post("/{agent_id}/chat", response_model=ChatTurn)
 async def chat_with_agent(
     agent_id: str,
-    conversation_data: ConversationCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    chat_request: ChatRequest,
+    principal: Principal = Depends(get_principal)
 ):
     """Chat with an AI agent"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        # Validate agent exists and user owns it (a cached record is fine:
+        # record_chat_turn checks again against the table)
+        db = get_db()
+        agent_data = await agent_cache.get(agent_id)
         
-        # Validate user owns the conversation
-        if str(conversation_data.user_id) != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cannot create conversation for another user"
-            )
-        
-        # Validate agent exists and user owns it
-        supabase = get_supabase()
-        agent_result = supabase.table('agents').select('*').eq('id', agent_id).execute()
-        
-        if not agent_result.data:
+        if not agent_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Agent not found"
             )
         
-        agent_data = agent_result.data[0]
-        
         if agent_data['user_id'] != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied to agent"
             )
         
-        # Create conversation record
-        conversation_id = str(uuid.uuid4())
+        # Process with agent service
+        started_at = datetime.utcnow().isoformat()
+        response = None
+        error_message = None
+        try:
+            response = await agent_service.process_message(
+                agent_id=agent_id,
+                message=chat_request.message,
+                agent_config=agent_data['config']
+            )
+        except Exception as e:
+            error_message = str(e)
+        
+        # Record the finished turn in one round trip: the procedure re-checks
+        # ownership and inserts the conversation with its final status
         conversation_record = {
-            'id': conversation_id,
+            'id': str(uuid.uuid4()),
             'agent_id': agent_id,
             'user_id': user_id,
-            'message': conversation_data.message,
-            'conversation_type': conversation_data.conversation_type.value,
-            'metadata': conversation_data.metadata,
-            'status': ConversationStatus.PENDING.value,
-            'created_at': datetime.utcnow().isoformat(),
+            'title': chat_request.title or "New Conversation",
+            'conversation_type': chat_request.conversation_type.value,
+            'metadata': chat_request.metadata or {},
+            'message': chat_request.message,
+            'response': response,
+            'error_message': error_message,
+            'status': (ConversationStatus.FAILED if error_message else ConversationStatus.COMPLETED).value,
+            'cost': 0.0,
+            'created_at': started_at,
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        # Insert conversation
-        result = supabase.table('conversations').insert(conversation_record).execute()
+        try:
+            result = await db.rpc('record_chat_turn', {'p_turn': conversation_record}).execute()
+        except NotFoundError:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Agent not found"
+            )
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -387,52 +373,28 @@ async def chat_with_agent(
                 detail="Failed to create conversation"
             )
         
-        # Process with agent service
-        try:
-            response = await agent_service.process_message(
-                agent_id=agent_id,
-                message=conversation_data.message,
-                agent_config=agent_data['config']
-            )
-            
-            # Update conversation with response
-            update_data = {
-                'response': response,
-                'status': ConversationStatus.COMPLETED.value,
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            supabase.table('conversations').update(update_data).eq('id', conversation_id).execute()
-            
-            # Return conversation
-            return Conversation(
-                id=conversation_id,
-                agent_id=agent_id,
-                user_id=user_id,
-                message=conversation_data.message,
-                conversation_type=conversation_data.conversation_type,
-                metadata=conversation_data.metadata,
-                response=response,
-                status=ConversationStatus.COMPLETED,
-                created_at=datetime.fromisoformat(conversation_record['created_at']),
-                updated_at=datetime.utcnow()
-            )
-            
-        except Exception as e:
-            # Update conversation with error
-            update_data = {
-                'status': ConversationStatus.FAILED.value,
-                'error_message': str(e),
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            supabase.table('conversations').update(update_data).eq('id', conversation_id).execute()
-            
+        if error_message:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Agent processing failed: {str(e)}"
+                detail=f"Agent processing failed: {error_message}"
             )
         
+        # Return conversation
+        conversation = result.data[0]
+        return ChatTurn(
+            id=conversation['id'],
+            agent_id=conversation['agent_id'],
+            user_id=conversation['user_id'],
+            title=conversation['title'],
+            conversation_type=ConversationType(conversation['conversation_type']),
+            metadata=conversation['metadata'],
+            message=conversation['message'],
+            response=conversation['response'],
+            status=ConversationStatus(conversation['status']),
+            created_at=datetime.fromisoformat(conversation['created_at']),
+            updated_at=datetime.fromisoformat(conversation['updated_at'])
+        )
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -1,30 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from typing import Optional
 import uuid
 
 from core.config import settings
-from core.database import get_supabase
+from core.database import get_db
+from core.metrics import metrics
+from core.rate_limit import RateLimiter, client_ip
+from core.projections import ID_COLUMNS, LOGIN_COLUMNS
 from models.user import UserCreate, User, UserLogin, UserPasswordReset, UserPasswordChange
-from services.auth_service import AuthService
+from services.auth_service import Principal, auth_service, get_principal
+from services.password_pool import password_pool
+from services.token_revocation import token_denylist
 
 # Create router
 router = APIRouter()
 
-# Security
-security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Auth service
-auth_service = AuthService()
+# Attempt limits, checked before any database query or password hash
+login_ip_limiter = RateLimiter("login_ip", settings.LOGIN_RATE_LIMIT_IP)
+login_email_limiter = RateLimiter("login_email", settings.LOGIN_RATE_LIMIT_EMAIL)
+register_ip_limiter = RateLimiter("register_ip", settings.REGISTER_RATE_LIMIT_IP)
+register_email_limiter = RateLimiter("register_email", settings.REGISTER_RATE_LIMIT_EMAIL)
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, request: Request):
     """Register a new user"""
     try:
+        await register_ip_limiter.check(client_ip(request))
+        await register_email_limiter.check(user_data.email.lower())
+        
         # Validate passwords match
         if user_data.password != user_data.confirm_password:
             raise HTTPException(
@@ -33,8 +38,8 @@ async def register(user_data: UserCreate):
             )
         
         # Check if user already exists
-        supabase = get_supabase()
-        existing_user = supabase.table('users').select('*').eq('email', user_data.email).execute()
+        db = get_db()
+        existing_user = await db.table('users').select(ID_COLUMNS).eq('email', user_data.email).execute()
         
         if existing_user.data:
             raise HTTPException(
@@ -43,7 +48,7 @@ async def register(user_data: UserCreate):
             )
         
         # Hash password
-        hashed_password = pwd_context.hash(user_data.password)
+        hashed_password = await password_pool.hash(user_data.password)
         
         # Create user
         user_id = str(uuid.uuid4())
@@ -61,7 +66,7 @@ async def register(user_data: UserCreate):
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('users').insert(user_record).execute()
+        result = await db.table('users').insert(user_record).execute()
         
         if not result.data:
             raise HTTPException(
@@ -93,13 +98,16 @@ async def register(user_data: UserCreate):
         )
 
 @router.post("/login")
-async def login(user_credentials: UserLogin):
+async def login(user_credentials: UserLogin, request: Request):
     """Login user and return access token"""
     try:
-        supabase = get_supabase()
+        await login_ip_limiter.check(client_ip(request))
+        await login_email_limiter.check(user_credentials.email.lower())
+        
+        db = get_db()
         
         # Get user by email
-        result = supabase.table('users').select('*').eq('email', user_credentials.email).execute()
+        result = await db.table('users').select(LOGIN_COLUMNS).eq('email', user_credentials.email).execute()
         
         if not result.data:
             raise HTTPException(
@@ -109,8 +117,9 @@ async def login(user_credentials: UserLogin):
         
         user = result.data[0]
         
-        # Verify password
-        if not pwd_context.verify(user_credentials.password, user['hashed_password']):
+        # Verify password (and rehash it if the bcrypt cost has changed)
+        valid, new_hash = await password_pool.verify_and_update(user_credentials.password, user['hashed_password'])
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
@@ -123,15 +132,20 @@ async def login(user_credentials: UserLogin):
                 detail="Account is deactivated"
             )
         
+        # Only failed attempts count against the email
+        await login_email_limiter.reset(user_credentials.email.lower())
+        
         # Generate access token
         access_token = auth_service.create_access_token(
             data={"sub": user['email'], "user_id": user['id']}
         )
         
         # Update last login
-        supabase.table('users').update({
-            'last_login': datetime.utcnow().isoformat()
-        }).eq('id', user['id']).execute()
+        login_update = {'last_login': datetime.utcnow().isoformat()}
+        if new_hash:
+            login_update['hashed_password'] = new_hash
+            metrics.increment("auth.passwords_rehashed")
+        await db.table('users').update(login_update).eq('id', user['id']).execute()
         
         return {
             "access_token": access_token,
@@ -157,27 +171,29 @@ async def login(user_credentials: UserLogin):
         )
 
 @router.post("/refresh")
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Refresh access token"""
+async def refresh_token(principal: Principal = Depends(get_principal)):
+    """Refresh access token (the old one is revoked)"""
     try:
-        token = credentials.credentials
-        payload = auth_service.decode_token(token)
+        if principal.api_key_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="API keys cannot be refreshed"
+            )
         
         # Generate new token
         new_token = auth_service.create_access_token(
-            data={"sub": payload.get("sub"), "user_id": payload.get("user_id")}
+            data={"sub": principal.claims.get("sub"), "user_id": principal.user_id}
         )
+        await token_denylist.revoke(principal.token, principal.claims["exp"], principal.user_id)
+        auth_service.forget_token(principal.token)
         
         return {
             "access_token": new_token,
             "token_type": "bearer"
         }
         
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -185,9 +201,20 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Depends(secu
         )
 
 @router.post("/logout")
-async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Logout user (token invalidation would be handled client-side)"""
-    return {"message": "Successfully logged out"}
+async def logout(principal: Principal = Depends(get_principal)):
+    """Logout user (the access token is revoked until it expires)"""
+    try:
+        if not principal.api_key_id:
+            await token_denylist.revoke(principal.token, principal.claims["exp"], principal.user_id)
+            auth_service.forget_token(principal.token)
+        
+        return {"message": "Successfully logged out"}
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Logout failed: {str(e)}"
+        )
 
 @router.post("/forgot-password")
 async def forgot_password(user_data: UserPasswordReset):
@@ -202,29 +229,17 @@ async def reset_password(token: str, new_password: str):
     return {"message": "Password reset successful"}
 
 @router.get("/me", response_model=User)
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(principal: Principal = Depends(get_principal)):
     """Get current authenticated user"""
     try:
-        token = credentials.credentials
-        payload = auth_service.decode_token(token)
-        user_id = payload.get("user_id")
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user = await principal.user()
         
-        supabase = get_supabase()
-        result = supabase.table('users').select('*').eq('id', user_id).execute()
-        
-        if not result.data:
+        if user is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        user = result.data[0]
         return User(
             id=user['id'],
             email=user['email'],
@@ -1,47 +1,133 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, List, Optional, Union
+from datetime import datetime, timedelta, timezone
+import asyncio
 import uuid
 
-from core.database import get_supabase
+from core.config import settings
+from core.database import get_db
+from core.pagination import decode_cursor, next_cursor
+from core.projections import (
+    ID_COLUMNS,
+    CONVERSATION_COLUMNS,
+    CONVERSATION_STATE_COLUMNS,
+    CONVERSATION_ARCHIVE_COLUMNS,
+    MESSAGE_COLUMNS
+)
 from models.conversation import (
     ConversationCreate, 
     ConversationUpdate, 
     Conversation, 
     ConversationStatus,
     ConversationType,
-    ChatMessage
+    ChatMessage,
+    MessageBatchCreate,
+    MessageBatchItemResult,
+    MessageBatchResult
 )
-from services.auth_service import AuthService
+from schemas.common import PaginatedResponse
+from services.agent_cache import agent_cache
+from services.agent_counters import agent_counters
+from services.analytics_cache import analytics_cache
+from services.data_version import conditional_get, data_versions
+from services.negative_cache import negative_cache
+from services.auth_service import Principal, get_principal
+from services.conversation_archive import conversation_archive
+from services.message_buffer import message_buffer, insert_messages
 
 # Create router
 router = APIRouter()
 
-# Security
-security = HTTPBearer()
+# Keyset sort keys
+CONVERSATION_KEYSET = ['updated_at', 'id']
+MESSAGE_KEYSET = ['timestamp', 'id']
+
+def _decode_cursor(cursor: str, keyset: List[str]) -> List[Any]:
+    """Decode a pagination cursor or reject it with a 400"""
+    try:
+        return decode_cursor(cursor, len(keyset))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _message_timestamp(value: Optional[str], default: datetime) -> str:
+    """Parse a client-supplied ISO timestamp into the naive UTC form stored for messages"""
+    if not value:
+        return default.isoformat()
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+async def _find_conversation(db, conversation_id: str, user_id: str, columns: str) -> dict:
+    """The user's conversation, or 404 (remembered briefly so retries skip the database)"""
+    missing_key = ("conversation", conversation_id, user_id)
+    if negative_cache.is_missing(missing_key):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    result = await db.table('conversations').select(columns).eq('id', conversation_id).eq('user_id', user_id).execute()
+    
+    if not result.data:
+        negative_cache.remember(missing_key)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    return result.data[0]
 
-# Services
-auth_service = AuthService()
+async def _change_status(db, conversation_id: str, user_id: str, update_data: dict) -> dict:
+    """Apply an update that sets the status, keeping the agent's counters in step"""
+    current = await db.table('conversations').select(CONVERSATION_STATE_COLUMNS).eq('id', conversation_id).eq('user_id', user_id).execute()
+    
+    if not current.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+    
+    previous = current.data[0]
+    
+    # Only update from the status just read, so a concurrent change isn't counted twice
+    result = await db.table('conversations').update(update_data).eq('id', conversation_id).eq('user_id', user_id).eq('status', previous['status']).execute()
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Conversation was modified concurrently"
+        )
+    
+    updated = result.data[0]
+    await agent_counters.status_changed(updated['agent_id'], previous['status'], updated['status'], update_data['updated_at'], user_id)
+    await analytics_cache.invalidate(user_id)
+    await data_versions.bump(user_id)
+    if updated['status'] == ConversationStatus.ARCHIVED.value and previous['status'] != updated['status']:
+        conversation_archive.schedule(conversation_id)
+    return updated
 
 @router.post("/", response_model=Conversation, status_code=status.HTTP_201_CREATED)
 async def create_conversation(
     conversation_data: ConversationCreate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Create a new conversation"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
+        
+        # Only the agent's owner may open conversations on it (and move its counters)
+        agent_data = await agent_cache.get(str(conversation_data.agent_id))
         
-        if not user_id:
+        if not agent_data or agent_data['user_id'] != user_id:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Agent not found"
             )
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Create conversation record
         conversation_id = str(uuid.uuid4())
@@ -57,7 +143,7 @@ async def create_conversation(
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('conversations').insert(conversation_record).execute()
+        result = await db.table('conversations').insert(conversation_record).execute()
         
         if not result.data:
             raise HTTPException(
@@ -67,6 +153,11 @@ async def create_conversation(
         
         # Return created conversation
         created_conversation = result.data[0]
+        await agent_counters.conversation_created(
+            created_conversation['agent_id'], created_conversation['status'], created_conversation['created_at'], user_id
+        )
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
         return Conversation(
             id=created_conversation['id'],
             user_id=created_conversation['user_id'],
@@ -87,42 +178,42 @@ async def create_conversation(
             detail=f"Failed to create conversation: {str(e)}"
         )
 
-@router.get("/", response_model=List[Conversation])
+@router.get("/", response_model=Union[List[Conversation], PaginatedResponse], dependencies=[Depends(conditional_get)])
 async def get_conversations(
     agent_id: Optional[str] = Query(None, description="Filter by agent ID"),
-    status: Optional[str] = Query(None, description="Filter by status"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by status"),
     limit: int = Query(50, ge=1, le=100, description="Number of conversations to return"),
     offset: int = Query(0, ge=0, description="Number of conversations to skip"),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    cursor: Optional[str] = Query(None, description="Keyset cursor (empty for the first page); returns a paginated response"),
+    principal: Principal = Depends(get_principal)
 ):
     """Get conversations for the current user"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Build query
-        query = supabase.table('conversations').select('*').eq('user_id', user_id)
+        query = db.table('conversations').select(CONVERSATION_COLUMNS).eq('user_id', user_id)
         
         if agent_id:
             query = query.eq('agent_id', agent_id)
-        if status:
-            query = query.eq('status', status)
-        
-        # Add pagination and ordering
-        result = query.order('updated_at', desc=True).range(offset, offset + limit - 1).execute()
+        if status_filter:
+            query = query.eq('status', status_filter)
+        
+        # Add pagination and ordering (id breaks ties so pages never overlap)
+        query = query.order('updated_at', desc=True).order('id', desc=True)
+        if cursor is None:
+            result = await query.range(offset, offset + limit - 1).execute()
+        else:
+            if cursor:
+                query = query.after(CONVERSATION_KEYSET, _decode_cursor(cursor, CONVERSATION_KEYSET), desc=True)
+            # One extra row tells whether there is a next page
+            result = await query.limit(limit + 1).execute()
         
         # Convert to response models
         conversations = []
-        for conv_data in result.data:
+        for conv_data in result.data[:limit]:
             conversations.append(Conversation(
                 id=conv_data['id'],
                 user_id=conv_data['user_id'],
@@ -135,7 +226,16 @@ async def get_conversations(
                 updated_at=datetime.fromisoformat(conv_data['updated_at'])
             ))
         
-        return conversations
+        if cursor is None:
+            return conversations
+        return PaginatedResponse(
+            status="success",
+            message="Conversations retrieved successfully",
+            timestamp=datetime.utcnow(),
+            data=conversations,
+            per_page=limit,
+            next_cursor=next_cursor(result.data, CONVERSATION_KEYSET, limit)
+        )
         
     except HTTPException:
         raise
@@ -148,30 +248,15 @@ async def get_conversations(
 @router.get("/{conversation_id}", response_model=Conversation)
 async def get_conversation(
     conversation_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Get a specific conversation by ID"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
-        result = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
-        
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
+        db = get_db()
+        conv_data = await _find_conversation(db, conversation_id, user_id, CONVERSATION_COLUMNS)
         
-        conv_data = result.data[0]
         return Conversation(
             id=conv_data['id'],
             user_id=conv_data['user_id'],
@@ -196,30 +281,13 @@ async def get_conversation(
 async def update_conversation(
     conversation_id: str,
     updates: ConversationUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Update a conversation"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
-        
-        # Check if conversation exists and belongs to user
-        existing = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
-        
-        if not existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
+        db = get_db()
         
         # Prepare update data
         update_data = {}
@@ -232,17 +300,21 @@ async def update_conversation(
         
         update_data['updated_at'] = datetime.utcnow().isoformat()
         
-        # Update conversation
-        result = supabase.table('conversations').update(update_data).eq('id', conversation_id).execute()
-        
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update conversation"
-            )
+        if 'status' in update_data:
+            updated_conv = await _change_status(db, conversation_id, user_id, update_data)
+        else:
+            # Update conversation (the user_id filter doubles as the ownership check)
+            result = await db.table('conversations').update(update_data).eq('id', conversation_id).eq('user_id', user_id).execute()
+            
+            if not result.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Conversation not found"
+                )
+            updated_conv = result.data[0]
+            await data_versions.bump(user_id)
         
         # Return updated conversation
-        updated_conv = result.data[0]
         return Conversation(
             id=updated_conv['id'],
             user_id=updated_conv['user_id'],
@@ -266,39 +338,29 @@ async def update_conversation(
 @router.delete("/{conversation_id}")
 async def delete_conversation(
     conversation_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Delete a conversation"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        db = get_db()
         
-        supabase = get_supabase()
-        
-        # Check if conversation exists and belongs to user
-        existing = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
+        # Delete conversation (the user_id filter doubles as the ownership check)
+        result = await db.table('conversations').delete().eq('id', conversation_id).eq('user_id', user_id).execute()
         
-        if not existing.data:
+        if not result.data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Conversation not found"
             )
         
-        # Delete conversation
-        result = supabase.table('conversations').delete().eq('id', conversation_id).execute()
-        
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to delete conversation"
-            )
+        deleted = result.data[0]
+        negative_cache.remember(("conversation", conversation_id, user_id))
+        await agent_counters.conversation_deleted(deleted['agent_id'], deleted['status'], user_id)
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
+        await conversation_archive.discard(deleted.get('archive_key'))
         
         return {"message": "Conversation deleted successfully"}
         
@@ -314,19 +376,11 @@ async def delete_conversation(
 async def add_message(
     conversation_id: str,
     message_data: dict,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Add a message to a conversation"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
         # Validate message data
         role = message_data.get("role", "user")
@@ -345,16 +399,10 @@ async def add_message(
                 detail="Role must be 'user' or 'assistant'"
             )
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if conversation exists and belongs to user
-        existing = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
-        
-        if not existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
+        await _find_conversation(db, conversation_id, user_id, ID_COLUMNS)
         
         # Create message record
         message_id = str(uuid.uuid4())
@@ -367,7 +415,15 @@ async def add_message(
             'timestamp': datetime.utcnow().isoformat()
         }
         
-        result = supabase.table('messages').insert(message_record).execute()
+        if settings.MESSAGE_BUFFER_ENABLED:
+            # Write-behind: the insert, the updated_at bump and the data version bump happen in the next flush
+            await message_buffer.add(message_record, user_id)
+            return {
+                "message": "Message added successfully",
+                "message_id": message_id
+            }
+        
+        result = await db.table('messages').insert(message_record).execute()
         
         if not result.data:
             raise HTTPException(
@@ -376,9 +432,10 @@ async def add_message(
             )
         
         # Update conversation timestamp
-        supabase.table('conversations').update({
+        await db.table('conversations').update({
             'updated_at': datetime.utcnow().isoformat()
         }).eq('id', conversation_id).execute()
+        await data_versions.bump(user_id)
         
         return {
             "message": "Message added successfully",
@@ -393,41 +450,145 @@ async def add_message(
             detail=f"Failed to add message: {str(e)}"
         )
 
+@router.post("/{conversation_id}/messages/batch", response_model=MessageBatchResult)
+async def add_messages_batch(
+    conversation_id: str,
+    batch: MessageBatchCreate,
+    principal: Principal = Depends(get_principal)
+):
+    """Append many messages to a conversation in one call"""
+    try:
+        user_id = principal.user_id
+        
+        if len(batch.messages) > settings.MESSAGE_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.MESSAGE_BATCH_MAX_ITEMS} messages per batch"
+            )
+        
+        db = get_db()
+        
+        # One ownership check for the whole batch
+        await _find_conversation(db, conversation_id, user_id, ID_COLUMNS)
+        
+        # Validate each item on its own so one bad message doesn't reject the batch
+        received_at = datetime.utcnow()
+        results = []
+        rows = []
+        for index, item in enumerate(batch.messages):
+            role = item.get("role", "user")
+            content = item.get("content", "")
+            metadata = item.get("metadata") or {}
+            
+            error = None
+            if not content or not isinstance(content, str):
+                error = "Message content is required"
+            elif role not in ["user", "assistant"]:
+                error = "Role must be 'user' or 'assistant'"
+            elif not isinstance(metadata, dict):
+                error = "Metadata must be an object"
+            
+            timestamp = None
+            if error is None:
+                try:
+                    # Imported history keeps its own timestamps; new items keep their batch order
+                    timestamp = _message_timestamp(item.get("timestamp"), received_at + timedelta(microseconds=index))
+                except (TypeError, ValueError):
+                    error = "Timestamp must be an ISO 8601 string"
+            
+            if error is not None:
+                results.append(MessageBatchItemResult(index=index, status="failed", error=error))
+                continue
+            
+            message_id = str(uuid.uuid4())
+            rows.append({
+                'id': message_id,
+                'conversation_id': conversation_id,
+                'role': role,
+                'content': content,
+                'metadata': metadata,
+                'timestamp': timestamp
+            })
+            results.append(MessageBatchItemResult(index=index, status="created", message_id=message_id))
+        
+        # Chunked multi-row inserts
+        failures = await insert_messages(db, rows, settings.MESSAGE_BATCH_CHUNK_SIZE) if rows else {}
+        for result in results:
+            if result.message_id in failures:
+                result.status = "failed"
+                result.error = f"Failed to add message: {failures[result.message_id]}"
+                result.message_id = None
+        
+        created = sum(1 for result in results if result.status == "created")
+        
+        # Single conversation timestamp update
+        if created:
+            await db.table('conversations').update({
+                'updated_at': datetime.utcnow().isoformat()
+            }).eq('id', conversation_id).execute()
+            await data_versions.bump(user_id)
+        
+        return MessageBatchResult(
+            conversation_id=conversation_id,
+            created=created,
+            failed=len(results) - created,
+            results=results
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to add messages: {str(e)}"
+        )
+
 @router.get("/{conversation_id}/messages")
 async def get_conversation_messages(
     conversation_id: str,
     limit: int = Query(100, ge=1, le=200, description="Number of messages to return"),
     offset: int = Query(0, ge=0, description="Number of messages to skip"),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    cursor: Optional[str] = Query(None, description="Keyset cursor (empty for the first page); returns a paginated response"),
+    principal: Principal = Depends(get_principal)
 ):
     """Get messages for a conversation"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if conversation exists and belongs to user
-        existing = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
-        
-        if not existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
-        
-        # Get messages
-        result = supabase.table('messages').select('*').eq('conversation_id', conversation_id).order('timestamp', desc=False).range(offset, offset + limit - 1).execute()
+        existing = await _find_conversation(db, conversation_id, user_id, CONVERSATION_ARCHIVE_COLUMNS)
+        
+        # Make queued messages visible to their own conversation
+        if settings.MESSAGE_BUFFER_ENABLED and message_buffer.has_pending(conversation_id):
+            await message_buffer.flush()
+        
+        archive_key = existing['archive_key']
+        if archive_key:
+            # Archived: page through the cold copy (plus any messages added since)
+            rows = await conversation_archive.read(conversation_id, archive_key)
+            if cursor is None:
+                rows = rows[offset:offset + limit]
+            else:
+                if cursor:
+                    after = _decode_cursor(cursor, MESSAGE_KEYSET)
+                    rows = [row for row in rows if [row[column] for column in MESSAGE_KEYSET] > after]
+                rows = rows[:limit + 1]
+        else:
+            # Get messages (id breaks ties so pages never overlap)
+            query = db.table('messages').select(MESSAGE_COLUMNS).eq('conversation_id', conversation_id).order('timestamp', desc=False).order('id', desc=False)
+            if cursor is None:
+                result = await query.range(offset, offset + limit - 1).execute()
+            else:
+                if cursor:
+                    query = query.after(MESSAGE_KEYSET, _decode_cursor(cursor, MESSAGE_KEYSET))
+                # One extra row tells whether there is a next page
+                result = await query.limit(limit + 1).execute()
+            rows = result.data
         
         messages = []
-        for msg_data in result.data:
+        for msg_data in rows[:limit]:
             messages.append(ChatMessage(
                 role=msg_data['role'],
                 content=msg_data['content'],
@@ -435,7 +596,16 @@ async def get_conversation_messages(
                 metadata=msg_data.get('metadata', {})
             ))
         
-        return messages
+        if cursor is None:
+            return messages
+        return PaginatedResponse(
+            status="success",
+            message="Messages retrieved successfully",
+            timestamp=datetime.utcnow(),
+            data=messages,
+            per_page=limit,
+            next_cursor=next_cursor(rows, MESSAGE_KEYSET, limit)
+        )
         
     except HTTPException:
         raise
@@ -448,49 +618,56 @@ async def get_conversation_messages(
 @router.post("/{conversation_id}/complete")
 async def complete_conversation(
     conversation_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Mark a conversation as completed"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        db = get_db()
         
-        supabase = get_supabase()
+        # Update conversation status
+        await _change_status(db, conversation_id, user_id, {
+            'status': ConversationStatus.COMPLETED.value,
+            'updated_at': datetime.utcnow().isoformat()
+        })
         
-        # Check if conversation exists and belongs to user
-        existing = supabase.table('conversations').select('*').eq('id', conversation_id).eq('user_id', user_id).execute()
+        return {"message": "Conversation marked as completed"}
         
-        if not existing.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to complete conversation: {str(e)}"
+        )
+
+@router.post("/{conversation_id}/archive")
+async def archive_conversation(
+    conversation_id: str,
+    principal: Principal = Depends(get_principal)
+):
+    """Archive a conversation and move its messages to cold storage"""
+    try:
+        user_id = principal.user_id
+        
+        db = get_db()
         
         # Update conversation status
-        result = supabase.table('conversations').update({
-            'status': ConversationStatus.COMPLETED.value,
+        await _change_status(db, conversation_id, user_id, {
+            'status': ConversationStatus.ARCHIVED.value,
             'updated_at': datetime.utcnow().isoformat()
-        }).eq('id', conversation_id).execute()
+        })
         
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to complete conversation"
-            )
+        # Wait for the messages to move (shielded: a dropped client doesn't stop it)
+        archived = await asyncio.shield(conversation_archive.schedule(conversation_id))
         
-        return {"message": "Conversation marked as completed"}
+        return {"message": "Conversation archived", "archived_messages": archived}
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to complete conversation: {str(e)}"
+            detail=f"Failed to archive conversation: {str(e)}"
         )
@@ -1,41 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Dict, Any
 from datetime import datetime
 import uuid
 
-from core.database import get_supabase
-from services.auth_service import AuthService
+from core.database import get_db
+from core.projections import ID_COLUMNS
+from services.auth_service import Principal, get_principal
+from services.integration_cache import get_user_integrations, integration_cache
 
 # Create router
 router = APIRouter()
 
-# Security
-security = HTTPBearer()
-
-# Services
-auth_service = AuthService()
-
 @router.get("/")
-async def get_integrations(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_integrations(principal: Principal = Depends(get_principal)):
     """Get all integrations for the current user"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        user_id = principal.user_id
         
         # Get user's integrations
-        result = supabase.table('integrations').select('*').eq('user_id', user_id).execute()
-        
-        return result.data or []
+        return await get_user_integrations(user_id)
         
     except HTTPException:
         raise
@@ -48,29 +31,21 @@ async def get_integrations(credentials: HTTPAuthorizationCredentials = Depends(s
 @router.post("/slack")
 async def configure_slack_integration(
     config: Dict[str, Any],
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Configure Slack integration"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if integration already exists
-        existing = supabase.table('integrations').select('*').eq('user_id', user_id).eq('platform', 'slack').execute()
+        existing = await db.table('integrations').select(ID_COLUMNS).eq('user_id', user_id).eq('platform', 'slack').execute()
         
         if existing.data:
             # Update existing integration
             integration_id = existing.data[0]['id']
-            result = supabase.table('integrations').update({
+            result = await db.table('integrations').update({
                 'config': config,
                 'status': 'active',
                 'updated_at': datetime.utcnow().isoformat()
@@ -78,7 +53,7 @@ async def configure_slack_integration(
         else:
             # Create new integration
             integration_id = str(uuid.uuid4())
-            result = supabase.table('integrations').insert({
+            result = await db.table('integrations').insert({
                 'id': integration_id,
                 'user_id': user_id,
                 'platform': 'slack',
@@ -87,6 +62,7 @@ async def configure_slack_integration(
                 'created_at': datetime.utcnow().isoformat(),
                 'updated_at': datetime.utcnow().isoformat()
             }).execute()
+        await integration_cache.invalidate(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -107,29 +83,21 @@ async def configure_slack_integration(
 @router.post("/google-sheets")
 async def configure_google_sheets_integration(
     config: Dict[str, Any],
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Configure Google Sheets integration"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if integration already exists
-        existing = supabase.table('integrations').select('*').eq('user_id', user_id).eq('platform', 'google_sheets').execute()
+        existing = await db.table('integrations').select(ID_COLUMNS).eq('user_id', user_id).eq('platform', 'google_sheets').execute()
         
         if existing.data:
             # Update existing integration
             integration_id = existing.data[0]['id']
-            result = supabase.table('integrations').update({
+            result = await db.table('integrations').update({
                 'config': config,
                 'status': 'active',
                 'updated_at': datetime.utcnow().isoformat()
@@ -137,7 +105,7 @@ async def configure_google_sheets_integration(
         else:
             # Create new integration
             integration_id = str(uuid.uuid4())
-            result = supabase.table('integrations').insert({
+            result = await db.table('integrations').insert({
                 'id': integration_id,
                 'user_id': user_id,
                 'platform': 'google_sheets',
@@ -146,6 +114,7 @@ async def configure_google_sheets_integration(
                 'created_at': datetime.utcnow().isoformat(),
                 'updated_at': datetime.utcnow().isoformat()
             }).execute()
+        await integration_cache.invalidate(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -166,29 +135,21 @@ async def configure_google_sheets_integration(
 @router.post("/jira")
 async def configure_jira_integration(
     config: Dict[str, Any],
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Configure Jira integration"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Check if integration already exists
-        existing = supabase.table('integrations').select('*').eq('user_id', user_id).eq('platform', 'jira').execute()
+        existing = await db.table('integrations').select(ID_COLUMNS).eq('user_id', user_id).eq('platform', 'jira').execute()
         
         if existing.data:
             # Update existing integration
             integration_id = existing.data[0]['id']
-            result = supabase.table('integrations').update({
+            result = await db.table('integrations').update({
                 'config': config,
                 'status': 'active',
                 'updated_at': datetime.utcnow().isoformat()
@@ -196,7 +157,7 @@ async def configure_jira_integration(
         else:
             # Create new integration
             integration_id = str(uuid.uuid4())
-            result = supabase.table('integrations').insert({
+            result = await db.table('integrations').insert({
                 'id': integration_id,
                 'user_id': user_id,
                 'platform': 'jira',
@@ -205,6 +166,7 @@ async def configure_jira_integration(
                 'created_at': datetime.utcnow().isoformat(),
                 'updated_at': datetime.utcnow().isoformat()
             }).execute()
+        await integration_cache.invalidate(user_id)
         
         if not result.data:
             raise HTTPException(
@@ -225,24 +187,17 @@ async def configure_jira_integration(
 @router.delete("/{platform}")
 async def remove_integration(
     platform: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Remove an integration"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
+        user_id = principal.user_id
         
-        supabase = get_supabase()
+        db = get_db()
         
         # Remove integration
-        result = supabase.table('integrations').delete().eq('user_id', user_id).eq('platform', platform).execute()
+        result = await db.table('integrations').delete().eq('user_id', user_id).eq('platform', platform).execute()
+        await integration_cache.invalidate(user_id)
         
         return {"message": f"{platform} integration removed successfully"}
         
@@ -255,25 +210,13 @@ async def remove_integration(
         )
 
 @router.get("/status")
-async def get_integration_status(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_integration_status(principal: Principal = Depends(get_principal)):
     """Get status of all integrations"""
     try:
-        # Get current user
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
-        
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        user_id = principal.user_id
         
         # Get user's integrations
-        result = supabase.table('integrations').select('*').eq('user_id', user_id).execute()
-        
-        integrations = result.data or []
+        integrations = await get_user_integrations(user_id)
         
         # Check status of each integration
         status_report = {}
@@ -1,23 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List
 from datetime import datetime
+import uuid
 
-from core.database import get_supabase
-from models.user import User, UserUpdate
-from services.auth_service import AuthService
+from core.database import get_db
+from core.projections import PURGE_JOB_COLUMNS, API_KEY_COLUMNS
+from models.user import User, UserUpdate, ApiKey, ApiKeyCreate, ApiKeyCreated
+from schemas.common import PurgeJobResponse
+from services.analytics_cache import analytics_cache
+from services.data_version import data_versions
+from services.api_keys import api_key_index, generate_key, key_digest, unknown_permissions
+from services.auth_service import Principal, active_users, get_principal
+from services.purge_worker import purge_worker
 
 # Create router
 router = APIRouter()
 
-# Security
-security = HTTPBearer()
-
-# Services
-auth_service = AuthService()
-
 @router.get("/", response_model=List[User])
-async def get_users(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_users(principal: Principal = Depends(get_principal)):
     """Get all users (admin only)"""
     # This would typically check for admin role
     raise HTTPException(
@@ -26,28 +26,17 @@ async def get_users(credentials: HTTPAuthorizationCredentials = Depends(security
     )
 
 @router.get("/me", response_model=User)
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(principal: Principal = Depends(get_principal)):
     """Get current authenticated user"""
     try:
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_data = await principal.user()
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
-        result = supabase.table('users').select('*').eq('id', user_id).execute()
-        
-        if not result.data:
+        if user_data is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        user_data = result.data[0]
         return User(
             id=user_data['id'],
             email=user_data['email'],
@@ -73,20 +62,13 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 @router.put("/me", response_model=User)
 async def update_current_user(
     user_update: UserUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    principal: Principal = Depends(get_principal)
 ):
     """Update current authenticated user"""
     try:
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
         
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-        
-        supabase = get_supabase()
+        db = get_db()
         
         # Prepare update data
         update_data = {}
@@ -102,7 +84,7 @@ async def update_current_user(
         update_data['updated_at'] = datetime.utcnow().isoformat()
         
         # Update user
-        result = supabase.table('users').update(update_data).eq('id', user_id).execute()
+        result = await db.table('users').update(update_data).eq('id', user_id).execute()
         
         if not result.data:
             raise HTTPException(
@@ -134,25 +116,34 @@ async def update_current_user(
             detail=f"Failed to update user: {str(e)}"
         )
 
-@router.delete("/me")
-async def delete_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+@router.delete("/me", status_code=status.HTTP_202_ACCEPTED)
+async def delete_current_user(principal: Principal = Depends(get_principal)):
     """Delete current authenticated user"""
     try:
-        token = credentials.credentials
-        user_id = auth_service.get_user_id_from_token(token)
+        user_id = principal.user_id
+        
+        db = get_db()
         
-        if not user_id:
+        # Soft-delete now (deactivated users can't log in); the purge worker removes their data in chunks
+        result = await db.table('users').update({
+            'is_active': False,
+            'updated_at': datetime.utcnow().isoformat()
+        }).eq('id', user_id).eq('is_active', True).execute()
+        
+        if not result.data:
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
             )
         
-        supabase = get_supabase()
-        
-        # Delete user (this would typically be a soft delete)
-        supabase.table('users').delete().eq('id', user_id).execute()
+        await active_users.deactivate(user_id)
+        await db.table('api_keys').update({'is_active': False}).eq('user_id', user_id).execute()
+        await api_key_index.revoke(user_id)
+        await analytics_cache.invalidate(user_id)
+        await data_versions.bump(user_id)
+        job = await purge_worker.enqueue('user', user_id, user_id)
         
-        return {"message": "User deleted successfully"}
+        return {"message": "User deletion scheduled", "purge_job_id": job['id']}
         
     except HTTPException:
         raise
@@ -161,3 +152,146 @@ async def delete_current_user(credentials: HTTPAuthorizationCredentials = Depend
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete user: {str(e)}"
         )
+
+@router.get("/me/purge-jobs/{job_id}", response_model=PurgeJobResponse)
+async def get_purge_job(
+    job_id: str,
+    principal: Principal = Depends(get_principal)
+):
+    """Get the progress of a user or agent deletion"""
+    try:
+        user_id = principal.user_id
+        
+        db = get_db()
+        result = await db.table('purge_jobs').select(PURGE_JOB_COLUMNS).eq('id', job_id).eq('user_id', user_id).execute()
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Purge job not found"
+            )
+        
+        job = result.data[0]
+        return PurgeJobResponse(
+            id=job['id'],
+            target=job['target'],
+            target_id=job['target_id'],
+            status=job['status'],
+            progress=job['progress'] or {},
+            error=job['error'],
+            created_at=datetime.fromisoformat(job['created_at']),
+            updated_at=datetime.fromisoformat(job['updated_at']) if job['updated_at'] else None,
+            completed_at=datetime.fromisoformat(job['completed_at']) if job['completed_at'] else None
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get purge job: {str(e)}"
+        )
+
+def _api_key_fields(key_data: dict) -> dict:
+    return dict(
+        id=key_data['id'],
+        name=key_data['name'],
+        permissions=key_data['permissions'] or [],
+        is_active=key_data['is_active'],
+        last_used=datetime.fromisoformat(key_data['last_used']) if key_data['last_used'] else None,
+        expires_at=datetime.fromisoformat(key_data['expires_at']) if key_data['expires_at'] else None,
+        created_at=datetime.fromisoformat(key_data['created_at'])
+    )
+
+@router.post("/me/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    key_request: ApiKeyCreate,
+    principal: Principal = Depends(get_principal)
+):
+    """Create an API key (the key is only returned here)"""
+    try:
+        if principal.api_key_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="API keys cannot create API keys"
+            )
+        unknown = unknown_permissions(key_request.permissions)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown permissions: {', '.join(unknown)}"
+            )
+        
+        key = generate_key()
+        key_record = {
+            'id': str(uuid.uuid4()),
+            'user_id': principal.user_id,
+            'name': key_request.name,
+            'key_hash': key_digest(key),
+            'permissions': key_request.permissions,
+            'is_active': True,
+            'expires_at': key_request.expires_at.isoformat() if key_request.expires_at else None,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        
+        db = get_db()
+        result = await db.table('api_keys').insert(key_record).execute()
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create API key"
+            )
+        
+        api_key_index.add(result.data[0])
+        return ApiKeyCreated(key=key, **_api_key_fields(result.data[0]))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create API key: {str(e)}"
+        )
+
+@router.get("/me/api-keys", response_model=List[ApiKey])
+async def get_api_keys(principal: Principal = Depends(get_principal)):
+    """Get the current user's API keys"""
+    try:
+        db = get_db()
+        result = await db.table('api_keys').select(API_KEY_COLUMNS).eq('user_id', principal.user_id).order('created_at').execute()
+        
+        return [ApiKey(**_api_key_fields(key_data)) for key_data in result.data]
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get API keys: {str(e)}"
+        )
+
+@router.delete("/me/api-keys/{key_id}")
+async def revoke_api_key(
+    key_id: str,
+    principal: Principal = Depends(get_principal)
+):
+    """Revoke an API key"""
+    try:
+        db = get_db()
+        result = await db.table('api_keys').update({'is_active': False}).eq('id', key_id).eq('user_id', principal.user_id).eq('is_active', True).execute()
+        
+        if not result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="API key not found"
+            )
+        
+        await api_key_index.revoke(principal.user_id, key_id)
+        return {"message": "API key revoked"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to revoke API key: {str(e)}"
+        )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: API overhead on a local storage engine
+
+Drives the FastAPI app in-process (no sockets, no Supabase) against the
+memory or SQLite engine so the numbers reflect the API's own cost:
+routing, validation, JWT handling, the data layer and serialization.
+
+Usage:
+    python benchmarks/bench_api.py --engine memory --requests 2000 --concurrency 32
+    python benchmarks/bench_api.py --engine sqlite --sqlite-path /tmp/bench.db
+    python benchmarks/bench_api.py --engine postgres --database-url postgresql://localhost/bench
+    python benchmarks/bench_api.py --engine sqlite --message-buffer
+
+The postgres engine creates the API tables if missing and truncates them,
+so point it at a throwaway database.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from core.config import settings
+from core import database
+from core.engines.postgres import PostgresEngine
+from core.tables import TABLES
+from main import app
+from services.message_buffer import message_buffer
+
+async def seed(client: httpx.AsyncClient, conversations: int):
+    """Create one user with an agent and some conversations"""
+    await client.post("/api/v1/auth/register", json={
+        "email": "bench@example.com",
+        "password": "benchpassword",
+        "confirm_password": "benchpassword",
+    })
+    login = await client.post("/api/v1/auth/login", json={
+        "email": "bench@example.com",
+        "password": "benchpassword",
+    })
+    body = login.json()
+    headers = {"Authorization": f"Bearer {body['access_token']}"}
+
+    agent = await client.post("/api/v1/agents/", headers=headers, json={
+        "user_id": body["user"]["id"],
+        "name": "Bench Agent",
+        "agent_type": "support",
+    })
+    agent_id = agent.json()["id"]
+
+    conversation_id = None
+    for _ in range(conversations):
+        conversation = await client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id})
+        conversation_id = conversation.json()["id"]
+
+    return headers, agent_id, conversation_id
+
+async def measure(client, label, method, url, headers, total, concurrency, **kwargs):
+    """Fire `total` requests with bounded concurrency and report latency percentiles"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, url, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"  {label:<32} {total / elapsed:9.1f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   errors {errors}")
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    settings.DATABASE_ENGINE = args.engine
+    settings.SQLITE_PATH = args.sqlite_path
+    settings.MESSAGE_BUFFER_ENABLED = args.message_buffer
+    if args.engine == "sqlite" and args.sqlite_path != ":memory:" and os.path.exists(args.sqlite_path):
+        os.remove(args.sqlite_path)
+    if args.engine == "postgres":
+        engine = PostgresEngine(args.database_url, create_tables=True)
+        await engine.connect()
+        async with engine.pool.acquire() as connection:
+            await connection.execute(f"TRUNCATE {', '.join(TABLES)}")
+        database.db = database.Database(engine)
+    else:
+        await database.init_db()
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        headers, agent_id, conversation_id = await seed(client, args.conversations)
+
+        print(f"🚀 API overhead benchmark ({args.engine} engine{', message buffer' if args.message_buffer else ''})")
+        print(f"📍 {args.requests} requests per endpoint, concurrency {args.concurrency}")
+        print("=" * 100)
+        await measure(client, "GET /agents/", "GET", "/api/v1/agents/", headers, args.requests, args.concurrency)
+        await measure(client, "GET /agents/{id}", "GET", f"/api/v1/agents/{agent_id}", headers, args.requests, args.concurrency)
+        await measure(client, "GET /conversations/", "GET", "/api/v1/conversations/", headers, args.requests, args.concurrency)
+        await measure(client, "GET /analytics/overview", "GET", "/api/v1/analytics/overview", headers, args.requests, args.concurrency)
+        await measure(
+            client, "POST /conversations/{id}/messages", "POST", f"/api/v1/conversations/{conversation_id}/messages",
+            headers, args.requests, args.concurrency, json={"role": "user", "content": "hello"}
+        )
+        print("=" * 100)
+
+    await message_buffer.close()
+    await database.close_db()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["memory", "sqlite", "postgres"], default="memory")
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--message-buffer", action="store_true", help="write messages through the write-behind buffer")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
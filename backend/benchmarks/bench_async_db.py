@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: blocking supabase-py calls vs the async pooled data layer
+
+Starts a local HTTP server that imitates PostgREST with a fixed per-query
+latency, then fires the same number of concurrent "handler" coroutines
+through both client paths and reports throughput and event-loop stall.
+
+Usage:
+    python benchmarks/bench_async_db.py --requests 200 --concurrency 50 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase import create_client
+from core.database import Database
+from core.engines.postgrest import PostgrestEngine
+
+ROW = {"id": "550e8400-e29b-41d4-a716-446655440001", "name": "Support Bot", "status": "active"}
+
+def start_fake_postgrest(latency: float) -> ThreadingHTTPServer:
+    """Serve canned PostgREST responses after a fixed delay"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # Drain any request body so keep-alive connections stay in sync
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(latency)
+            body = json.dumps([ROW]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def measure(label: str, handler, total: int, concurrency: int):
+    """Run `total` handler calls with bounded concurrency, tracking loop lag"""
+    semaphore = asyncio.Semaphore(concurrency)
+    max_lag = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal max_lag
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.005)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    monitor = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    done = True
+    await monitor
+
+    print(f"  {label:<28} {elapsed:8.3f}s  {total / elapsed:9.1f} req/s  max loop stall {max_lag * 1000:8.1f} ms")
+    return total / elapsed
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server = start_fake_postgrest(args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    sync_client = create_client(url, "bench.bench.bench")
+    async_db = Database(PostgrestEngine(url, "bench.bench.bench"))
+
+    async def blocking_handler():
+        sync_client.table("agents").select("*").eq("id", ROW["id"]).execute()
+
+    async def async_handler():
+        await async_db.table("agents").select("*").eq("id", ROW["id"]).execute()
+
+    print("🚀 Data layer concurrency benchmark")
+    print(f"📍 {args.requests} requests, concurrency {args.concurrency}, backend latency {args.latency_ms} ms")
+    print("=" * 80)
+
+    before = await measure("sync supabase-py (blocking)", blocking_handler, args.requests, args.concurrency)
+    after = await measure("async pooled data layer", async_handler, args.requests, args.concurrency)
+
+    print("=" * 80)
+    print(f"🎯 Throughput change: {after / before:.1f}x")
+
+    await async_db.close()
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat turn round trips, three statements vs one procedure call
+
+Records the same chat turns through the previous write path (insert the
+conversation, then update it with the agent's response) and through the
+`record_chat_turn` procedure, after the same agent lookup, and finally
+through the procedure with the agent served from the agent cache. An
+optional per-round-trip delay stands in for the network distance to the
+database.
+
+Usage:
+    python benchmarks/bench_chat_turn.py --engine memory --rtt-ms 2
+    python benchmarks/bench_chat_turn.py --engine postgres --database-url postgresql://localhost/bench
+
+The postgres engine creates the API tables if missing and truncates them,
+so point it at a throwaway database.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import database
+from core.database import Database
+from core.engines.base import StorageEngine, Query, QueryResult
+from core.engines.memory import MemoryEngine
+from core.engines.postgres import PostgresEngine
+from core.projections import AGENT_CHAT_COLUMNS
+from core.tables import TABLES
+from services.agent_cache import AgentCache
+
+USER_ID = "550e8400-e29b-41d4-a716-446655440000"
+AGENT_ID = "550e8400-e29b-41d4-a716-446655440001"
+
+class DelayedEngine(StorageEngine):
+    """Adds a fixed delay to every round trip of another engine"""
+
+    def __init__(self, engine: StorageEngine, rtt: float):
+        self.engine = engine
+        self.rtt = rtt
+        self.round_trips = 0
+
+    async def connect(self):
+        await self.engine.connect()
+
+    async def execute(self, query: Query) -> QueryResult:
+        self.round_trips += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        return await self.engine.execute(query)
+
+    async def close(self):
+        await self.engine.close()
+
+def turn_row(message: str) -> dict:
+    now = datetime.utcnow().isoformat()
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': USER_ID,
+        'agent_id': AGENT_ID,
+        'title': "New Conversation",
+        'conversation_type': "custom",
+        'metadata': {},
+        'message': message,
+        'created_at': now,
+        'updated_at': now,
+    }
+
+async def three_statements(db: Database):
+    """Agent lookup, insert as active, update with the response"""
+    await db.table('agents').select(AGENT_CHAT_COLUMNS).eq('id', AGENT_ID).execute()
+    row = turn_row("hello")
+    await db.table('conversations').insert({**row, 'status': "active"}).execute()
+    await db.table('conversations').update({
+        'response': "hi there",
+        'status': "completed",
+        'updated_at': datetime.utcnow().isoformat(),
+    }).eq('id', row['id']).execute()
+
+async def procedure(db: Database):
+    """Agent lookup, then record the finished turn in one call"""
+    await db.table('agents').select(AGENT_CHAT_COLUMNS).eq('id', AGENT_ID).execute()
+    row = turn_row("hello")
+    await db.rpc('record_chat_turn', {'p_turn': {**row, 'response': "hi there", 'status': "completed"}}).execute()
+
+def cached_procedure(cache: AgentCache):
+    """Agent from the cache, then the procedure call"""
+    async def turn(db: Database):
+        await cache.get(AGENT_ID)
+        row = turn_row("hello")
+        await db.rpc('record_chat_turn', {'p_turn': {**row, 'response': "hi there", 'status': "completed"}}).execute()
+    return turn
+
+async def measure(label: str, db: Database, engine: DelayedEngine, turn, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await turn(db)
+            latencies.append(time.perf_counter() - started)
+
+    engine.round_trips = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"  {label:<24} {total / elapsed:9.1f} turns/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms"
+        f"   round trips/turn {engine.round_trips / total:.1f}"
+    )
+
+async def run(args):
+    if args.engine == "postgres":
+        inner = PostgresEngine(args.database_url, create_tables=True)
+    else:
+        inner = MemoryEngine()
+    engine = DelayedEngine(inner, args.rtt_ms / 1000)
+    await engine.connect()
+    if args.engine == "postgres":
+        async with inner.pool.acquire() as connection:
+            await connection.execute(f"TRUNCATE {', '.join(TABLES)}")
+
+    db = Database(engine)
+    database.db = db
+    await db.table('agents').insert({'id': AGENT_ID, 'user_id': USER_ID, 'name': "Bench Agent", 'config': {"agent_type": "support"}}).execute()
+
+    print(f"🚀 Chat turn benchmark ({args.engine} engine, {args.rtt_ms} ms added per round trip)")
+    print(f"📍 {args.turns} turns per path, concurrency {args.concurrency}")
+    print("=" * 100)
+    await measure("insert + update", db, engine, three_statements, args.turns, args.concurrency)
+    await measure("record_chat_turn rpc", db, engine, procedure, args.turns, args.concurrency)
+    cache = AgentCache(max_size=16, ttl=60.0)
+    await measure("rpc + agent cache", db, engine, cached_procedure(cache), args.turns, args.concurrency)
+    print(f"  agent cache: {cache.cache.stats()}")
+    print("=" * 100)
+    await engine.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="delay added to every database round trip")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput at different bcrypt costs
+
+Registers one user per bcrypt cost and drives POST /auth/login in-process
+(memory engine) with bounded concurrency, reporting latency percentiles,
+logins per second and logins per second per core. Optionally runs the
+BCRYPT_TARGET_MS calibration and reports the cost it picks.
+
+Usage:
+    python benchmarks/bench_login.py --costs 8,10,12 --logins 200 --concurrency 16
+    python benchmarks/bench_login.py --costs 10,12 --calibrate 250
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from core.config import settings
+from core import database
+from main import app
+from services.password_pool import password_pool
+
+async def measure(client: httpx.AsyncClient, cost: int, total: int, concurrency: int, cores: int):
+    """Register a user hashed at `cost` and log it in `total` times"""
+    password_pool.configure(cost)
+    email = f"bench-{cost}@example.com"
+    await client.post("/api/v1/auth/register", json={
+        "email": email,
+        "password": "benchpassword",
+        "confirm_password": "benchpassword",
+    })
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/v1/auth/login", json={"email": email, "password": "benchpassword"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+    rate = total / elapsed
+    print(
+        f"  cost {cost:<3} {rate:9.1f} logins/s   {rate / cores:8.1f} logins/s/core"
+        f"   p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   errors {errors}"
+    )
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("services.auth_service").setLevel(logging.WARNING)
+    settings.DATABASE_ENGINE = "memory"
+    await database.init_db()
+    cores = min(password_pool.workers, os.cpu_count() or 1)
+    password_pool.max_queue = max(password_pool.max_queue, args.concurrency)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        print(f"🚀 Login benchmark (memory engine, {password_pool.workers} hashing threads, {cores} cores)")
+        print(f"📍 {args.logins} logins per cost, concurrency {args.concurrency}")
+        print("=" * 100)
+        for cost in [int(cost) for cost in args.costs.split(",")]:
+            await measure(client, cost, args.logins, args.concurrency, cores)
+        if args.calibrate:
+            rounds = await password_pool.calibrate(args.calibrate)
+            print(f"  BCRYPT_TARGET_MS={args.calibrate:g} picks cost {rounds}")
+        print("=" * 100)
+
+    password_pool.close()
+    await database.close_db()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--costs", default="8,10,12", help="comma-separated bcrypt costs")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--calibrate", type=float, default=0.0, help="also calibrate for this target hash time (ms)")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: verified-token cache
+
+Measures token checks per second (`get_user_id_from_token` on one token,
+as a client reusing its token does) and requests per second on an
+authenticated endpoint, with the verified-token cache disabled and enabled,
+plus the cost of the revocation check for a token that was never revoked.
+
+Usage:
+    python benchmarks/bench_token_cache.py --checks 50000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from core.config import settings
+from core import database
+from main import app
+from services.auth_service import AuthService, token_cache
+from services.token_revocation import token_denylist, token_digest
+from bench_api import seed, measure
+
+def measure_denylist(token: str, total: int):
+    digest = token_digest(token)
+    started = time.perf_counter()
+    for _ in range(total):
+        token_denylist.is_revoked(digest)
+    elapsed = time.perf_counter() - started
+    print(f"  {'revocation check (not revoked)':<32} {total / elapsed:11.1f} checks/s   {elapsed / total * 1e6:7.2f} µs/check")
+
+def set_cache(enabled: bool):
+    token_cache.clear()
+    token_cache.max_size = settings.TOKEN_CACHE_SIZE if enabled else 0
+
+def measure_checks(label: str, token: str, total: int):
+    auth_service = AuthService()
+    started = time.perf_counter()
+    for _ in range(total):
+        auth_service.get_user_id_from_token(token)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<32} {total / elapsed:11.1f} checks/s   {elapsed / total * 1e6:7.2f} µs/check")
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("services.auth_service").setLevel(logging.WARNING)
+    settings.DATABASE_ENGINE = "memory"
+    await database.init_db()
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        headers, agent_id, _ = await seed(client, 0)
+        token = headers["Authorization"].split(" ", 1)[1]
+
+        print("🚀 Verified-token cache benchmark (memory engine)")
+        print(f"📍 {args.checks} token checks, {args.requests} requests per run, concurrency {args.concurrency}")
+        print("=" * 100)
+        for enabled in (False, True):
+            set_cache(enabled)
+            measure_checks(f"token check, cache {'on' if enabled else 'off'}", token, args.checks)
+        measure_denylist(token, args.checks)
+        for enabled in (False, True):
+            set_cache(enabled)
+            await measure(
+                client, f"GET /agents/{{id}}, cache {'on' if enabled else 'off'}", "GET", f"/api/v1/agents/{agent_id}",
+                headers, args.requests, args.concurrency
+            )
+        print(f"  token cache: {token_cache.stats()}")
+        print("=" * 100)
+
+    await database.close_db()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
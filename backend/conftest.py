@@ -0,0 +1,25 @@
+"""
+Fixtures shared by the test modules
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from testutils import TEST_DATABASE_URL
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """API tests all come from one client address; start each with clean login limits"""
+    from core.rate_limit import reset_rate_limits
+    reset_rate_limits()
+
+@pytest.fixture(params=["memory", "sqlite", "postgres"])
+def engine_name(request):
+    if request.param == "postgres" and not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    return request.param
@@ -0,0 +1,92 @@
+"""
+In-process caches
+
+`LRUCache` is a bounded mapping with least-recently-used eviction and a
+per-entry time to live. Hits, misses and evictions are counted on the
+instance and in the `cache.<name>.*` metrics. Entries live in one worker
+process; writers invalidate the keys they change.
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+import time
+
+from core.metrics import metrics
+
+_MISSING = object()
+
+class LRUCache:
+    """Bounded LRU mapping whose entries expire after a TTL"""
+
+    def __init__(self, name: str, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live entry, or `default`"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= self._clock():
+                del self._entries[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.increment(f"cache.{self.name}.{'misses' if entry is _MISSING else 'hits'}")
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store an entry for `ttl` seconds (the cache's TTL by default)"""
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            metrics.increment(f"cache.{self.name}.evictions", evicted)
+
+    def delete(self, key: Hashable):
+        """Drop an entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        """Drop every entry whose key is a string starting with `prefix`"""
+        with self._lock:
+            for key in [key for key in self._entries if isinstance(key, str) and key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counts"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
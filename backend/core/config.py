@@ -14,6 +14,8 @@ class Settings(BaseSettings):
     PORT: int = 8000
     DEBUG: bool = True
     ENVIRONMENT: str = "development"
+    WEB_CONCURRENCY: int = 1  # worker processes serving the app (the uvicorn/gunicorn --workers default)
+    METRICS_TOKEN: str = ""  # bearer token /metrics requires; empty turns the endpoint off
     
     # CORS Configuration
     ALLOWED_ORIGINS: List[str] = [
@@ -30,6 +32,20 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 10000  # verified tokens kept per process; 0 disables the cache
+    TOKEN_CACHE_TTL: float = 300.0  # seconds, capped by each token's exp
+    USER_STATUS_CACHE_SIZE: int = 10000  # users whose active flag is kept per process; 0 disables the cache
+    USER_STATUS_CACHE_TTL: float = 60.0  # seconds
+    PASSWORD_POOL_WORKERS: int = 0  # bcrypt threads; 0 uses one per CPU
+    PASSWORD_POOL_QUEUE: int = 32  # calls allowed to wait for a thread before answering 503
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost for new hashes
+    BCRYPT_TARGET_MS: float = 0.0  # if set, calibrate the cost to this hash time at startup instead
+    API_KEY_REFRESH_INTERVAL: float = 60.0  # seconds between reloads of the API key index
+    API_KEY_LAST_USED_INTERVAL: float = 30.0  # seconds to batch API key last_used writes
+    TOKEN_REVOCATION_CAPACITY: int = 100000  # revoked tokens the Bloom filter is sized for
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001  # Bloom filter false-positive rate
+    TOKEN_REVOCATION_REFRESH_INTERVAL: float = 30.0  # seconds between loads of other workers' revocations
+    TOKEN_REVOCATION_REFRESH_OVERLAP: float = 300.0  # seconds of created_at skew each load re-reads
     
     # OpenAI Configuration
     OPENAI_API_KEY: str = ""
@@ -50,8 +66,72 @@ class Settings(BaseSettings):
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Login and registration rate limits (attempts per window; 0 disables a limit)
+    RATE_LIMIT_BACKEND: str = "memory"  # memory, or redis to share limits across workers
+    RATE_LIMIT_WINDOW: float = 60.0  # seconds
+    RATE_LIMIT_MAX_KEYS: int = 100000  # keys kept by the memory backend
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0  # reverse proxies in front that append to X-Forwarded-For; 0 uses the peer address
+    LOGIN_RATE_LIMIT_IP: int = 30
+    LOGIN_RATE_LIMIT_EMAIL: int = 10
+    REGISTER_RATE_LIMIT_IP: int = 10
+    REGISTER_RATE_LIMIT_EMAIL: int = 5
+    
+    # Shared cache (per-process L1 in front of an L2 shared by every worker)
+    CACHE_BACKEND: str = "memory"  # memory (this process only), or redis (REDIS_URL)
+    CACHE_KEY_PREFIX: str = "agent-synergy"
+    CACHE_TTL: float = 60.0  # seconds, unless a cache sets its own
+    CACHE_L1_SIZE: int = 4096  # entries per cache per process; 0 disables the L1
+    CACHE_L1_TTL: float = 5.0  # seconds another worker's write can go unseen
+    CACHE_LOCK_TIMEOUT: float = 5.0  # seconds one loader holds a key before others load too
+    CACHE_COMPRESS_MIN_BYTES: int = 1024
+    ANALYTICS_CACHE_TTL: float = 60.0  # seconds; 0 disables the analytics cache
+    INTEGRATION_CACHE_TTL: float = 60.0  # seconds; 0 disables the integrations cache
+    DATA_VERSION_TTL: float = 60.0  # seconds a data version stays cached; 0 disables ETags
+    
+    # Cache invalidation bus (evicts cached entries in every worker after a write)
+    CACHE_INVALIDATION_TRANSPORT: str = "loopback"  # loopback (this process only), redis (REDIS_URL) or postgres (DATABASE_URL)
+    CACHE_INVALIDATION_CHANNEL: str = "cache_invalidation"
+    
     # Database Configuration
+    DATABASE_ENGINE: str = "supabase"  # supabase, postgres, memory, sqlite
     DATABASE_URL: str = ""
+    SQLITE_PATH: str = "agent_synergy.db"
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_POOL_KEEPALIVE: float = 30.0  # seconds an idle connection is kept open
+    DATABASE_TIMEOUT: float = 10.0
+    DATABASE_STATEMENT_CACHE_SIZE: int = 256  # set to 0 behind pgbouncer in transaction mode
+    DATALOADER_ENABLED: bool = True  # coalesce duplicate reads within a request
+    
+    # Message ingestion
+    MESSAGE_BUFFER_ENABLED: bool = False
+    MESSAGE_BUFFER_SIZE: int = 100  # rows per multi-row insert; a full batch flushes immediately
+    MESSAGE_BUFFER_FLUSH_INTERVAL: float = 0.05  # seconds a queued message may wait
+    MESSAGE_BUFFER_MAX_PENDING: int = 5000  # writers wait for a flush beyond this
+    MESSAGE_BUFFER_RETRIES: int = 5  # attempts after a failed insert before a row is dropped
+    MESSAGE_BUFFER_RETRY_DELAY: float = 0.5  # seconds before the first retry, doubling each time
+    MESSAGE_BATCH_MAX_ITEMS: int = 5000  # per bulk append request
+    MESSAGE_BATCH_CHUNK_SIZE: int = 500  # rows per multi-row insert
+    
+    # Agent record cache (per worker process)
+    AGENT_CACHE_SIZE: int = 1024  # agents kept; 0 disables the cache
+    AGENT_CACHE_TTL: float = 30.0  # seconds
+    NEGATIVE_CACHE_SIZE: int = 10000  # ids remembered as missing; 0 disables the cache
+    NEGATIVE_CACHE_TTL: float = 5.0  # seconds
+    
+    # Agent statistics
+    AGENT_COUNTERS_FLUSH_INTERVAL: float = 0.0  # seconds to merge agent counter changes; 0 applies each one
+    
+    # Background purge of deleted users and agents
+    PURGE_CHUNK_SIZE: int = 500  # rows per delete
+    PURGE_CHUNK_PAUSE: float = 0.05  # seconds between chunks
+    PURGE_POLL_INTERVAL: float = 30.0  # seconds between checks for jobs queued by other workers
+    PURGE_LEASE: float = 120.0  # seconds before a silent worker's job is taken over
+    
+    # Cold storage for archived conversations
+    ARCHIVE_STORE: str = "file"  # file or memory
+    ARCHIVE_PATH: str = "archive"  # directory for the file store
+    ARCHIVE_CHUNK_SIZE: int = 1000  # messages read or deleted per query
+    ARCHIVE_CACHE_SIZE: int = 32  # decoded archives kept in memory
     
     # Agent Configuration
     DEFAULT_AGENT_TIMEOUT: int = 300  # 5 minutes
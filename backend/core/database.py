@@ -1,43 +1,183 @@
 from supabase import create_client, Client
+from typing import Any, Dict, List, Optional
 from core.config import settings
+from core.dataloader import get_loader
+from core.engines.base import StorageEngine, Query, QueryResult, DatabaseError, dumps
+from core.engines.postgrest import PostgrestEngine
+from core.engines.postgres import PostgresEngine
+from core.engines.memory import MemoryEngine
+from core.engines.sqlite import SQLiteEngine
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global Supabase client
+class QueryBuilder:
+    """Fluent, awaitable query builder mirroring the supabase-py table API"""
+
+    def __init__(self, database: "Database", table: str):
+        self._database = database
+        self._query = Query(table=table)
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "QueryBuilder":
+        self._query.action = "select"
+        self._query.columns = columns
+        self._query.count = count
+        return self
+
+    def insert(self, payload: Any) -> "QueryBuilder":
+        self._query.action = "insert"
+        self._query.payload = payload
+        return self
+
+    def update(self, payload: Dict[str, Any]) -> "QueryBuilder":
+        self._query.action = "update"
+        self._query.payload = payload
+        return self
+
+    def delete(self) -> "QueryBuilder":
+        self._query.action = "delete"
+        return self
+
+    def _filter(self, op: str, column: str, value: Any) -> "QueryBuilder":
+        self._query.filters.append((op, column, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("eq", column, value)
+
+    def neq(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("neq", column, value)
+
+    def gt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("gt", column, value)
+
+    def gte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("gte", column, value)
+
+    def lt(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("lt", column, value)
+
+    def lte(self, column: str, value: Any) -> "QueryBuilder":
+        return self._filter("lte", column, value)
+
+    def in_(self, column: str, values: List[Any]) -> "QueryBuilder":
+        return self._filter("in", column, list(values))
+
+    def after(self, columns: List[str], values: List[Any], desc: bool = False) -> "QueryBuilder":
+        """Keyset filter: rows that sort after `values` in `columns` order (descending if `desc`)"""
+        if len(columns) != len(values):
+            raise ValueError("Keyset columns and values must have the same length")
+        return self._filter("row_lt" if desc else "row_gt", tuple(columns), list(values))
+
+    def order(self, column: str, desc: bool = False) -> "QueryBuilder":
+        self._query.order.append((column, desc))
+        return self
+
+    def limit(self, size: int) -> "QueryBuilder":
+        self._query.limit = size
+        return self
+
+    def range(self, start: int, end: int) -> "QueryBuilder":
+        self._query.offset = start
+        self._query.limit = end - start + 1
+        return self
+
+    async def execute(self) -> QueryResult:
+        return await self._database.execute(self._query)
+
+class Database:
+    """Async data-access layer over a pluggable storage engine"""
+
+    def __init__(self, engine: StorageEngine):
+        self.engine = engine
+
+    def table(self, name: str) -> QueryBuilder:
+        """Start a query against a table"""
+        return QueryBuilder(self, name)
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> QueryBuilder:
+        """Call a database-side procedure (see core.procedures)"""
+        builder = QueryBuilder(self, name)
+        builder._query.action = "rpc"
+        builder._query.payload = params or {}
+        return builder
+
+    async def execute(self, query: Query) -> QueryResult:
+        """Run a query on the configured engine (coalesced within a request)"""
+        loader = get_loader()
+        if loader is not None:
+            return await loader.execute(self, query)
+        return await self.engine.execute(query)
+
+    async def close(self):
+        """Release engine connections"""
+        await self.engine.close()
+
+def create_engine(name: str) -> StorageEngine:
+    """Build the storage engine selected by DATABASE_ENGINE"""
+    if name == "supabase":
+        if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
+            raise ValueError("Missing Supabase configuration")
+        return PostgrestEngine(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
+    if name == "postgres":
+        return PostgresEngine(settings.DATABASE_URL)
+    if name == "memory":
+        return MemoryEngine()
+    if name == "sqlite":
+        return SQLiteEngine(settings.SQLITE_PATH)
+    raise ValueError(f"Unknown database engine: {name}")
+
+# Global database instance
+db: Database = None
+
+# Synchronous Supabase client, created lazily for scripts and admin tooling
 supabase: Client = None
 
 async def init_db():
     """Initialize database connection"""
-    global supabase
-    
+    global db
+
     try:
-        if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
-            logger.error("Missing Supabase configuration")
-            return False
-        
-        # Create Supabase client
-        supabase = create_client(
-            settings.SUPABASE_URL,
-            settings.SUPABASE_ANON_KEY
-        )
-        
+        # Create the configured storage engine
+        engine = create_engine(settings.DATABASE_ENGINE)
+        await engine.connect()
+        db = Database(engine)
+
         # Test connection
-        response = supabase.table('users').select('count').limit(1).execute()
-        logger.info("✅ Database connection successful")
-        
+        await db.table('users').select('count').limit(1).execute()
+        logger.info(f"✅ Database connection successful ({engine.name})")
+
         return True
-        
+
     except Exception as e:
         logger.error(f"❌ Database connection failed: {str(e)}")
         return False
 
+async def close_db():
+    """Close database connections"""
+    global db
+
+    if db is not None:
+        await db.close()
+        db = None
+        logger.info("🔌 Database connections closed")
+
+def get_db() -> Database:
+    """Get async database instance"""
+    if db is None:
+        raise RuntimeError("Database not initialized. Call init_db() first.")
+    return db
+
 def get_supabase() -> Client:
-    """Get Supabase client instance"""
+    """Get synchronous Supabase client (blocks the event loop; not for request handlers)"""
+    global supabase
+
     if supabase is None:
-        raise RuntimeError("Database not initialized. Call init_db() first.")
+        if not settings.SUPABASE_URL or not settings.SUPABASE_ANON_KEY:
+            raise RuntimeError("Missing Supabase configuration")
+        supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
     return supabase
 
 async def create_tables():
@@ -47,13 +187,13 @@ async def create_tables():
         # For now, we'll just log that tables should be created manually
         logger.info("📋 Please create tables manually in Supabase dashboard:")
         logger.info("   - users")
-        logger.info("   - agents") 
+        logger.info("   - agents")
         logger.info("   - conversations")
         logger.info("   - integrations")
         logger.info("   - analytics")
-        
+
         return True
-        
+
     except Exception as e:
         logger.error(f"❌ Table creation failed: {str(e)}")
         return False
@@ -61,12 +201,12 @@ async def create_tables():
 async def health_check():
     """Check database health"""
     try:
-        if supabase is None:
+        if db is None:
             return False, "Database not initialized"
-        
+
         # Simple query to test connection
-        response = supabase.table('users').select('count').limit(1).execute()
+        await db.table('users').select('count').limit(1).execute()
         return True, "Database healthy"
-        
+
     except Exception as e:
         return False, f"Database error: {str(e)}"
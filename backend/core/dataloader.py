@@ -0,0 +1,234 @@
+"""
+Request-scoped query coalescing (dataloader)
+
+A `RequestLoader` lives for one HTTP request. While it is active, reads
+issued through `Database.execute` are coalesced:
+
+- an identical select is answered from the first result, or joins it
+  while it is still in flight;
+- concurrent single-row lookups by id on the same table (same columns
+  and other filters) are batched into one `in_` query.
+
+Any write to a table drops that table's cached reads for the rest of the
+request. If the task running a shared read is cancelled, the callers that
+joined it run their own query instead of waiting forever. Each request
+reports the round trips it saved in the `X-DB-Round-Trips-Saved` response
+header and the `db.*` metrics.
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import copy
+import logging
+
+from core.engines.base import Query, QueryResult, normalize
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_loader: ContextVar[Optional["RequestLoader"]] = ContextVar("request_loader", default=None)
+
+def _freeze(value: Any) -> Any:
+    """Make a filter value hashable"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return normalize(value)
+
+def query_key(query: Query) -> Tuple:
+    """Identity of a select: two queries with equal keys return the same rows"""
+    return (
+        query.table,
+        query.columns.replace(" ", ""),
+        tuple((op, column, _freeze(value)) for op, column, value in query.filters),
+        tuple(query.order),
+        query.offset,
+        query.limit,
+        query.count,
+    )
+
+def batch_key(query: Query) -> Optional[Tuple]:
+    """Batch identity of a single-row lookup by id, or None if the query can't be batched"""
+    if query.order or query.offset is not None or query.limit is not None or query.count:
+        return None
+    if query.columns.strip() == "count":
+        return None
+
+    by_id = [f for f in query.filters if f[0] == "eq" and f[1] == "id"]
+    if len(by_id) != 1 or by_id[0][2] is None:
+        return None
+    others = tuple((op, column, _freeze(value)) for op, column, value in query.filters if (op, column) != ("eq", "id"))
+    return (query.table, query.columns.replace(" ", ""), others)
+
+class LoadCancelled(Exception):
+    """The shared read a caller joined was cancelled before it finished"""
+
+def _copy(result: QueryResult) -> QueryResult:
+    """Hand every caller its own rows so one handler's edits don't leak into another's"""
+    return QueryResult(data=copy.deepcopy(result.data), count=result.count)
+
+class RequestLoader:
+    """Coalesces and batches the reads of a single request"""
+
+    def __init__(self):
+        self.active = True
+        self.requested = 0
+        self.round_trips = 0
+        self._reads: Dict[str, Dict[Tuple, asyncio.Future]] = {}
+        self._batches: Dict[Tuple, Dict[str, asyncio.Future]] = {}
+
+    @property
+    def saved(self) -> int:
+        """Round trips avoided so far"""
+        return self.requested - self.round_trips
+
+    async def _run(self, database, query: Query) -> QueryResult:
+        self.round_trips += 1
+        return await database.engine.execute(query)
+
+    def invalidate(self, table: str):
+        """Forget cached reads of a table"""
+        self._reads.pop(table, None)
+
+    async def execute(self, database, query: Query) -> QueryResult:
+        """Run a query through the loader"""
+        self.requested += 1
+
+        if query.action == "rpc":
+            # Procedures may write any table
+            self._reads.clear()
+            return await self._run(database, query)
+        if query.action != "select":
+            self.invalidate(query.table)
+            return await self._run(database, query)
+
+        key = (id(database),) + query_key(query)
+        reads = self._reads.setdefault(query.table, {})
+        future = reads.get(key)
+        if future is not None:
+            try:
+                return _copy(await asyncio.shield(future))
+            except LoadCancelled:
+                return await self._run(database, query)
+
+        future = asyncio.get_running_loop().create_future()
+        reads[key] = future
+        try:
+            group = batch_key(query)
+            if group is not None:
+                result = await self._load_by_id(database, query, (id(database),) + group)
+            else:
+                result = await self._run(database, query)
+        except BaseException as e:
+            if self._reads.get(query.table, {}).get(key) is future:
+                del self._reads[query.table][key]
+            # Waiters re-raise an error; a cancellation sends them to run their own query
+            future.set_exception(e if isinstance(e, Exception) else LoadCancelled())
+            future.exception()  # don't log it as unretrieved
+            raise
+
+        future.set_result(result)
+        return _copy(result)
+
+    async def _load_by_id(self, database, query: Query, group: Tuple) -> QueryResult:
+        """Join or lead a batch of by-id lookups issued in the same event-loop tick"""
+        id_value = str(normalize(next(v for op, c, v in query.filters if (op, c) == ("eq", "id"))))
+        future = asyncio.get_running_loop().create_future()
+
+        batch = self._batches.get(group)
+        if batch is not None:
+            batch[id_value] = future
+            try:
+                return await future
+            except LoadCancelled:
+                return await self._run(database, query)
+
+        batch = self._batches[group] = {id_value: future}
+        try:
+            # Let concurrently scheduled lookups join before the batch is sent
+            await asyncio.sleep(0)
+            if self._batches.get(group) is batch:
+                del self._batches[group]
+
+            if len(batch) == 1:
+                return await self._run(database, query)
+
+            columns = query.columns.replace(" ", "")
+            strip_id = columns != "*" and "id" not in columns.split(",")
+            batched = Query(
+                table=query.table,
+                columns=columns + ",id" if strip_id else columns,
+                filters=[f for f in query.filters if (f[0], f[1]) != ("eq", "id")] + [("in", "id", list(batch))],
+            )
+            try:
+                result = await self._run(database, batched)
+            except Exception as e:
+                for waiter in batch.values():
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                        waiter.exception()
+                raise
+
+            rows_by_id: Dict[str, List[Dict[str, Any]]] = {}
+            for row in result.data:
+                rows_by_id.setdefault(str(row["id"]), []).append(row)
+            for key, waiter in batch.items():
+                rows = rows_by_id.get(key, [])
+                if strip_id:
+                    rows = [{k: v for k, v in row.items() if k != "id"} for row in rows]
+                if not waiter.done():  # a caller that was cancelled itself
+                    waiter.set_result(QueryResult(data=rows))
+            return future.result()
+        finally:
+            if self._batches.get(group) is batch:
+                del self._batches[group]
+            # A cancelled leader sends the lookups that joined it to run their own
+            for waiter in batch.values():
+                if waiter is not future and not waiter.done():
+                    waiter.set_exception(LoadCancelled())
+                    waiter.exception()
+
+def get_loader() -> Optional[RequestLoader]:
+    """Get the loader of the current request, if any"""
+    loader = _current_loader.get()
+    if loader is not None and loader.active:
+        return loader
+    return None
+
+def detach_loader():
+    """Run the rest of the current task without a request loader (for background work)"""
+    _current_loader.set(None)
+
+class RequestLoaderMiddleware:
+    """ASGI middleware giving every HTTP request its own `RequestLoader`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        loader = RequestLoader()
+        token = _current_loader.set(loader)
+
+        async def send_with_report(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-round-trips-saved", str(loader.saved).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_report)
+        finally:
+            # Tasks spawned by the request inherit the context; make the loader inert for them
+            loader.active = False
+            _current_loader.reset(token)
+            metrics.increment("db.queries", loader.requested)
+            metrics.increment("db.round_trips", loader.round_trips)
+            metrics.increment("db.round_trips_saved", loader.saved)
+            if loader.saved:
+                logger.debug(f"{scope['method']} {scope['path']}: saved {loader.saved} of {loader.requested} round trips")
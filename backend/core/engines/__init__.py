@@ -0,0 +1 @@
+# Storage engines for Agent Synergy
@@ -0,0 +1,82 @@
+"""
+Storage engine interface shared by every data-store backend
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+import json
+
+class DatabaseError(Exception):
+    """Raised when the data store rejects a query"""
+    pass
+
+class NotFoundError(DatabaseError):
+    """Raised by a procedure when a row it requires doesn't exist (SQLSTATE P0002)"""
+    pass
+
+def _json_default(value: Any) -> Any:
+    """JSON encoder for values the routers hand to the data layer"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> str:
+    """Serialize a payload for the data store"""
+    return json.dumps(value, default=_json_default)
+
+def normalize(value: Any) -> Any:
+    """Convert a value to the JSON-compatible form the data store returns"""
+    if isinstance(value, (datetime, date, UUID, Enum)):
+        return _json_default(value)
+    return value
+
+@dataclass
+class Query:
+    """Engine-independent description of a single table operation"""
+    table: str  # procedure name for action="rpc"
+    action: str = "select"
+    columns: str = "*"
+    filters: List[Tuple[str, str, Any]] = field(default_factory=list)
+    order: List[Tuple[str, bool]] = field(default_factory=list)
+    offset: Optional[int] = None
+    limit: Optional[int] = None
+    payload: Any = None
+    count: Optional[str] = None
+
+class QueryResult:
+    """Result of an executed query (mirrors the supabase-py APIResponse shape)"""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+class StorageEngine:
+    """Base class for storage engines.
+
+    An engine receives fully-built `Query` objects and must support the
+    operations the routers use: select with eq/neq/gt/gte/lt/lte/in filters,
+    row-value keyset filters (row_gt/row_lt, whose column is a tuple of
+    columns), multi-column ordering, offset/limit ranges and exact counts, plus
+    insert (single or multi-row), update and delete returning the affected rows,
+    and rpc calls to the procedures in `core.procedures`.
+    """
+
+    name = "base"
+
+    async def connect(self):
+        """Open connections or create local tables"""
+        pass
+
+    async def execute(self, query: Query) -> QueryResult:
+        """Run a query and return the affected or selected rows"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections"""
+        pass
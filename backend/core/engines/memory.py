@@ -0,0 +1,150 @@
+"""
+In-memory storage engine for local load testing and CI benchmarking
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import copy
+import json
+import uuid
+
+from core.engines.base import StorageEngine, Query, QueryResult, DatabaseError, dumps, normalize
+from core.procedures import emulate
+from core.tables import TABLES, build_row, parse_columns
+
+def _compare(op: str, actual: Any, expected: Any) -> bool:
+    if op == "eq":
+        return actual == expected
+    if op == "neq":
+        return actual != expected
+    if actual is None or expected is None:
+        return False
+    if op == "gt":
+        return actual > expected
+    if op == "gte":
+        return actual >= expected
+    if op == "lt":
+        return actual < expected
+    if op == "lte":
+        return actual <= expected
+    raise DatabaseError(f"Unsupported filter: {op}")
+
+def matches(row: Dict[str, Any], filters: List[Tuple[str, str, Any]]) -> bool:
+    """Check whether a row satisfies every filter"""
+    for op, column, value in filters:
+        if op in ("row_gt", "row_lt"):
+            actual = tuple(row.get(c) for c in column)
+            expected = tuple(normalize(v) for v in value)
+            if None in actual or None in expected:
+                return False
+            if not (actual > expected if op == "row_gt" else actual < expected):
+                return False
+            continue
+        actual = row.get(column)
+        if op == "in":
+            if actual not in [normalize(v) for v in value]:
+                return False
+        elif not _compare(op, actual, normalize(value)):
+            return False
+    return True
+
+def sort_rows(rows: List[Dict[str, Any]], order: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    """Sort rows by several columns (NULLs last ascending, first descending)"""
+    for column, desc in reversed(order):
+        rows.sort(
+            key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else 0),
+            reverse=desc
+        )
+    return rows
+
+class MemoryEngine(StorageEngine):
+    """Keeps every table in process memory; state is lost on restart"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in TABLES}
+        self._undo: Optional[List[Callable[[], None]]] = None  # set while an emulated procedure runs
+
+    def _table(self, name: str) -> Dict[str, Dict[str, Any]]:
+        if name not in self.tables:
+            raise DatabaseError(f"Unknown table: {name}")
+        return self.tables[name]
+
+    async def execute(self, query: Query) -> QueryResult:
+        try:
+            handler = getattr(self, f"_{query.action}")
+        except AttributeError:
+            raise DatabaseError(f"Unsupported action: {query.action}")
+        try:
+            return handler(query)
+        except ValueError as e:
+            raise DatabaseError(str(e))
+
+    def _matching(self, query: Query) -> List[Dict[str, Any]]:
+        return [row for row in self._table(query.table).values() if matches(row, query.filters)]
+
+    def _select(self, query: Query) -> QueryResult:
+        rows = self._matching(query)
+
+        if query.columns.strip() == "count":
+            return QueryResult(data=[{"count": len(rows)}], count=len(rows))
+
+        total = len(rows) if query.count else None
+        rows = sort_rows(rows, query.order)
+
+        start = query.offset or 0
+        end = start + query.limit if query.limit is not None else None
+        columns = parse_columns(query.table, query.columns)
+
+        data = [{column: copy.deepcopy(row[column]) for column in columns} for row in rows[start:end]]
+        return QueryResult(data=data, count=total)
+
+    def _insert(self, query: Query) -> QueryResult:
+        table = self._table(query.table)
+        records = query.payload if isinstance(query.payload, list) else [query.payload]
+
+        rows = []
+        for record in records:
+            row = json.loads(dumps(build_row(query.table, record)))
+            if not row.get("id"):
+                row["id"] = str(uuid.uuid4())
+            if row["id"] in table or any(r["id"] == row["id"] for r in rows):
+                raise DatabaseError(f"Duplicate key value for {query.table}.id: {row['id']}")
+            rows.append(row)
+
+        for row in rows:
+            table[row["id"]] = row
+            if self._undo is not None:
+                self._undo.append(lambda row_id=row["id"]: table.pop(row_id, None))
+        return QueryResult(data=copy.deepcopy(rows))
+
+    def _update(self, query: Query) -> QueryResult:
+        changes = json.loads(dumps(query.payload))
+        build_row(query.table, changes)
+
+        rows = self._matching(query)
+        for row in rows:
+            if self._undo is not None:
+                self._undo.append(lambda row=row, before=copy.deepcopy(row): (row.clear(), row.update(before)))
+            row.update(copy.deepcopy(changes))
+        return QueryResult(data=copy.deepcopy(rows))
+
+    def _rpc(self, query: Query) -> QueryResult:
+        # All or nothing, as on Postgres: a failed step undoes the steps before it
+        self._undo = []
+        try:
+            return emulate(query.table, lambda q: getattr(self, f"_{q.action}")(q), query.payload)
+        except BaseException:
+            for undo in reversed(self._undo):
+                undo()
+            raise
+        finally:
+            self._undo = None
+
+    def _delete(self, query: Query) -> QueryResult:
+        table = self._table(query.table)
+        rows = self._matching(query)
+        for row in rows:
+            del table[row["id"]]
+            if self._undo is not None:
+                self._undo.append(lambda row=row: table.__setitem__(row["id"], row))
+        return QueryResult(data=rows)
@@ -0,0 +1,371 @@
+"""
+Direct Postgres storage engine via asyncpg
+
+Skips the PostgREST hop: queries go straight to Postgres over a pooled
+connection set. Every query shape is compiled to stable SQL text, so
+asyncpg's per-connection statement cache parses and plans it once and
+then reuses the prepared statement; the hot shapes are prepared eagerly
+when a pooled connection is opened.
+"""
+from datetime import datetime, date, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+import json
+
+try:
+    import asyncpg
+except ImportError:  # optional dependency, only needed for DATABASE_ENGINE=postgres
+    asyncpg = None
+
+from core.config import settings
+from core.engines.base import StorageEngine, Query, QueryResult, DatabaseError, NotFoundError, dumps, normalize
+from core.procedures import PROCEDURES_SQL
+from core.projections import ID_COLUMNS, AGENT_COLUMNS, CONVERSATION_COLUMNS
+from core.tables import TABLES, INDEXES
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+SQL_TYPES = {"text": "text", "json": "jsonb", "bool": "boolean", "int": "integer", "float": "double precision"}
+
+# Hot query shapes prepared on every new pooled connection
+NIL_ID = "00000000-0000-0000-0000-000000000000"
+HOT_QUERIES = [
+    # Agent by id
+    Query(table="agents", columns=AGENT_COLUMNS, filters=[("eq", "id", NIL_ID)]),
+    # Conversation ownership check
+    Query(table="conversations", columns=ID_COLUMNS, filters=[("eq", "id", NIL_ID), ("eq", "user_id", NIL_ID)]),
+    # Conversation list by user, first page and keyset page
+    Query(
+        table="conversations", columns=CONVERSATION_COLUMNS, filters=[("eq", "user_id", NIL_ID)],
+        order=[("updated_at", True), ("id", True)], offset=0, limit=50
+    ),
+    Query(
+        table="conversations", columns=CONVERSATION_COLUMNS,
+        filters=[("eq", "user_id", NIL_ID), ("row_lt", ("updated_at", "id"), ["2000-01-01T00:00:00", NIL_ID])],
+        order=[("updated_at", True), ("id", True)], limit=51
+    ),
+    # Message insert
+    Query(table="messages", action="insert", payload={
+        "id": NIL_ID,
+        "conversation_id": NIL_ID,
+        "role": "user",
+        "content": "",
+        "metadata": {},
+        "timestamp": "2000-01-01T00:00:00",
+    }),
+]
+
+class _Rollback(Exception):
+    """Aborts a warm-up transaction"""
+    pass
+
+def _to_json(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert asyncpg values to the JSON-compatible shapes PostgREST returns"""
+    converted = {}
+    for key, value in row.items():
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, UUID):
+            value = str(value)
+        elif isinstance(value, Decimal):
+            value = float(value)
+        converted[key] = value
+    return converted
+
+class PostgresEngine(StorageEngine):
+    """Talks to Postgres directly over an asyncpg connection pool"""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, create_tables: bool = False):
+        self.dsn = dsn
+        self.create_tables = create_tables
+        self.pool = None
+        self.columns: Dict[str, Dict[str, str]] = {}
+
+    async def connect(self):
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is required for DATABASE_ENGINE=postgres")
+        if not self.dsn:
+            raise ValueError("Missing DATABASE_URL")
+
+        if self.create_tables:
+            connection = await asyncpg.connect(self.dsn)
+            try:
+                await self._create_tables(connection)
+            finally:
+                await connection.close()
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=1,
+            max_size=settings.DATABASE_POOL_SIZE,
+            max_inactive_connection_lifetime=settings.DATABASE_POOL_KEEPALIVE,
+            statement_cache_size=settings.DATABASE_STATEMENT_CACHE_SIZE,
+            command_timeout=settings.DATABASE_TIMEOUT,
+            init=self._init_connection,
+        )
+
+    async def _create_tables(self, connection):
+        """Create the API tables with generic types (local testing only)"""
+        for table, columns in TABLES.items():
+            definitions = ", ".join(
+                f'"{c.name}" {SQL_TYPES[c.type]}'
+                + (" PRIMARY KEY" if c.name == "id" else "")
+                + (f" DEFAULT {self._literal(c.default)}" if c.default is not None else "")
+                for c in columns
+            )
+            await connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({definitions})')
+            # Tables created by an older build pick up columns added since
+            for c in columns:
+                await connection.execute(
+                    f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "{c.name}" {SQL_TYPES[c.type]}'
+                    + (f" DEFAULT {self._literal(c.default)}" if c.default is not None else "")
+                )
+
+        for table, indexes in INDEXES.items():
+            for index in indexes:
+                name = f"idx_{table}_{'_'.join(index)}"
+                cols = ", ".join(f'"{c}"' for c in index)
+                await connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})')
+
+        for sql in PROCEDURES_SQL.values():
+            await connection.execute(sql)
+
+    @staticmethod
+    def _literal(value: Any) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, (dict, list)):
+            return "'" + json.dumps(value).replace("'", "''") + "'::jsonb"
+        return "'" + str(value).replace("'", "''") + "'"
+
+    async def _load_columns(self, connection):
+        rows = await connection.fetch(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = 'public'"
+        )
+        columns: Dict[str, Dict[str, str]] = {}
+        for row in rows:
+            columns.setdefault(row["table_name"], {})[row["column_name"]] = row["data_type"]
+        self.columns = columns
+
+    async def _init_connection(self, connection):
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name, encoder=dumps, decoder=json.loads, schema="pg_catalog"
+            )
+        if not self.columns:
+            await self._load_columns(connection)
+
+        if settings.DATABASE_STATEMENT_CACHE_SIZE:
+            await self._prepare_hot_queries(connection)
+
+    async def _prepare_hot_queries(self, connection):
+        """Prepare hot statements so the first request on a connection skips parse/plan.
+
+        Each statement runs once inside a transaction that is always rolled
+        back; the prepared statement outlives the transaction in asyncpg's
+        per-connection cache.
+        """
+        for query in HOT_QUERIES:
+            if query.table not in self.columns:
+                continue
+            try:
+                async with connection.transaction():
+                    await getattr(self, f"_{query.action}")(connection, query)
+                    raise _Rollback()
+            except _Rollback:
+                pass
+            except (asyncpg.PostgresError, DatabaseError, ValueError, TypeError) as e:
+                logger.debug(f"Skipped preparing hot query on {query.table}: {str(e)}")
+
+    # Value conversion
+
+    def _column_type(self, table: str, column: str) -> str:
+        columns = self.columns.get(table)
+        if columns is None:
+            raise DatabaseError(f"Unknown table: {table}")
+        if column not in columns:
+            raise DatabaseError(f"Unknown column for {table}: {column}")
+        return columns[column]
+
+    def _encode(self, table: str, column: str, value: Any) -> Any:
+        column_type = self._column_type(table, column)
+        if value is None or column_type in ("json", "jsonb"):
+            return value
+        value = normalize(value)
+        if column_type.startswith("timestamp"):
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if column_type == "timestamp with time zone" and value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value
+        if column_type == "date" and isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        if column_type == "numeric" and isinstance(value, float):
+            return Decimal(str(value))
+        if column_type in ("text", "character varying") and not isinstance(value, str):
+            return str(value)
+        return value
+
+    # SQL compilation
+
+    def _quote(self, table: str, column: str) -> str:
+        self._column_type(table, column)
+        return f'"{column}"'
+
+    def _where(self, query: Query, params: List[Any]) -> str:
+        clauses = []
+        for op, column, value in query.filters:
+            if op in ("row_gt", "row_lt"):
+                placeholders = []
+                for c, v in zip(column, value):
+                    params.append(self._encode(query.table, c, v))
+                    placeholders.append(f"${len(params)}")
+                quoted = ", ".join(self._quote(query.table, c) for c in column)
+                clauses.append(f"({quoted}) {'>' if op == 'row_gt' else '<'} ({', '.join(placeholders)})")
+                continue
+            quoted = self._quote(query.table, column)
+            if op == "in":
+                params.append([self._encode(query.table, column, v) for v in value])
+                clauses.append(f"{quoted} = ANY(${len(params)})")
+            elif op in OPERATORS:
+                if value is None and op in ("eq", "neq"):
+                    clauses.append(f"{quoted} IS {'NOT ' if op == 'neq' else ''}NULL")
+                    continue
+                params.append(self._encode(query.table, column, value))
+                clauses.append(f"{quoted} {OPERATORS[op]} ${len(params)}")
+            else:
+                raise DatabaseError(f"Unsupported filter: {op}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    def _select_list(self, query: Query) -> str:
+        if query.columns.strip() == "*":
+            return "*"
+        return ", ".join(self._quote(query.table, c.strip()) for c in query.columns.split(",") if c.strip())
+
+    def _compile_select(self, query: Query) -> Tuple[str, List[Any]]:
+        params: List[Any] = []
+        where = self._where(query, params)
+        sql = f'SELECT {self._select_list(query)} FROM "{query.table}"{where}'
+        if query.order:
+            sql += " ORDER BY " + ", ".join(
+                f"{self._quote(query.table, column)} {'DESC' if desc else 'ASC'}" for column, desc in query.order
+            )
+        if query.limit is not None:
+            params.append(query.limit)
+            sql += f" LIMIT ${len(params)}"
+        if query.offset is not None:
+            params.append(query.offset)
+            sql += f" OFFSET ${len(params)}"
+        return sql, params
+
+    # Execution
+
+    async def execute(self, query: Query) -> QueryResult:
+        if self.pool is None:
+            raise DatabaseError("Postgres engine not connected")
+        if query.action != "rpc" and query.table not in self.columns:
+            raise DatabaseError(f"Unknown table: {query.table}")
+        handler = getattr(self, f"_{query.action}", None)
+        if handler is None:
+            raise DatabaseError(f"Unsupported action: {query.action}")
+        try:
+            async with self.pool.acquire() as connection:
+                return await handler(connection, query)
+        except asyncpg.PostgresError as e:
+            if getattr(e, "sqlstate", None) == "P0002":
+                raise NotFoundError(str(e))
+            raise DatabaseError(str(e))
+        except (ValueError, TypeError) as e:
+            raise DatabaseError(str(e))
+
+    async def _select(self, connection, query: Query) -> QueryResult:
+        if query.columns.strip() == "count":
+            params: List[Any] = []
+            where = self._where(query, params)
+            total = await connection.fetchval(f'SELECT count(*) FROM "{query.table}"{where}', *params)
+            return QueryResult(data=[{"count": total}], count=total)
+
+        total = None
+        if query.count:
+            params = []
+            where = self._where(query, params)
+            total = await connection.fetchval(f'SELECT count(*) FROM "{query.table}"{where}', *params)
+
+        sql, params = self._compile_select(query)
+        rows = await connection.fetch(sql, *params)
+        return QueryResult(data=[_to_json(dict(row)) for row in rows], count=total)
+
+    async def _insert(self, connection, query: Query) -> QueryResult:
+        records = query.payload if isinstance(query.payload, list) else [query.payload]
+        if not records:
+            return QueryResult(data=[])
+
+        names: List[str] = []
+        for record in records:
+            names.extend(name for name in record if name not in names)
+
+        params: List[Any] = []
+        values = []
+        for record in records:
+            placeholders = []
+            for name in names:
+                if name in record:
+                    params.append(self._encode(query.table, name, record[name]))
+                    placeholders.append(f"${len(params)}")
+                else:
+                    placeholders.append("DEFAULT")
+            values.append(f"({', '.join(placeholders)})")
+
+        sql = (
+            f'INSERT INTO "{query.table}" ({", ".join(self._quote(query.table, n) for n in names)}) '
+            f'VALUES {", ".join(values)} RETURNING *'
+        )
+        rows = await connection.fetch(sql, *params)
+        return QueryResult(data=[_to_json(dict(row)) for row in rows])
+
+    async def _update(self, connection, query: Query) -> QueryResult:
+        params: List[Any] = []
+        assignments = []
+        for name, value in query.payload.items():
+            params.append(self._encode(query.table, name, value))
+            assignments.append(f"{self._quote(query.table, name)} = ${len(params)}")
+        where = self._where(query, params)
+
+        rows = await connection.fetch(
+            f'UPDATE "{query.table}" SET {", ".join(assignments)}{where} RETURNING *', *params
+        )
+        return QueryResult(data=[_to_json(dict(row)) for row in rows])
+
+    async def _delete(self, connection, query: Query) -> QueryResult:
+        params: List[Any] = []
+        where = self._where(query, params)
+        rows = await connection.fetch(f'DELETE FROM "{query.table}"{where} RETURNING *', *params)
+        return QueryResult(data=[_to_json(dict(row)) for row in rows])
+
+    async def _rpc(self, connection, query: Query) -> QueryResult:
+        if query.table not in PROCEDURES_SQL:
+            raise DatabaseError(f"Unknown procedure: {query.table}")
+        names = list(query.payload)
+        if not all(name.isidentifier() for name in names):
+            raise DatabaseError(f"Invalid argument name for {query.table}")
+        arguments = ", ".join(f"{name} => ${i}" for i, name in enumerate(names, start=1))
+        value = await connection.fetchval(
+            f'SELECT "{query.table}"({arguments})', *(query.payload[name] for name in names)
+        )
+        if value is None:
+            return QueryResult(data=[])
+        return QueryResult(data=value if isinstance(value, list) else [value])
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
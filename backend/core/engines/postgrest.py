@@ -0,0 +1,151 @@
+"""
+PostgREST (Supabase) storage engine over a pooled keep-alive HTTP client
+"""
+from typing import Any, List, Optional, Tuple
+import httpx
+
+from core.config import settings
+from core.engines.base import StorageEngine, Query, QueryResult, DatabaseError, NotFoundError, dumps, normalize
+
+class PostgrestEngine(StorageEngine):
+    """Translates queries into PostgREST requests"""
+
+    name = "supabase"
+
+    def __init__(self, url: str, api_key: str):
+        self.rest_url = f"{url.rstrip('/')}/rest/v1"
+        self.client = httpx.AsyncClient(
+            base_url=self.rest_url,
+            headers={
+                "apikey": api_key,
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=settings.DATABASE_POOL_SIZE,
+                max_keepalive_connections=settings.DATABASE_POOL_SIZE,
+                keepalive_expiry=settings.DATABASE_POOL_KEEPALIVE,
+            ),
+            timeout=settings.DATABASE_TIMEOUT,
+        )
+
+    async def execute(self, query: Query) -> QueryResult:
+        """Translate a query into a PostgREST request and run it"""
+        params = self._build_params(query)
+        headers = {}
+        prefer = []
+
+        if query.action == "select":
+            method = "GET"
+            if query.count:
+                prefer.append(f"count={query.count}")
+        elif query.action == "insert":
+            method = "POST"
+            prefer.append("return=representation")
+        elif query.action == "update":
+            method = "PATCH"
+            prefer.append("return=representation")
+        elif query.action == "delete":
+            method = "DELETE"
+            prefer.append("return=representation")
+        elif query.action == "rpc":
+            method = "POST"
+        else:
+            raise DatabaseError(f"Unsupported action: {query.action}")
+
+        if prefer:
+            headers["Prefer"] = ",".join(prefer)
+
+        path = f"/rpc/{query.table}" if query.action == "rpc" else f"/{query.table}"
+        content = dumps(query.payload) if query.payload is not None else None
+        response = await self.client.request(
+            method, path, params=params, headers=headers, content=content
+        )
+
+        if response.status_code >= 400:
+            if self._error_code(response) == "P0002":
+                raise NotFoundError(f"{response.status_code} {response.text}")
+            raise DatabaseError(f"{response.status_code} {response.text}")
+
+        data = response.json() if response.content else []
+        if not isinstance(data, list):
+            data = [] if data is None else [data]
+        return QueryResult(data=data, count=self._parse_count(response))
+
+    @staticmethod
+    def _error_code(response: httpx.Response) -> Optional[str]:
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        return body.get("code") if isinstance(body, dict) else None
+
+    def _build_params(self, query: Query) -> List[Tuple[str, str]]:
+        params = []
+        if query.action == "select":
+            params.append(("select", query.columns))
+
+        for op, column, value in query.filters:
+            if op in ("row_gt", "row_lt"):
+                params.append(("or", self._row_filter(op, column, value)))
+            elif op == "in":
+                encoded = ",".join(self._encode_in_value(v) for v in value)
+                params.append((column, f"in.({encoded})"))
+            else:
+                params.append((column, f"{op}.{self._encode_value(value)}"))
+
+        if query.order:
+            params.append((
+                "order",
+                ",".join(f"{column}.{'desc' if desc else 'asc'}" for column, desc in query.order)
+            ))
+        if query.offset is not None:
+            params.append(("offset", str(query.offset)))
+        if query.limit is not None:
+            params.append(("limit", str(query.limit)))
+        return params
+
+    @staticmethod
+    def _encode_value(value: Any) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if value is None:
+            return "null"
+        return str(normalize(value))
+
+    @classmethod
+    def _encode_in_value(cls, value: Any) -> str:
+        encoded = cls._encode_value(value)
+        if any(c in encoded for c in ',()"'):
+            encoded = '"' + encoded.replace('"', '\\"') + '"'
+        return encoded
+
+    @classmethod
+    def _encode_logic_value(cls, value: Any) -> str:
+        # Always quoted: timestamps carry reserved characters inside logical trees
+        return '"' + cls._encode_value(value).replace('"', '\\"') + '"'
+
+    @classmethod
+    def _row_filter(cls, op: str, columns: Tuple[str, ...], values: List[Any]) -> str:
+        """Expand a row-value comparison into PostgREST's logical tree syntax"""
+        compare = "gt" if op == "row_gt" else "lt"
+        quote = cls._encode_logic_value
+        terms = []
+        for i, column in enumerate(columns):
+            parts = [f"{columns[j]}.eq.{quote(values[j])}" for j in range(i)]
+            parts.append(f"{column}.{compare}.{quote(values[i])}")
+            terms.append(parts[0] if len(parts) == 1 else f"and({','.join(parts)})")
+        return f"({','.join(terms)})"
+
+    @staticmethod
+    def _parse_count(response: httpx.Response) -> Optional[int]:
+        content_range = response.headers.get("content-range")
+        if not content_range or "/" not in content_range:
+            return None
+        total = content_range.split("/")[-1]
+        return int(total) if total.isdigit() else None
+
+    async def close(self):
+        """Close pooled connections"""
+        await self.client.aclose()
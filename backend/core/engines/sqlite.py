@@ -0,0 +1,241 @@
+"""
+SQLite storage engine for local load testing and CI benchmarking
+
+All statements run on a single dedicated thread so the event loop never
+blocks on disk I/O and the connection is never shared across threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+import asyncio
+import json
+import sqlite3
+import uuid
+
+from core.engines.base import StorageEngine, Query, QueryResult, DatabaseError, dumps, normalize
+from core.procedures import emulate
+from core.tables import TABLES, INDEXES, build_row, get_columns, parse_columns
+
+SQL_TYPES = {"text": "TEXT", "json": "TEXT", "bool": "INTEGER", "int": "INTEGER", "float": "REAL"}
+
+OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+class SQLiteEngine(StorageEngine):
+    """Stores tables in a SQLite database file (or ":memory:")"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection: sqlite3.Connection = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.types = {table: {c.name: c.type for c in get_columns(table)} for table in TABLES}
+        self._in_procedure = False  # statements of an emulated procedure share its transaction
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def connect(self):
+        await self._run(self._connect)
+
+    def _connect(self):
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        for table, columns in TABLES.items():
+            definitions = ", ".join(
+                f'"{c.name}" {SQL_TYPES[c.type]}' + (" PRIMARY KEY" if c.name == "id" else "")
+                for c in columns
+            )
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({definitions})')
+
+        for table, indexes in INDEXES.items():
+            for index in indexes:
+                name = f"idx_{table}_{'_'.join(index)}"
+                cols = ", ".join(f'"{c}"' for c in index)
+                self.connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})')
+        self.connection.commit()
+
+    # Value conversion
+
+    def _encode(self, table: str, column: str, value: Any) -> Any:
+        value = normalize(value)
+        if value is None:
+            return None
+        column_type = self.types[table].get(column, "text")
+        if column_type == "json":
+            return json.dumps(value)
+        if column_type == "bool":
+            return int(bool(value))
+        return value
+
+    def _decode_row(self, table: str, row: sqlite3.Row) -> Dict[str, Any]:
+        decoded = {}
+        for column in row.keys():
+            value = row[column]
+            column_type = self.types[table].get(column, "text")
+            if value is not None:
+                if column_type == "json":
+                    value = json.loads(value)
+                elif column_type == "bool":
+                    value = bool(value)
+            decoded[column] = value
+        return decoded
+
+    # SQL compilation
+
+    def _quote(self, table: str, column: str) -> str:
+        if column not in self.types[table]:
+            raise DatabaseError(f"Unknown column for {table}: {column}")
+        return f'"{column}"'
+
+    def _where(self, query: Query) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for op, column, value in query.filters:
+            if op in ("row_gt", "row_lt"):
+                quoted = ", ".join(self._quote(query.table, c) for c in column)
+                clauses.append(f"({quoted}) {'>' if op == 'row_gt' else '<'} ({', '.join('?' for _ in column)})")
+                params.extend(self._encode(query.table, c, v) for c, v in zip(column, value))
+                continue
+            quoted = self._quote(query.table, column)
+            if op == "in":
+                if not value:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{quoted} IN ({', '.join('?' for _ in value)})")
+                params.extend(self._encode(query.table, column, v) for v in value)
+            elif op in OPERATORS:
+                if value is None and op in ("eq", "neq"):
+                    clauses.append(f"{quoted} IS {'NOT ' if op == 'neq' else ''}NULL")
+                    continue
+                clauses.append(f"{quoted} {OPERATORS[op]} ?")
+                params.append(self._encode(query.table, column, value))
+            else:
+                raise DatabaseError(f"Unsupported filter: {op}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _order(self, query: Query) -> str:
+        if not query.order:
+            return ""
+        terms = []
+        for column, desc in query.order:
+            quoted = self._quote(query.table, column)
+            # Match Postgres: NULLs last ascending, first descending
+            terms.append(f"{quoted} IS NULL {'DESC' if not desc else 'ASC'}, {quoted} {'DESC' if desc else 'ASC'}")
+        return " ORDER BY " + ", ".join(terms)
+
+    # Execution
+
+    async def execute(self, query: Query) -> QueryResult:
+        if query.action != "rpc" and query.table not in TABLES:
+            raise DatabaseError(f"Unknown table: {query.table}")
+        handler = getattr(self, f"_{query.action}", None)
+        if handler is None:
+            raise DatabaseError(f"Unsupported action: {query.action}")
+        return await self._run(self._transaction, handler, query)
+
+    def _transaction(self, handler, query: Query) -> QueryResult:
+        try:
+            return handler(query)
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            raise DatabaseError(str(e))
+        except ValueError as e:
+            raise DatabaseError(str(e))
+
+    def _select(self, query: Query) -> QueryResult:
+        where, params = self._where(query)
+
+        if query.columns.strip() == "count":
+            total = self.connection.execute(f'SELECT COUNT(*) FROM "{query.table}"{where}', params).fetchone()[0]
+            return QueryResult(data=[{"count": total}], count=total)
+
+        total = None
+        if query.count:
+            total = self.connection.execute(f'SELECT COUNT(*) FROM "{query.table}"{where}', params).fetchone()[0]
+
+        columns = ", ".join(self._quote(query.table, c) for c in parse_columns(query.table, query.columns))
+        sql = f'SELECT {columns} FROM "{query.table}"{where}{self._order(query)}'
+        if query.limit is not None or query.offset is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [query.limit if query.limit is not None else -1, query.offset or 0]
+
+        rows = self.connection.execute(sql, params).fetchall()
+        return QueryResult(data=[self._decode_row(query.table, row) for row in rows], count=total)
+
+    def _insert(self, query: Query) -> QueryResult:
+        records = query.payload if isinstance(query.payload, list) else [query.payload]
+        rows = []
+        for record in records:
+            row = json.loads(dumps(build_row(query.table, record)))
+            if not row.get("id"):
+                row["id"] = str(uuid.uuid4())
+            rows.append(row)
+
+        if rows:
+            names = list(rows[0].keys())
+            sql = (
+                f'INSERT INTO "{query.table}" ({", ".join(self._quote(query.table, n) for n in names)}) '
+                f'VALUES ({", ".join("?" for _ in names)})'
+            )
+            self.connection.executemany(
+                sql, [[self._encode(query.table, n, row[n]) for n in names] for row in rows]
+            )
+            self._commit()
+
+        return QueryResult(data=rows)
+
+    def _update(self, query: Query) -> QueryResult:
+        build_row(query.table, query.payload)
+        where, params = self._where(query)
+
+        ids = [r[0] for r in self.connection.execute(f'SELECT "id" FROM "{query.table}"{where}', params).fetchall()]
+        if not ids:
+            return QueryResult(data=[])
+
+        assignments = ", ".join(f"{self._quote(query.table, c)} = ?" for c in query.payload)
+        values = [self._encode(query.table, c, v) for c, v in query.payload.items()]
+        placeholders = ", ".join("?" for _ in ids)
+        self.connection.execute(
+            f'UPDATE "{query.table}" SET {assignments} WHERE "id" IN ({placeholders})', values + ids
+        )
+        self._commit()
+
+        rows = self.connection.execute(
+            f'SELECT * FROM "{query.table}" WHERE "id" IN ({placeholders})', ids
+        ).fetchall()
+        return QueryResult(data=[self._decode_row(query.table, row) for row in rows])
+
+    def _delete(self, query: Query) -> QueryResult:
+        where, params = self._where(query)
+        rows = self.connection.execute(f'SELECT * FROM "{query.table}"{where}', params).fetchall()
+        if rows:
+            self.connection.execute(f'DELETE FROM "{query.table}"{where}', params)
+            self._commit()
+        return QueryResult(data=[self._decode_row(query.table, row) for row in rows])
+
+    def _commit(self):
+        if not self._in_procedure:
+            self.connection.commit()
+
+    def _rpc(self, query: Query) -> QueryResult:
+        # One transaction for the whole procedure, as on Postgres
+        self._in_procedure = True
+        try:
+            result = emulate(query.table, lambda q: getattr(self, f"_{q.action}")(q), query.payload)
+        except BaseException:
+            self.connection.rollback()
+            raise
+        finally:
+            self._in_procedure = False
+        self.connection.commit()
+        return result
+
+    async def close(self):
+        if self.connection is not None:
+            await self._run(self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,287 @@
+"""
+Cross-worker cache invalidation
+
+Caches register an eviction handler per cache name with the global
+`invalidation_bus`. A handler that changes cached data publishes
+`(cache, tenant, key)` once the write is done: the bus evicts locally at
+once and sends the message to every other worker over the
+CACHE_INVALIDATION_TRANSPORT, where the same handlers run. A key of None
+evicts everything the cache holds for the tenant.
+
+Transports:
+
+- `loopback` (default) - delivers within this process only, for a single
+  worker and for tests. When WEB_CONCURRENCY says more than one worker is
+  running, `start` refuses to run outside development (where it only logs
+  a warning), since each worker would keep serving its stale copies
+- `redis` - pub/sub on CACHE_INVALIDATION_CHANNEL at REDIS_URL
+- `postgres` - LISTEN/NOTIFY on CACHE_INVALIDATION_CHANNEL over one
+  dedicated connection to DATABASE_URL. Publishers don't wait for it:
+  messages are queued and a background task sends everything queued so far
+  in one round trip
+
+Delivery is best effort: a message lost while a transport is down leaves
+entries to expire by their TTL. The time from publish to eviction on a
+receiving worker is recorded under `cache_invalidation.latency_seconds`.
+"""
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, List, Optional
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for the redis transport
+    aioredis = None
+
+try:
+    import asyncpg
+except ImportError:  # optional dependency, only needed for the postgres transport
+    asyncpg = None
+
+from core.config import settings
+from core.dataloader import detach_loader
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 1.0  # seconds between attempts to resubscribe
+
+# handler(tenant, key) evicts the matching entries of one cache in this process
+Handler = Callable[[Optional[str], Optional[Hashable]], None]
+
+class LoopbackTransport:
+    """Delivers messages to the buses subscribed in this process"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[str], None]] = []
+
+    async def subscribe(self, deliver: Callable[[str], None]):
+        self._subscribers.append(deliver)
+
+    async def publish(self, payload: str):
+        for deliver in list(self._subscribers):
+            deliver(payload)
+
+    async def close(self):
+        self._subscribers.clear()
+
+class RedisTransport:
+    """Redis pub/sub, resubscribing after connection errors"""
+
+    def __init__(self, url: Optional[str] = None, channel: Optional[str] = None):
+        if aioredis is None:
+            raise RuntimeError("CACHE_INVALIDATION_TRANSPORT=redis needs the redis package")
+        self.client = aioredis.from_url(url or settings.REDIS_URL)
+        self.channel = channel or settings.CACHE_INVALIDATION_CHANNEL
+        self._listener: Optional[asyncio.Task] = None
+
+    async def subscribe(self, deliver: Callable[[str], None]):
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[str], None]):
+        detach_loader()
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        deliver(message["data"].decode())
+            except Exception as e:
+                logger.error(f"❌ Invalidation subscription lost: {str(e)}")
+                metrics.increment("cache_invalidation.subscription_errors")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def publish(self, payload: str):
+        await self.client.publish(self.channel, payload)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.client.aclose()
+
+class PostgresTransport:
+    """Postgres LISTEN/NOTIFY over one dedicated connection, notifying in the background"""
+
+    def __init__(self, dsn: Optional[str] = None, channel: Optional[str] = None):
+        if asyncpg is None:
+            raise RuntimeError("CACHE_INVALIDATION_TRANSPORT=postgres needs the asyncpg package")
+        self.dsn = dsn or settings.DATABASE_URL
+        self.channel = channel or settings.CACHE_INVALIDATION_CHANNEL
+        self._connection = None
+        self._deliver: Optional[Callable[[str], None]] = None
+        self._lock = asyncio.Lock()
+        self._reconnector: Optional[asyncio.Task] = None
+        self._outbox: List[str] = []
+        self._sender: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def _connect(self):
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._on_terminate)
+        if self._deliver is not None:
+            await self._connection.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._deliver(payload)
+
+    def _on_terminate(self, connection):
+        if not self._closing and (self._reconnector is None or self._reconnector.done()):
+            self._reconnector = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        # Notifications sent while disconnected are lost
+        detach_loader()
+        while not self._closing:
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                async with self._lock:
+                    if self._connection is None or self._connection.is_closed():
+                        await self._connect()
+                return
+            except Exception as e:
+                logger.error(f"❌ Invalidation subscription lost: {str(e)}")
+                metrics.increment("cache_invalidation.subscription_errors")
+
+    async def subscribe(self, deliver: Callable[[str], None]):
+        self._deliver = deliver
+        async with self._lock:
+            await self._connect()
+
+    async def publish(self, payload: str):
+        self._outbox.append(payload)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send())
+
+    async def _send(self):
+        detach_loader()
+        while self._outbox:
+            payloads, self._outbox = self._outbox, []
+            try:
+                async with self._lock:
+                    if self._connection is None or self._connection.is_closed():
+                        await self._connect()
+                    await self._connection.execute(
+                        "SELECT pg_notify($1, payload) FROM unnest($2::text[]) AS payload",
+                        self.channel, payloads
+                    )
+            except Exception as e:
+                # Lost like any message sent while the transport is down; TTLs are the backstop
+                logger.error(f"❌ Failed to publish cache invalidation: {str(e)}")
+                metrics.increment("cache_invalidation.publish_errors", len(payloads))
+
+    async def close(self):
+        if self._sender is not None:
+            await asyncio.gather(self._sender, return_exceptions=True)
+            self._sender = None
+        self._closing = True
+        if self._reconnector is not None:
+            self._reconnector.cancel()
+            await asyncio.gather(self._reconnector, return_exceptions=True)
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+def create_transport():
+    """Create the transport selected by CACHE_INVALIDATION_TRANSPORT"""
+    if settings.CACHE_INVALIDATION_TRANSPORT == "loopback":
+        return LoopbackTransport()
+    if settings.CACHE_INVALIDATION_TRANSPORT == "redis":
+        return RedisTransport()
+    if settings.CACHE_INVALIDATION_TRANSPORT == "postgres":
+        return PostgresTransport()
+    raise ValueError(f"Unknown cache invalidation transport: {settings.CACHE_INVALIDATION_TRANSPORT}")
+
+class InvalidationBus:
+    """Fans cache evictions out to every worker"""
+
+    def __init__(self, transport=None):
+        self.origin = uuid.uuid4().hex  # tells this worker's own messages apart
+        self._transport = transport
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._subscribed = False
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = create_transport()
+        return self._transport
+
+    def register(self, cache: str, handler: Handler):
+        """Run `handler(tenant, key)` whenever `cache` is invalidated"""
+        self._handlers[cache].append(handler)
+
+    async def start(self):
+        """Subscribe to invalidations from other workers"""
+        if self._subscribed:
+            return
+        if isinstance(self.transport, LoopbackTransport) and settings.WEB_CONCURRENCY > 1:
+            problem = (
+                f"CACHE_INVALIDATION_TRANSPORT=loopback with WEB_CONCURRENCY={settings.WEB_CONCURRENCY}: "
+                "writes will not evict other workers' cached copies until they expire"
+            )
+            if settings.ENVIRONMENT != "development":
+                raise RuntimeError(f"{problem}; use the redis or postgres transport")
+            logger.warning(f"⚠️ {problem}")
+        try:
+            await self.transport.subscribe(self._receive)
+            self._subscribed = True
+        except Exception as e:
+            logger.error(f"❌ Failed to subscribe to cache invalidations: {str(e)}")
+            metrics.increment("cache_invalidation.subscription_errors")
+
+    async def publish(self, cache: str, tenant: Optional[str] = None, key: Optional[Hashable] = None):
+        """Evict `key` (or all of `tenant`'s entries) from `cache` in every worker"""
+        self._apply(cache, tenant, key)
+        payload = json.dumps({
+            "origin": self.origin,
+            "cache": cache,
+            "tenant": tenant,
+            "key": list(key) if isinstance(key, tuple) else key,
+            "sent_at": time.time()
+        }, separators=(",", ":"))
+        try:
+            await self.transport.publish(payload)
+        except Exception as e:
+            logger.error(f"❌ Failed to publish cache invalidation: {str(e)}")
+            metrics.increment("cache_invalidation.publish_errors")
+            return
+        metrics.increment("cache_invalidation.published")
+
+    def _receive(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.error(f"❌ Malformed cache invalidation: {payload[:200]}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        metrics.increment("cache_invalidation.received")
+        metrics.observe("cache_invalidation.latency_seconds", max(time.time() - message["sent_at"], 0.0))
+        key = message.get("key")
+        self._apply(message["cache"], message.get("tenant"), tuple(key) if isinstance(key, list) else key)
+
+    def _apply(self, cache: str, tenant: Optional[str], key: Optional[Hashable]):
+        for handler in self._handlers.get(cache, ()):
+            try:
+                handler(tenant, key)
+            except Exception as e:
+                logger.error(f"❌ Failed to evict from cache {cache}: {str(e)}")
+
+    async def close(self):
+        """Stop listening for invalidations"""
+        if self._transport is not None:
+            await self._transport.close()
+            self._transport = None
+        self._subscribed = False
+
+# Global invalidation bus
+invalidation_bus = InvalidationBus()
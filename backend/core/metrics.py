@@ -0,0 +1,75 @@
+"""
+In-process metrics registry
+
+Counters, gauges and timing summaries for the data layer, caches and auth
+paths, exposed as JSON at /metrics. Values are per worker process.
+"""
+from collections import defaultdict
+from typing import Any, Dict
+import threading
+
+class Timing:
+    """Running count/total/max of an observed duration or size"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
+
+class Metrics:
+    """Process-wide counters, gauges and timings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.timings: Dict[str, Timing] = defaultdict(Timing)
+
+    def increment(self, name: str, value: float = 1):
+        """Add to a counter"""
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a value that is reported as last set"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Record one observation of a timing"""
+        with self._lock:
+            self.timings[name].observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current values as plain JSON"""
+        with self._lock:
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": dict(sorted(self.gauges.items())),
+                "timings": {name: timing.snapshot() for name, timing in sorted(self.timings.items())},
+            }
+
+    def reset(self):
+        """Clear every counter and timing"""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+
+# Global metrics registry
+metrics = Metrics()
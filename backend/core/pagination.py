@@ -0,0 +1,34 @@
+"""
+Opaque keyset cursors
+
+A cursor encodes the sort key of the last row on a page, e.g.
+(updated_at, id). The next page starts strictly after that key, so deep
+pages cost the same as the first one and rows don't shift when new ones
+are inserted.
+"""
+from typing import Any, Dict, List, Optional
+import base64
+import json
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode a sort key as a URL-safe cursor"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor into a sort key of `size` values"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size or any(v is None for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+def next_cursor(rows: List[Dict[str, Any]], columns: List[str], limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, fetched with limit + 1 to detect a next page"""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor([last[column] for column in columns])
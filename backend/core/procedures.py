@@ -0,0 +1,128 @@
+"""
+Database-side procedures called through `db.rpc()`
+
+Each procedure has a Postgres definition (installed from database_schema.sql
+on Supabase, or by the local Postgres engine when it creates tables) and a
+Python emulation the memory and SQLite engines run against their own
+tables, all or nothing like the Postgres function. Procedures raise
+SQLSTATE P0002 (`NotFoundError`) when a row they require is missing.
+"""
+from typing import Any, Callable, Dict, List
+
+from core.engines.base import Query, QueryResult, DatabaseError, NotFoundError
+
+# Records a finished chat turn: bumps the agent's counters (which doubles as
+# the check that the agent belongs to the user) and inserts the conversation
+# with its final status in one call. Only the columns present in p_turn are
+# inserted, so the rest keep their column defaults.
+RECORD_CHAT_TURN_SQL = """
+CREATE OR REPLACE FUNCTION record_chat_turn(p_turn jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_turn conversations%ROWTYPE;
+    v_columns text;
+    v_result jsonb;
+BEGIN
+    v_turn := jsonb_populate_record(NULL::conversations, p_turn);
+
+    UPDATE agents SET
+        total_conversations = total_conversations + 1,
+        completed_conversations = completed_conversations + COALESCE((v_turn.status = 'completed')::int, 0),
+        failed_conversations = failed_conversations + COALESCE((v_turn.status = 'failed')::int, 0),
+        last_active = GREATEST(last_active, v_turn.updated_at)
+    WHERE id = v_turn.agent_id AND user_id = v_turn.user_id AND status <> 'deleted';
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Agent not found' USING ERRCODE = 'P0002';
+    END IF;
+
+    SELECT string_agg(quote_ident(attname), ', ') INTO v_columns
+    FROM pg_attribute
+    WHERE attrelid = 'conversations'::regclass AND attnum > 0 AND NOT attisdropped AND p_turn ? attname;
+
+    EXECUTE format(
+        'INSERT INTO conversations (%1$s) SELECT %1$s FROM jsonb_populate_record(NULL::conversations, $1) '
+        'RETURNING to_jsonb(conversations.*)',
+        v_columns
+    ) INTO v_result USING p_turn;
+    RETURN v_result;
+END;
+$$;
+"""
+
+# Applies agent counter deltas, given as [{id, total_conversations, ...,
+# last_active}], with atomic `column = column + delta` updates.
+INCREMENT_AGENT_COUNTERS_SQL = """
+CREATE OR REPLACE FUNCTION increment_agent_counters(p_deltas jsonb)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE agents AS a SET
+            total_conversations = a.total_conversations + COALESCE(d.total_conversations, 0),
+            completed_conversations = a.completed_conversations + COALESCE(d.completed_conversations, 0),
+            failed_conversations = a.failed_conversations + COALESCE(d.failed_conversations, 0),
+            last_active = GREATEST(a.last_active, d.last_active)
+        FROM jsonb_populate_recordset(NULL::agents, p_deltas) AS d
+        WHERE a.id = d.id
+        RETURNING a.id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('id', id)), '[]'::jsonb) FROM updated;
+$$;
+"""
+
+PROCEDURES_SQL: Dict[str, str] = {
+    "record_chat_turn": RECORD_CHAT_TURN_SQL,
+    "increment_agent_counters": INCREMENT_AGENT_COUNTERS_SQL,
+}
+
+COUNTER_COLUMNS = ("total_conversations", "completed_conversations", "failed_conversations")
+
+def _bump_agents(run: Callable[[Query], QueryResult], filters, deltas: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Add counter deltas to the matching agents; returns the agents updated"""
+    rows = run(Query(table="agents", columns="id,last_active," + ",".join(COUNTER_COLUMNS), filters=filters)).data
+    last_active = deltas.get("last_active")
+    for row in rows:
+        changes = {column: (row[column] or 0) + (deltas.get(column) or 0) for column in COUNTER_COLUMNS}
+        if last_active and (row["last_active"] is None or last_active > row["last_active"]):
+            changes["last_active"] = last_active
+        run(Query(table="agents", action="update", payload=changes, filters=[("eq", "id", row["id"])]))
+    return rows
+
+def record_chat_turn(run: Callable[[Query], QueryResult], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Emulation of record_chat_turn for local engines"""
+    turn = params["p_turn"]
+    deltas = {
+        "total_conversations": 1,
+        "completed_conversations": int(turn.get("status") == "completed"),
+        "failed_conversations": int(turn.get("status") == "failed"),
+        "last_active": turn.get("updated_at"),
+    }
+    owned = _bump_agents(
+        run, [("eq", "id", turn["agent_id"]), ("eq", "user_id", turn["user_id"]), ("neq", "status", "deleted")], deltas
+    )
+    if not owned:
+        raise NotFoundError("Agent not found")
+    return run(Query(table="conversations", action="insert", payload=turn)).data[0]
+
+def increment_agent_counters(run: Callable[[Query], QueryResult], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Emulation of increment_agent_counters for local engines"""
+    updated = []
+    for deltas in params["p_deltas"]:
+        if _bump_agents(run, [("eq", "id", deltas["id"])], deltas):
+            updated.append({"id": deltas["id"]})
+    return updated
+
+EMULATIONS: Dict[str, Callable[[Callable[[Query], QueryResult], Dict[str, Any]], Any]] = {
+    "record_chat_turn": record_chat_turn,
+    "increment_agent_counters": increment_agent_counters,
+}
+
+def emulate(name: str, run: Callable[[Query], QueryResult], params: Dict[str, Any]) -> QueryResult:
+    """Run a procedure's emulation with a synchronous query runner"""
+    procedure = EMULATIONS.get(name)
+    if procedure is None:
+        raise DatabaseError(f"Unknown procedure: {name}")
+    result = procedure(run, params or {})
+    return QueryResult(data=result if isinstance(result, list) else [result])
@@ -0,0 +1,69 @@
+"""
+Per-endpoint column projections
+
+Endpoints select only the columns they read instead of `select('*')`:
+response models map to the model fields stored on the table, and
+ownership checks and analytics scans use explicit field lists. Keeping
+the select lists here means the Postgres engine can prepare exactly the
+statements the hot endpoints send.
+"""
+from typing import Iterable, Optional, Type
+
+from pydantic import BaseModel
+
+from core.tables import column_names
+from models.agent import Agent
+from models.conversation import Conversation, ChatMessage
+from models.user import User, UserInDB, ApiKey
+
+def project(table: str, model: Optional[Type[BaseModel]] = None, fields: Iterable[str] = ()) -> str:
+    """Build a select list from a response model's stored fields plus explicit fields"""
+    names = column_names(table)
+    fields = list(fields)
+
+    unknown = [name for name in fields if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+
+    wanted = set(fields)
+    if model is not None:
+        wanted.update(name for name in model.model_fields if name in names)
+    if not wanted:
+        raise ValueError(f"Empty projection for {table}")
+
+    # Table order keeps the SQL text (and the prepared statement) stable
+    return ",".join(name for name in names if name in wanted)
+
+# Ownership checks only need to know the row exists
+ID_COLUMNS = "id"
+
+# Users
+USER_COLUMNS = project("users", User)
+LOGIN_COLUMNS = project("users", UserInDB)
+API_KEY_COLUMNS = project("api_keys", ApiKey)
+API_KEY_INDEX_COLUMNS = project("api_keys", fields=["id", "user_id", "key_hash", "permissions", "expires_at"])
+REVOKED_TOKEN_COLUMNS = project("revoked_tokens", fields=["id", "expires_at", "created_at"])
+
+# Agents
+AGENT_COLUMNS = project("agents", Agent, fields=["completed_conversations"])  # for success_rate
+AGENT_OWNER_COLUMNS = project("agents", fields=["id", "user_id"])
+AGENT_CHAT_COLUMNS = project("agents", fields=["id", "user_id", "config"])
+AGENT_STATUS_COLUMNS = project("agents", fields=["status"])
+
+# Background jobs
+PURGE_JOB_COLUMNS = project("purge_jobs", fields=["id", "target", "target_id", "status", "progress", "error", "created_at", "updated_at", "completed_at"])
+
+# Conversations
+CONVERSATION_COLUMNS = project("conversations", Conversation)
+MESSAGE_COLUMNS = project("messages", ChatMessage, fields=["id"])  # id is the keyset tiebreaker
+CONVERSATION_STATS_COLUMNS = project("conversations", fields=["id", "status"])
+CONVERSATION_STATE_COLUMNS = project("conversations", fields=["agent_id", "status"])  # status transitions
+CONVERSATION_ARCHIVE_COLUMNS = project("conversations", fields=["id", "status", "archive_key"])
+
+# Analytics scans
+OVERVIEW_COLUMNS = project("conversations", fields=["status"])
+PERFORMANCE_COLUMNS = project("conversations", fields=["status", "created_at"])
+CONVERSATION_ANALYTICS_COLUMNS = project("conversations", fields=["status", "conversation_type", "created_at"])
+COST_COLUMNS = project("conversations", fields=["agent_id", "cost", "created_at"])
+ROI_COLUMNS = project("conversations", fields=["status", "cost"])
+TREND_COLUMNS = project("conversations", fields=["created_at"])
@@ -0,0 +1,196 @@
+"""
+Sliding-window rate limits
+
+Each limiter allows `limit` hits per key over a sliding RATE_LIMIT_WINDOW,
+approximated from two fixed windows: the previous window's count, weighted
+by how much of it still overlaps the sliding window, plus the current one.
+That keeps a key down to three numbers.
+
+The counts live in a store shared by every limiter. The memory store keeps
+at most RATE_LIMIT_MAX_KEYS keys in LRU order, and entries older than two
+windows count as empty. The redis store (REDIS_URL) keeps one counter per
+key and window, expiring after two windows, so limits hold across workers.
+If Redis is unreachable, requests are allowed and counted under
+`rate_limit.store_errors`.
+"""
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+import logging
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for RATE_LIMIT_BACKEND=redis
+    aioredis = None
+
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class RateLimited(HTTPException):
+    """Too many attempts for a key"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+        )
+
+class MemoryWindowStore:
+    """Window counts in process memory, bounded and LRU-evicted"""
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or settings.RATE_LIMIT_MAX_KEYS
+        self._windows: "OrderedDict[str, list]" = OrderedDict()  # key -> [window index, current, previous]
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    async def hit(self, key: str, window_index: int) -> Tuple[int, int]:
+        """Count a hit; returns the (previous, current) window counts"""
+        entry = self._windows.get(key)
+        if entry is None or entry[0] < window_index - 1:
+            entry = [window_index, 0, 0]
+        elif entry[0] == window_index - 1:
+            entry = [window_index, 0, entry[1]]
+        entry[1] += 1
+        self._windows[key] = entry
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_keys:
+            self._windows.popitem(last=False)
+            metrics.increment("rate_limit.evictions")
+        return entry[2], entry[1]
+
+    async def reset(self, key: str, window_index: int):
+        """Forget a key's counts"""
+        self._windows.pop(key, None)
+
+    def clear(self):
+        self._windows.clear()
+
+    async def close(self):
+        pass
+
+class RedisWindowStore:
+    """Window counts in Redis, shared by every worker"""
+
+    def __init__(self, url: Optional[str] = None, window: Optional[float] = None):
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package")
+        self.client = aioredis.from_url(url or settings.REDIS_URL)
+        self.window = window or settings.RATE_LIMIT_WINDOW
+
+    async def hit(self, key: str, window_index: int) -> Tuple[int, int]:
+        """Count a hit; returns the (previous, current) window counts"""
+        current_key = f"ratelimit:{key}:{window_index}"
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, math.ceil(self.window * 2))
+            pipe.get(f"ratelimit:{key}:{window_index - 1}")
+            current, _, previous = await pipe.execute()
+        return int(previous or 0), int(current)
+
+    async def reset(self, key: str, window_index: int):
+        """Forget a key's counts"""
+        await self.client.delete(f"ratelimit:{key}:{window_index}", f"ratelimit:{key}:{window_index - 1}")
+
+    def clear(self):
+        pass
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_store():
+    """Create the store selected by RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryWindowStore()
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisWindowStore()
+    raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+
+class RateLimiter:
+    """Allows `limit` hits per key per sliding window; a limit of 0 disables it"""
+
+    def __init__(self, name: str, limit: int, window: Optional[float] = None, store=None, clock: Callable[[], float] = time.time):
+        self.name = name
+        self.limit = limit
+        self.window = window or settings.RATE_LIMIT_WINDOW
+        self._store = store
+        self._clock = clock
+
+    @property
+    def store(self):
+        global _store
+        if self._store is not None:
+            return self._store
+        if _store is None:
+            _store = create_store()
+        return _store
+
+    async def hit(self, key: str) -> float:
+        """Count an attempt; returns 0 if it is allowed, else seconds until it would be"""
+        if self.limit <= 0:
+            return 0.0
+        now = self._clock()
+        window_index = int(now // self.window)
+        elapsed = now / self.window - window_index
+        try:
+            previous, current = await self.store.hit(f"{self.name}:{key}", window_index)
+        except Exception as e:
+            logger.error(f"❌ Rate limit store error: {str(e)}")
+            metrics.increment("rate_limit.store_errors")
+            return 0.0
+
+        if previous * (1 - elapsed) + current <= self.limit:
+            return 0.0
+        metrics.increment(f"rate_limit.{self.name}.rejected")
+        if current > self.limit:
+            return (1 - elapsed) * self.window
+        # Wait until enough of the previous window has slid out
+        return max((1 - (self.limit - current) / previous - elapsed) * self.window, 1.0)
+
+    async def reset(self, key: str):
+        """Forget a key's attempts, e.g. after a successful login"""
+        if self.limit <= 0:
+            return
+        try:
+            await self.store.reset(f"{self.name}:{key}", int(self._clock() // self.window))
+        except Exception as e:
+            logger.error(f"❌ Rate limit store error: {str(e)}")
+            metrics.increment("rate_limit.store_errors")
+
+    async def check(self, key: str):
+        """Count an attempt and raise 429 if it is over the limit"""
+        retry_after = await self.hit(key)
+        if retry_after:
+            raise RateLimited(retry_after)
+
+def client_ip(request: Request) -> str:
+    """The caller's address: with RATE_LIMIT_TRUSTED_PROXIES, the X-Forwarded-For entry the outermost proxy appended"""
+    hops = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if hops > 0:
+        # Each proxy appends the address it saw; anything left of them came from the client
+        forwarded = [entry.strip() for entry in request.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if forwarded:
+            return forwarded[-min(hops, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+def reset_rate_limits():
+    """Forget every count in the shared store"""
+    if _store is not None:
+        _store.clear()
+
+async def close_rate_limits():
+    """Close the shared store"""
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
+
+# Shared window store (created on first use)
+_store = None
@@ -0,0 +1,372 @@
+"""
+Two-tier shared cache
+
+A `SharedCache` keeps values in a small per-process L1 (`LRUCache`) in
+front of an L2 shared by every worker: Redis at REDIS_URL with
+CACHE_BACKEND=redis, or `MemoryCacheBackend`, an in-process stand-in for a
+single worker and for tests. Keys are namespaced by cache name and tenant
+(`<CACHE_KEY_PREFIX>:<name>:<tenant>:<key>`), so one tenant's entries can
+never answer another's lookup.
+
+Values go through a compact binary codec: one format byte, then compact
+JSON, zlib-compressed when that is at least CACHE_COMPRESS_MIN_BYTES long
+and compression pays. L1 holds the encoded bytes too, so every caller
+decodes its own copy.
+
+`get_or_load` protects the loader from stampedes: concurrent misses for a
+key in one process share one load (`SingleFlight`), and across processes
+the first to miss takes a short lock in L2 (SET NX, CACHE_LOCK_TIMEOUT)
+while the others wait for its value. L2 errors are logged, counted under
+`cache.backend_errors` and treated as misses, so the cache never takes a
+request down with it. Writers call `invalidate(tenant, key)` (or
+`invalidate(tenant)` for all of a tenant's entries): it deletes from L2 and
+evicts every worker's L1 copy through the invalidation bus, along with each
+worker's own L2 copy when the L2 is `MemoryCacheBackend`. Otherwise entries
+expire after their TTL.
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+import zlib
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for CACHE_BACKEND=redis
+    aioredis = None
+
+from core.cache import LRUCache
+from core.config import settings
+from core.engines.base import _json_default
+from core.invalidation import invalidation_bus
+from core.metrics import metrics
+from core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Format byte that leads every encoded value
+RAW_JSON = b"\x01"
+ZLIB_JSON = b"\x02"
+
+LOCK_POLL_INTERVAL = 0.02  # seconds between L2 checks while another process loads
+
+def encode(value: Any, compress_min_bytes: Optional[int] = None) -> bytes:
+    """Serialize a value for the cache"""
+    compress_min_bytes = settings.CACHE_COMPRESS_MIN_BYTES if compress_min_bytes is None else compress_min_bytes
+    raw = json.dumps(value, separators=(",", ":"), default=_json_default).encode()
+    if len(raw) >= compress_min_bytes:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return ZLIB_JSON + packed
+    return RAW_JSON + raw
+
+def decode(data: bytes) -> Any:
+    """Deserialize a value written by `encode`"""
+    tag, body = data[:1], data[1:]
+    if tag == ZLIB_JSON:
+        body = zlib.decompress(body)
+    elif tag != RAW_JSON:
+        raise ValueError(f"Unknown cache value format: {tag!r}")
+    return json.loads(body)
+
+class MemoryCacheBackend:
+    """L2 in process memory: a stand-in for Redis with one worker, and for tests"""
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Optional[str]]]" = OrderedDict()  # key -> (expires at, data, tag)
+        self._tags: Dict[str, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            tagged = self._tags.get(entry[2])
+            if tagged is not None:
+                tagged.discard(key)
+                if not tagged:
+                    del self._tags[entry[2]]
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self._clock():
+            self._drop(key)
+            return None
+        return entry[1]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._live(key)
+
+    async def set(self, key: str, data: bytes, ttl: float, tag: Optional[str] = None):
+        """Store a key, optionally under a tag that `delete_tag` drops at once"""
+        self._drop(key)
+        self._entries[key] = (self._clock() + ttl, data, tag)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_keys:
+            self._drop(next(iter(self._entries)))
+
+    async def add(self, key: str, data: bytes, ttl: float) -> bool:
+        """Set a key only if it is absent (SET NX)"""
+        if self._live(key) is not None:
+            return False
+        await self.set(key, data, ttl)
+        return True
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._drop(key)
+
+    async def delete_tag(self, tag: str):
+        """Drop every key stored under a tag"""
+        for key in list(self._tags.get(tag, ())):
+            self._drop(key)
+
+    def discard(self, key: str):
+        """Drop a key at once (for invalidation bus handlers)"""
+        self._drop(key)
+
+    def discard_prefix(self, prefix: str):
+        """Drop every key that starts with a prefix at once"""
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    async def close(self):
+        pass
+
+class RedisCacheBackend:
+    """L2 in Redis, shared by every worker"""
+
+    def __init__(self, url: Optional[str] = None):
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        self.client = aioredis.from_url(url or settings.REDIS_URL)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, data: bytes, ttl: float, tag: Optional[str] = None):
+        """Store a key, optionally under a tag (a set of keys) that `delete_tag` drops at once"""
+        px = max(int(ttl * 1000), 1)
+        if tag is None:
+            await self.client.set(key, data, px=px)
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(key, data, px=px)
+            pipe.sadd(tag, key)
+            pipe.pexpire(tag, px)
+            await pipe.execute()
+
+    async def add(self, key: str, data: bytes, ttl: float) -> bool:
+        """Set a key only if it is absent (SET NX)"""
+        return bool(await self.client.set(key, data, px=max(int(ttl * 1000), 1), nx=True))
+
+    async def delete(self, *keys: str):
+        await self.client.delete(*keys)
+
+    async def delete_tag(self, tag: str):
+        """Drop every key stored under a tag"""
+        keys = await self.client.smembers(tag)
+        await self.client.delete(tag, *keys)
+
+    def clear(self):
+        pass
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_backend():
+    """Create the L2 selected by CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend()
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend()
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
+
+class SharedCache:
+    """Per-process L1 over a shared L2, with tenant-namespaced keys"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: Optional[float] = None,
+        l1_size: Optional[int] = None,
+        l1_ttl: Optional[float] = None,
+        lock_timeout: Optional[float] = None,
+        backend=None
+    ):
+        self.name = name
+        self.ttl = ttl if ttl is not None else settings.CACHE_TTL
+        self.lock_timeout = lock_timeout if lock_timeout is not None else settings.CACHE_LOCK_TIMEOUT
+        self.l1 = LRUCache(
+            f"{name}.l1",
+            l1_size if l1_size is not None else settings.CACHE_L1_SIZE,
+            l1_ttl if l1_ttl is not None else settings.CACHE_L1_TTL,
+        )
+        self._backend = backend
+        self._flights = SingleFlight(f"cache.{name}")
+        self._generation = 0  # bumped by every eviction
+        invalidation_bus.register(name, self.evict_local)
+
+    @property
+    def backend(self):
+        global _backend
+        if self._backend is not None:
+            return self._backend
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
+
+    def key(self, tenant: str, key: Hashable) -> str:
+        """The namespaced L2 key for a tenant's entry"""
+        if isinstance(key, tuple):
+            key = ":".join(str(part) for part in key)
+        return f"{self.tag(tenant)}:{key}"
+
+    def tag(self, tenant: str) -> str:
+        """The L2 tag holding every key of a tenant"""
+        return f"{settings.CACHE_KEY_PREFIX}:{self.name}:{tenant}"
+
+    async def _backend_call(self, method: str, *args, default: Any = None):
+        try:
+            return await getattr(self.backend, method)(*args)
+        except Exception as e:
+            logger.error(f"❌ Cache backend error: {str(e)}")
+            metrics.increment("cache.backend_errors")
+            return default
+
+    def _fill_l1(self, full_key: str, data: bytes, ttl: float):
+        self.l1.set(full_key, data, min(ttl, self.l1.ttl))
+
+    async def get(self, tenant: str, key: Hashable) -> Any:
+        """A cached value, or None"""
+        full_key = self.key(tenant, key)
+        data = self.l1.get(full_key)
+        if data is None:
+            data = await self._backend_call("get", full_key)
+            if data is None:
+                metrics.increment(f"cache.{self.name}.misses")
+                return None
+            metrics.increment(f"cache.{self.name}.l2_hits")
+            self._fill_l1(full_key, data, self.ttl)
+        return decode(data)
+
+    async def set(self, tenant: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value in both tiers for `ttl` seconds (the cache's TTL by default)"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        full_key = self.key(tenant, key)
+        data = encode(value)
+        self._fill_l1(full_key, data, ttl)
+        await self._backend_call("set", full_key, data, ttl, self.tag(tenant))
+
+    async def invalidate(self, tenant: str, key: Optional[Hashable] = None):
+        """Drop an entry, or every entry of a tenant, from L2 and from every worker's L1"""
+        if key is None:
+            await self._backend_call("delete_tag", self.tag(tenant))
+        else:
+            await self._backend_call("delete", self.key(tenant, key))
+        await invalidation_bus.publish(self.name, tenant, key)
+
+    def evict_local(self, tenant: Optional[str], key: Optional[Hashable] = None):
+        """Drop this worker's L1 copies, and its L2 copies if the L2 is in-process (the invalidation bus handler)"""
+        self._generation += 1
+        backend = self._backend or _backend
+        local_l2 = backend if isinstance(backend, MemoryCacheBackend) else None
+        if tenant is None:
+            self.l1.clear()
+            self._flights.forget(lambda full_key: True)
+            if local_l2 is not None:
+                local_l2.discard_prefix(f"{settings.CACHE_KEY_PREFIX}:{self.name}:")
+        elif key is None:
+            prefix = self.tag(tenant) + ":"
+            self.l1.delete_prefix(prefix)
+            self._flights.forget(lambda full_key: full_key.startswith(prefix))
+            if local_l2 is not None:
+                local_l2.discard_prefix(prefix)
+        else:
+            full_key = self.key(tenant, key)
+            self.l1.delete(full_key)
+            self._flights.forget(lambda flight_key: flight_key == full_key)
+            if local_l2 is not None:
+                local_l2.discard(full_key)
+
+    async def get_or_load(self, tenant: str, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """A cached value, loading and storing it on a miss (None results are not cached)"""
+        ttl = self.ttl if ttl is None else ttl
+        full_key = self.key(tenant, key)
+        data = self.l1.get(full_key)
+        if data is None:
+            # Concurrent misses in this process share one load
+            data = await self._flights.run(full_key, lambda: self._load(tenant, full_key, loader, ttl))
+        # Every caller decodes its own copy
+        return None if data is None else decode(data)
+
+    async def _load(self, tenant: str, full_key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Optional[bytes]:
+        data = await self._backend_call("get", full_key)
+        if data is not None:
+            metrics.increment(f"cache.{self.name}.l2_hits")
+            self._fill_l1(full_key, data, ttl)
+            return data
+
+        # Across processes, one loader per key: the rest wait for its value, or
+        # take over the lock if the loader gives up (an unreachable L2 never blocks)
+        lock_key = f"{full_key}:lock"
+        locked = await self._backend_call("add", lock_key, b"1", self.lock_timeout, default=True)
+        if not locked:
+            metrics.increment(f"cache.{self.name}.lock_waits")
+            deadline = time.monotonic() + self.lock_timeout
+            while not locked and time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                data = await self._backend_call("get", full_key)
+                if data is not None:
+                    self._fill_l1(full_key, data, ttl)
+                    return data
+                locked = await self._backend_call("add", lock_key, b"1", self.lock_timeout, default=True)
+
+        metrics.increment(f"cache.{self.name}.loads")
+        generation = self._generation
+        try:
+            value = await loader()
+            if value is None:
+                return None
+            data = encode(value)
+            # An invalidation that landed while we were loading may have made this value stale
+            if ttl > 0 and generation == self._generation:
+                self._fill_l1(full_key, data, ttl)
+                await self._backend_call("set", full_key, data, ttl, self.tag(tenant))
+            return data
+        finally:
+            if locked:
+                await self._backend_call("delete", lock_key)
+
+    def stats(self) -> Dict[str, Any]:
+        """L1 size and hit/miss counts"""
+        return self.l1.stats()
+
+def reset_shared_cache():
+    """Forget every entry in the shared in-process L2"""
+    if _backend is not None:
+        _backend.clear()
+
+async def close_shared_cache():
+    """Close the shared L2"""
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+
+# Shared L2 backend (created on first use)
+_backend = None
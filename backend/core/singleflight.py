@@ -0,0 +1,110 @@
+"""
+Single-flight deduplication
+
+A `SingleFlight` runs one computation per key at a time: a caller that
+arrives while the same key is in flight waits for that result (or
+exception) instead of starting its own. Nothing is kept once the flight
+lands, so this only collapses concurrent work; caching is a separate
+concern.
+
+The computation runs in the first caller's task. If that caller is
+cancelled (e.g. its client disconnected), the callers still waiting start
+a new flight rather than failing with it.
+
+Each instance counts `singleflight.<name>.calls` and `.collapsed` (calls
+answered by another caller's flight) and keeps the gauge
+`singleflight.<name>.collapse_ratio`, the share of calls collapsed.
+
+`single_flight` applies this to GET handlers, keyed by the caller, the
+route and its parameters.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import functools
+
+from core.metrics import metrics
+
+class SingleFlight:
+    """Shares each in-flight computation with concurrent callers of the same key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _count(self, collapsed: bool):
+        self.calls += 1
+        metrics.increment(f"singleflight.{self.name}.calls")
+        if collapsed:
+            self.collapsed += 1
+            metrics.increment(f"singleflight.{self.name}.collapsed")
+        metrics.set_gauge(f"singleflight.{self.name}.collapse_ratio", round(self.collapsed / self.calls, 4))
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """The result of `fn()`, shared with every concurrent call for `key`"""
+        counted = False
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            if not counted:
+                self._count(collapsed=True)
+                counted = True
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise  # this caller was cancelled, not the flight
+                # The caller running the flight went away; take over
+
+        if not counted:
+            self._count(collapsed=False)
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # waiters re-raise it; don't log it as never retrieved
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def forget(self, match: Callable[[Hashable], bool]):
+        """Let later callers start a new flight for matching keys (waiting callers still get theirs)"""
+        for key in [key for key in self._flights if match(key)]:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, collapsed calls and the collapse ratio"""
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "collapse_ratio": round(self.collapsed / self.calls, 4) if self.calls else 0.0,
+        }
+
+def single_flight(flights: SingleFlight):
+    """Collapse concurrent calls of a GET handler from one user with the same parameters"""
+    # Collapsed callers share the returned object, which FastAPI only reads
+    def decorate(handler):
+        route = f"{handler.__module__}.{handler.__qualname__}"
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            principal = kwargs["principal"]
+            params = tuple(sorted((name, repr(value)) for name, value in kwargs.items() if name != "principal"))
+            return await flights.run((principal.user_id, route, params), lambda: handler(*args, **kwargs))
+        return wrapper
+    return decorate
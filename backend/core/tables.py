@@ -0,0 +1,205 @@
+"""
+Table definitions used by the local storage engines (memory, SQLite)
+
+These mirror the columns the API reads and writes so that local engines
+return rows with the same shape as the hosted database.
+"""
+from typing import Any, Dict, List, NamedTuple, Tuple
+import copy
+
+class Column(NamedTuple):
+    """Column definition"""
+    name: str
+    type: str = "text"  # text, json, bool, int, float
+    default: Any = None
+
+TABLES: Dict[str, Tuple[Column, ...]] = {
+    "users": (
+        Column("id"),
+        Column("email"),
+        Column("company_name"),
+        Column("company_size"),
+        Column("first_name"),
+        Column("last_name"),
+        Column("hashed_password"),
+        Column("is_active", "bool", True),
+        Column("is_verified", "bool", False),
+        Column("created_at"),
+        Column("updated_at"),
+        Column("last_login"),
+    ),
+    "agents": (
+        Column("id"),
+        Column("user_id"),
+        Column("name"),
+        Column("agent_type"),
+        Column("description"),
+        Column("config", "json", {}),
+        Column("status", "text", "inactive"),
+        Column("total_conversations", "int", 0),
+        Column("completed_conversations", "int", 0),
+        Column("failed_conversations", "int", 0),
+        Column("last_active"),
+        Column("created_at"),
+        Column("updated_at"),
+    ),
+    "conversations": (
+        Column("id"),
+        Column("user_id"),
+        Column("agent_id"),
+        Column("title", "text", "New Conversation"),
+        Column("conversation_type", "text", "custom"),
+        Column("metadata", "json", {}),
+        Column("status", "text", "active"),
+        Column("message"),
+        Column("response"),
+        Column("error_message"),
+        Column("cost", "float", 0.0),
+        Column("archive_key"),  # blob holding the messages of an archived conversation
+        Column("created_at"),
+        Column("updated_at"),
+    ),
+    "messages": (
+        Column("id"),
+        Column("conversation_id"),
+        Column("role"),
+        Column("content"),
+        Column("metadata", "json", {}),
+        Column("timestamp"),
+    ),
+    "conversation_messages": (
+        Column("id"),
+        Column("conversation_id"),
+        Column("role"),
+        Column("content"),
+        Column("metadata", "json", {}),
+        Column("created_at"),
+    ),
+    "integrations": (
+        Column("id"),
+        Column("user_id"),
+        Column("platform"),
+        Column("config", "json", {}),
+        Column("status", "text", "disconnected"),
+        Column("created_at"),
+        Column("updated_at"),
+    ),
+    "training_data": (
+        Column("id"),
+        Column("agent_id"),
+        Column("input_text"),
+        Column("expected_output"),
+        Column("context"),
+        Column("category"),
+        Column("tags", "json", []),
+        Column("created_at"),
+    ),
+    "training_sessions": (
+        Column("id"),
+        Column("agent_id"),
+        Column("status", "text", "pending"),
+        Column("progress", "float", 0.0),
+        Column("metrics", "json", {}),
+        Column("started_at"),
+        Column("completed_at"),
+        Column("created_at"),
+    ),
+    "agent_performance": (
+        Column("id"),
+        Column("agent_id"),
+        Column("date"),
+        Column("total_conversations", "int", 0),
+        Column("successful_conversations", "int", 0),
+        Column("failed_conversations", "int", 0),
+        Column("total_cost", "float", 0.0),
+        Column("created_at"),
+    ),
+    "api_keys": (
+        Column("id"),
+        Column("user_id"),
+        Column("name"),
+        Column("key_hash"),  # HMAC-SHA256 of the key; the key itself is never stored
+        Column("permissions", "json", []),
+        Column("is_active", "bool", True),
+        Column("last_used"),
+        Column("expires_at"),
+        Column("created_at"),
+    ),
+    "revoked_tokens": (
+        Column("id"),  # SHA-256 of the token, hex
+        Column("user_id"),
+        Column("expires_at"),
+        Column("created_at"),
+    ),
+    "data_versions": (
+        Column("id"),  # the user's id
+        Column("version"),
+        Column("updated_at"),
+    ),
+    "purge_jobs": (
+        Column("id"),
+        Column("user_id"),
+        Column("target"),  # user or agent
+        Column("target_id"),
+        Column("status", "text", "pending"),
+        Column("progress", "json", {}),  # rows deleted per table
+        Column("error"),
+        Column("created_at"),
+        Column("updated_at"),
+        Column("completed_at"),
+    ),
+}
+
+# Secondary indexes created by engines that support them
+INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "users": [("email",)],
+    "agents": [("user_id",)],
+    "conversations": [("user_id", "created_at"), ("agent_id", "created_at"), ("user_id", "updated_at", "id")],
+    "messages": [("conversation_id", "timestamp", "id")],
+    "conversation_messages": [("conversation_id", "created_at")],
+    "integrations": [("user_id", "platform")],
+    "training_data": [("agent_id",)],
+    "training_sessions": [("agent_id",)],
+    "agent_performance": [("agent_id", "date")],
+    "api_keys": [("key_hash",), ("user_id",)],
+    "revoked_tokens": [("created_at",), ("expires_at",)],
+    "purge_jobs": [("status", "created_at")],
+}
+
+def get_columns(table: str) -> Tuple[Column, ...]:
+    """Get column definitions for a table"""
+    if table not in TABLES:
+        raise KeyError(f"Unknown table: {table}")
+    return TABLES[table]
+
+def column_names(table: str) -> List[str]:
+    """Get column names for a table"""
+    return [column.name for column in get_columns(table)]
+
+def build_row(table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill defaults for a new row and reject unknown columns"""
+    columns = get_columns(table)
+    known = {column.name for column in columns}
+    unknown = set(record) - known
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+
+    row = {}
+    for column in columns:
+        if column.name in record:
+            row[column.name] = record[column.name]
+        else:
+            row[column.name] = copy.deepcopy(column.default)
+    return row
+
+def parse_columns(table: str, columns: str) -> List[str]:
+    """Expand a select list ("*" or "a,b,c") into column names"""
+    names = column_names(table)
+    if columns.strip() == "*":
+        return names
+
+    selected = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+    return selected
@@ -31,10 +31,15 @@ CREATE TABLE IF NOT EXISTS agents (
     max_tokens INTEGER DEFAULT 1000,
     system_prompt TEXT,
     capabilities TEXT[] DEFAULT '{}',
-    status VARCHAR(50) DEFAULT 'inactive' CHECK (status IN ('active', 'inactive', 'training', 'error')),
+    status VARCHAR(50) DEFAULT 'inactive' CHECK (status IN ('active', 'inactive', 'training', 'error', 'maintenance', 'deleted')),
     integration_preferences TEXT[] DEFAULT '{}',
     custom_instructions TEXT,
     metadata JSONB DEFAULT '{}',
+    -- Maintained incrementally as conversations are created, completed, failed and deleted
+    total_conversations INTEGER NOT NULL DEFAULT 0,
+    completed_conversations INTEGER NOT NULL DEFAULT 0,
+    failed_conversations INTEGER NOT NULL DEFAULT 0,
+    last_active TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -45,9 +50,14 @@ CREATE TABLE IF NOT EXISTS conversations (
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     agent_id UUID NOT NULL REFERENCES agents(id) ON DELETE CASCADE,
     title VARCHAR(255) DEFAULT 'New Conversation',
-    status VARCHAR(50) DEFAULT 'active' CHECK (status IN ('active', 'completed', 'failed')),
+    status VARCHAR(50) DEFAULT 'active' CHECK (status IN ('active', 'completed', 'failed', 'archived')),
     conversation_type VARCHAR(50) DEFAULT 'chat' CHECK (conversation_type IN ('chat', 'task', 'analysis')),
     metadata JSONB DEFAULT '{}',
+    message TEXT,
+    response TEXT,
+    error_message TEXT,
+    cost DECIMAL(10,4) DEFAULT 0.0,
+    archive_key TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -62,6 +72,16 @@ CREATE TABLE IF NOT EXISTS conversation_messages (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Messages table (conversation transcript written by the conversations API)
+CREATE TABLE IF NOT EXISTS messages (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role VARCHAR(50) NOT NULL CHECK (role IN ('user', 'assistant', 'system')),
+    content TEXT NOT NULL,
+    metadata JSONB DEFAULT '{}',
+    timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Integrations table
 CREATE TABLE IF NOT EXISTS integrations (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -133,6 +153,14 @@ CREATE TABLE IF NOT EXISTS api_keys (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Revoked access tokens (until they expire)
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    id VARCHAR(64) PRIMARY KEY, -- SHA-256 of the token, hex
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL, -- kept until expires_at, even past the user
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Password Reset Tokens table
 CREATE TABLE IF NOT EXISTS password_reset_tokens (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -143,6 +171,27 @@ CREATE TABLE IF NOT EXISTS password_reset_tokens (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Data Versions table (per-user change tokens behind the API's ETags)
+CREATE TABLE IF NOT EXISTS data_versions (
+    id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version VARCHAR(32) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Purge Jobs table (background removal of deleted users and agents)
+CREATE TABLE IF NOT EXISTS purge_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL,
+    target VARCHAR(50) NOT NULL CHECK (target IN ('user', 'agent')),
+    target_id UUID NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    progress JSONB DEFAULT '{}',
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_agents_user_id ON agents(user_id);
@@ -150,11 +199,19 @@ CREATE INDEX IF NOT EXISTS idx_agents_status ON agents(status);
 CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_agent_id ON conversations(agent_id);
 CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation_id ON conversation_messages(conversation_id);
+-- Keyset pagination: (updated_at, id) per user, (timestamp, id) per conversation
+CREATE INDEX IF NOT EXISTS idx_conversations_user_updated ON conversations(user_id, updated_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_timestamp ON messages(conversation_id, timestamp, id);
 CREATE INDEX IF NOT EXISTS idx_integrations_user_id ON integrations(user_id);
 CREATE INDEX IF NOT EXISTS idx_training_data_agent_id ON training_data(agent_id);
 CREATE INDEX IF NOT EXISTS idx_training_sessions_agent_id ON training_sessions(agent_id);
 CREATE INDEX IF NOT EXISTS idx_agent_performance_agent_id ON agent_performance(agent_id);
 CREATE INDEX IF NOT EXISTS idx_agent_performance_date ON agent_performance(date);
+CREATE INDEX IF NOT EXISTS idx_purge_jobs_status ON purge_jobs(status, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_key_hash ON api_keys(key_hash);
+CREATE INDEX IF NOT EXISTS idx_api_keys_user_id ON api_keys(user_id);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_created_at ON revoked_tokens(created_at);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
 
 -- Create updated_at trigger function
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -171,6 +228,60 @@ CREATE TRIGGER update_agents_updated_at BEFORE UPDATE ON agents FOR EACH ROW EXE
 CREATE TRIGGER update_conversations_updated_at BEFORE UPDATE ON conversations FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_integrations_updated_at BEFORE UPDATE ON integrations FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- Record a finished chat turn in one round trip (see core/procedures.py)
+CREATE OR REPLACE FUNCTION record_chat_turn(p_turn jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_turn conversations%ROWTYPE;
+    v_columns text;
+    v_result jsonb;
+BEGIN
+    v_turn := jsonb_populate_record(NULL::conversations, p_turn);
+
+    UPDATE agents SET
+        total_conversations = total_conversations + 1,
+        completed_conversations = completed_conversations + COALESCE((v_turn.status = 'completed')::int, 0),
+        failed_conversations = failed_conversations + COALESCE((v_turn.status = 'failed')::int, 0),
+        last_active = GREATEST(last_active, v_turn.updated_at)
+    WHERE id = v_turn.agent_id AND user_id = v_turn.user_id AND status <> 'deleted';
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Agent not found' USING ERRCODE = 'P0002';
+    END IF;
+
+    -- Insert only the columns present in p_turn, so the rest keep their defaults
+    SELECT string_agg(quote_ident(attname), ', ') INTO v_columns
+    FROM pg_attribute
+    WHERE attrelid = 'conversations'::regclass AND attnum > 0 AND NOT attisdropped AND p_turn ? attname;
+
+    EXECUTE format(
+        'INSERT INTO conversations (%1$s) SELECT %1$s FROM jsonb_populate_record(NULL::conversations, $1) '
+        'RETURNING to_jsonb(conversations.*)',
+        v_columns
+    ) INTO v_result USING p_turn;
+    RETURN v_result;
+END;
+$$;
+
+-- Apply batched agent counter deltas (see services/agent_counters.py)
+CREATE OR REPLACE FUNCTION increment_agent_counters(p_deltas jsonb)
+RETURNS jsonb
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE agents AS a SET
+            total_conversations = a.total_conversations + COALESCE(d.total_conversations, 0),
+            completed_conversations = a.completed_conversations + COALESCE(d.completed_conversations, 0),
+            failed_conversations = a.failed_conversations + COALESCE(d.failed_conversations, 0),
+            last_active = GREATEST(a.last_active, d.last_active)
+        FROM jsonb_populate_recordset(NULL::agents, p_deltas) AS d
+        WHERE a.id = d.id
+        RETURNING a.id
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object('id', id)), '[]'::jsonb) FROM updated;
+$$;
+
 -- Insert sample data for development
 INSERT INTO users (id, email, password_hash, first_name, last_name, company_name, company_size, is_verified) VALUES
 ('550e8400-e29b-41d4-a716-446655440000', 'demo@agentsynergy.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj4J/8Kq', 'Demo', 'User', 'Demo Company', '11-50', true);
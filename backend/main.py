@@ -1,7 +1,9 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from contextlib import asynccontextmanager
+from typing import Optional
+import hmac
 import os
 from dotenv import load_dotenv
 
@@ -15,7 +17,20 @@ from api.v1.conversations import router as conversations_router
 
 # Import database and config
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, close_db
+from core.dataloader import RequestLoaderMiddleware
+from core.invalidation import invalidation_bus
+from core.metrics import metrics
+from core.rate_limit import close_rate_limits
+from core.shared_cache import close_shared_cache
+from services.message_buffer import message_buffer
+from services.agent_counters import agent_counters
+from services.purge_worker import purge_worker
+from services.conversation_archive import conversation_archive
+from services.password_pool import password_pool
+from services.api_keys import api_key_index
+from services.token_revocation import token_denylist
+from services.auth_service import require_permission
 
 # Load environment variables
 load_dotenv()
@@ -30,11 +45,28 @@ async def lifespan(app: FastAPI):
     print("🚀 Starting Agent Synergy API...")
     await init_db()
     print("✅ Database initialized")
+    if settings.BCRYPT_TARGET_MS:
+        await password_pool.calibrate(settings.BCRYPT_TARGET_MS)
+    await api_key_index.warm()
+    await token_denylist.warm()
+    await invalidation_bus.start()
+    purge_worker.start()
     
     yield
     
     # Shutdown
     print("🛑 Shutting down Agent Synergy API...")
+    await purge_worker.stop()
+    await conversation_archive.close()
+    await message_buffer.close()
+    await agent_counters.close()
+    await api_key_index.close()
+    await token_denylist.close()
+    await close_rate_limits()
+    await invalidation_bus.close()
+    await close_shared_cache()
+    password_pool.close()
+    await close_db()
 
 # Create FastAPI app
 app = FastAPI(
@@ -55,13 +87,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request-scoped query coalescing
+if settings.DATALOADER_ENABLED:
+    app.add_middleware(RequestLoaderMiddleware)
+
 # Include routers
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["Authentication"])
-app.include_router(users_router, prefix="/api/v1/users", tags=["Users"])
-app.include_router(agents_router, prefix="/api/v1/agents", tags=["Agents"])
-app.include_router(integrations_router, prefix="/api/v1/integrations", tags=["Integrations"])
-app.include_router(analytics_router, prefix="/api/v1/analytics", tags=["Analytics"])
-app.include_router(conversations_router, prefix="/api/v1/conversations", tags=["Conversations"])
+app.include_router(users_router, prefix="/api/v1/users", tags=["Users"], dependencies=[Depends(require_permission("users"))])
+app.include_router(agents_router, prefix="/api/v1/agents", tags=["Agents"], dependencies=[Depends(require_permission("agents"))])
+app.include_router(integrations_router, prefix="/api/v1/integrations", tags=["Integrations"], dependencies=[Depends(require_permission("integrations"))])
+app.include_router(analytics_router, prefix="/api/v1/analytics", tags=["Analytics"], dependencies=[Depends(require_permission("analytics"))])
+app.include_router(conversations_router, prefix="/api/v1/conversations", tags=["Conversations"], dependencies=[Depends(require_permission("conversations"))])
 
 @app.get("/")
 async def root():
@@ -82,6 +118,22 @@ async def health_check():
         "version": "1.0.0"
     }
 
+async def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
+    """Serve metrics only to scrapers holding METRICS_TOKEN"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    """Process metrics endpoint"""
+    return metrics.snapshot()
+
 @app.get("/api/status")
 async def api_status():
     """API status endpoint"""
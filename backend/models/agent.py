@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from uuid import UUID
@@ -20,6 +20,7 @@ class AgentStatus(str, Enum):
     TRAINING = "training"
     ERROR = "error"
     MAINTENANCE = "maintenance"
+    DELETED = "deleted"  # soft-deleted, waiting for the purge worker
 
 class AgentBase(BaseModel):
     """Base agent model"""
@@ -39,6 +40,14 @@ class AgentUpdate(BaseModel):
     config: Optional[Dict[str, Any]] = None
     status: Optional[AgentStatus] = None
 
+    @field_validator("status")
+    @classmethod
+    def not_deleted(cls, value: Optional[AgentStatus]) -> Optional[AgentStatus]:
+        """Agents are only deleted through DELETE, which queues their purge"""
+        if value == AgentStatus.DELETED:
+            raise ValueError("Use DELETE /agents/{agent_id} to delete an agent")
+        return value
+
 class Agent(AgentBase):
     """Agent response model"""
     id: UUID
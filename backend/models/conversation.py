@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from uuid import UUID
 from enum import Enum
@@ -47,6 +47,18 @@ class Conversation(ConversationBase):
     class Config:
         from_attributes = True
 
+class ChatRequest(BaseModel):
+    """Chat turn request"""
+    message: str = Field(..., min_length=1)
+    title: Optional[str] = "New Conversation"
+    conversation_type: ConversationType = ConversationType.CUSTOM
+    metadata: Optional[Dict[str, Any]] = {}
+
+class ChatTurn(Conversation):
+    """Recorded chat turn with the agent's reply"""
+    message: str
+    response: Optional[str] = None
+
 class ConversationResponse(Conversation):
     """Conversation response model for API"""
     pass
@@ -74,3 +86,21 @@ class ChatMessage(BaseModel):
     content: str
     timestamp: datetime
     metadata: Optional[Dict[str, Any]] = None
+
+class MessageBatchCreate(BaseModel):
+    """Bulk message append request; items are validated one by one"""
+    messages: List[Dict[str, Any]] = Field(..., min_length=1)
+
+class MessageBatchItemResult(BaseModel):
+    """Outcome of one item in a bulk append"""
+    index: int
+    status: str  # "created" or "failed"
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+class MessageBatchResult(BaseModel):
+    """Bulk message append response"""
+    conversation_id: str
+    created: int
+    failed: int
+    results: List[MessageBatchItemResult]
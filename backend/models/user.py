@@ -63,3 +63,23 @@ class UserPasswordChange(BaseModel):
     current_password: str
     new_password: str = Field(..., min_length=8)
     confirm_new_password: str
+
+class ApiKeyCreate(BaseModel):
+    """API key creation model"""
+    name: str = Field(..., min_length=1, max_length=255)
+    permissions: List[str] = []
+    expires_at: Optional[datetime] = None
+
+class ApiKey(BaseModel):
+    """API key response model (never includes the key)"""
+    id: UUID
+    name: str
+    permissions: List[str] = []
+    is_active: bool
+    last_used: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    created_at: datetime
+
+class ApiKeyCreated(ApiKey):
+    """A new API key, returned once with its secret"""
+    key: str
@@ -21,12 +21,25 @@ class ErrorResponse(BaseResponse):
     details: Optional[Dict[str, Any]] = None
 
 class PaginatedResponse(BaseResponse):
-    """Paginated response model"""
+    """Paginated response model (offset pages carry totals, keyset pages a next cursor)"""
     data: list
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class PurgeJobResponse(BaseModel):
+    """Progress of a background purge"""
+    id: str
+    target: str
+    target_id: str
+    status: str
+    progress: Dict[str, int]
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
 
 class HealthCheckResponse(BaseModel):
     """Health check response model"""
@@ -0,0 +1,70 @@
+"""
+Agent record cache
+
+Chat, get, update and delete look agents up by id through this cache
+instead of the database. Entries live for AGENT_CACHE_TTL seconds, at most
+AGENT_CACHE_SIZE are kept, and every write to an agent invalidates its
+entry in every worker through the invalidation bus. Conversation statistics
+on a cached record may lag by up to the TTL. Ids with no live agent are
+remembered briefly in the negative cache.
+"""
+from typing import Any, Dict, Optional
+import copy
+
+from core.cache import LRUCache
+from core.config import settings
+from core.database import get_db
+from core.invalidation import invalidation_bus
+from core.projections import AGENT_COLUMNS
+from models.agent import AgentStatus
+from services.negative_cache import negative_cache
+
+class AgentCache:
+    """LRU+TTL cache of agent rows keyed by id"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.cache = LRUCache(
+            "agents",
+            max_size if max_size is not None else settings.AGENT_CACHE_SIZE,
+            ttl if ttl is not None else settings.AGENT_CACHE_TTL,
+        )
+        self._generation = 0  # bumped by every invalidation
+        invalidation_bus.register("agents", self._evict)
+
+    async def get(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        """Get an agent that isn't deleted, or None"""
+        agent = self.cache.get(agent_id)
+        if agent is None:
+            missing_key = ("agent", agent_id)
+            if negative_cache.is_missing(missing_key):
+                return None
+            generation = self._generation
+            result = await get_db().table('agents').select(AGENT_COLUMNS).eq('id', agent_id).neq('status', AgentStatus.DELETED.value).execute()
+            if not result.data:
+                negative_cache.remember(missing_key)
+                return None
+            agent = result.data[0]
+            # A write that landed while we were reading may have made this row stale
+            if generation == self._generation:
+                self.cache.set(agent_id, agent)
+        # Callers get their own copy so edits to e.g. config never reach the cache
+        return copy.deepcopy(agent)
+
+    async def invalidate(self, agent_id: str):
+        """Forget an agent in every worker after it changes"""
+        await invalidation_bus.publish("agents", key=str(agent_id))
+
+    def _evict(self, tenant: Optional[str], agent_id: Optional[str]):
+        self._generation += 1
+        if agent_id is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(agent_id)
+
+    def clear(self):
+        """Forget every agent"""
+        self._generation += 1
+        self.cache.clear()
+
+# Global agent cache
+agent_cache = AgentCache()
@@ -0,0 +1,145 @@
+"""
+Incrementally maintained agent statistics
+
+`agents` carries total/completed/failed conversation counters and
+`last_active`, so agent listings never scan `conversations`. Conversation
+writes report their effect here and the deltas are applied with the
+`increment_agent_counters` procedure, an atomic `column = column + delta`
+update. With AGENT_COUNTERS_FLUSH_INTERVAL set, deltas for the same agent
+are merged in memory and applied in one call per interval, after which the
+data versions of the agents' owners are bumped once; the application
+lifespan drains them on shutdown. Chat turns bump the counters inside
+`record_chat_turn` instead.
+"""
+from typing import Any, Dict, Optional, Set
+import asyncio
+import logging
+
+from core.config import settings
+from core.database import get_db
+from core.dataloader import detach_loader
+from core.metrics import metrics
+from core.procedures import COUNTER_COLUMNS
+from services.data_version import data_versions
+
+logger = logging.getLogger(__name__)
+
+# Conversation status -> the counter it is tallied under
+STATUS_COUNTERS = {
+    "completed": "completed_conversations",
+    "failed": "failed_conversations",
+}
+
+def success_rate(agent_data: Dict[str, Any]) -> float:
+    """Share of an agent's conversations that completed, in percent"""
+    total = agent_data.get('total_conversations') or 0
+    completed = agent_data.get('completed_conversations') or 0
+    return round(completed / total * 100, 2) if total > 0 else 0.0
+
+class AgentCounters:
+    """Collects agent counter deltas and applies them atomically"""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval if flush_interval is not None else settings.AGENT_COUNTERS_FLUSH_INTERVAL
+        self._deltas: Dict[str, Dict[str, Any]] = {}
+        self._owners: Set[str] = set()  # users whose data version the next flush bumps
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of agents with unapplied deltas"""
+        return len(self._deltas)
+
+    async def conversation_created(self, agent_id: str, status: str, at: Optional[str] = None, user_id: Optional[str] = None):
+        """Count a new conversation of `user_id`'s agent"""
+        changes = {"total_conversations": 1}
+        if status in STATUS_COUNTERS:
+            changes[STATUS_COUNTERS[status]] = 1
+        await self._add(agent_id, changes, at, user_id)
+
+    async def status_changed(self, agent_id: str, old_status: str, new_status: str, at: Optional[str] = None, user_id: Optional[str] = None):
+        """Move a conversation between status counters"""
+        if old_status == new_status:
+            return
+        changes = {}
+        if old_status in STATUS_COUNTERS:
+            changes[STATUS_COUNTERS[old_status]] = -1
+        if new_status in STATUS_COUNTERS:
+            changes[STATUS_COUNTERS[new_status]] = 1
+        await self._add(agent_id, changes, at, user_id)
+
+    async def conversation_deleted(self, agent_id: str, status: str, user_id: Optional[str] = None):
+        """Stop counting a deleted conversation"""
+        changes = {"total_conversations": -1}
+        if status in STATUS_COUNTERS:
+            changes[STATUS_COUNTERS[status]] = -1
+        await self._add(agent_id, changes, None, user_id)
+
+    async def _add(self, agent_id: str, changes: Dict[str, int], at: Optional[str], user_id: Optional[str]):
+        deltas = {"id": str(agent_id), **{column: changes.get(column, 0) for column in COUNTER_COLUMNS}, "last_active": at}
+        metrics.increment("agent_counters.changes")
+
+        if self.flush_interval > 0:
+            # The caller bumped before these counts land, so the flush bumps again
+            if user_id is not None:
+                self._owners.add(user_id)
+            self._merge(deltas)
+            if self._timer is None or self._timer.done():
+                self._timer = asyncio.create_task(self._flush_later())
+        elif self._deltas:
+            # Deltas from a failed write go out with this one
+            self._merge(deltas)
+            await self.flush()
+        else:
+            await self._apply([deltas])
+
+    def _merge(self, deltas: Dict[str, Any]):
+        merged = self._deltas.setdefault(deltas["id"], {"id": deltas["id"], **{column: 0 for column in COUNTER_COLUMNS}, "last_active": None})
+        for column in COUNTER_COLUMNS:
+            merged[column] += deltas[column]
+        if deltas["last_active"] and (merged["last_active"] is None or deltas["last_active"] > merged["last_active"]):
+            merged["last_active"] = deltas["last_active"]
+
+    async def _apply(self, batch) -> bool:
+        try:
+            await asyncio.shield(get_db().rpc('increment_agent_counters', {'p_deltas': batch}).execute())
+        except Exception as e:
+            # Keep the deltas for the next write rather than losing counts
+            logger.error(f"❌ Failed to apply agent counters: {str(e)}")
+            metrics.increment("agent_counters.failed_writes")
+            for deltas in batch:
+                self._merge(deltas)
+            return False
+        metrics.increment("agent_counters.writes")
+        metrics.increment("agent_counters.agents_updated", len(batch))
+        return True
+
+    async def _flush_later(self):
+        detach_loader()
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Apply every pending delta"""
+        async with self._lock:
+            if not self._deltas:
+                return
+            pending, self._deltas = self._deltas, {}
+            owners, self._owners = self._owners, set()
+            # A fixed row order keeps concurrent writes from deadlocking on agent rows
+            if not await self._apply([pending[agent_id] for agent_id in sorted(pending)]):
+                self._owners |= owners
+                return
+        await data_versions.bump_many(owners)
+
+    async def close(self):
+        """Apply pending deltas"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+# Global agent counters
+agent_counters = AgentCounters()
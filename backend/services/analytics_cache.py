@@ -0,0 +1,27 @@
+"""
+Analytics results cache
+
+The analytics endpoints keep each user's results in the shared cache for
+ANALYTICS_CACHE_TTL seconds. Writes that change what analytics count
+(agents and conversations) call `analytics_cache.invalidate(user_id)`,
+which drops that user's results in every worker.
+
+Concurrent identical requests (same user, endpoint and parameters, as a
+dashboard fires them in bursts) also share one computation through
+`analytics_flights`; an invalidation stops later requests from joining a
+computation that started before the write.
+"""
+from typing import Optional
+
+from core.config import settings
+from core.invalidation import invalidation_bus
+from core.shared_cache import SharedCache
+from core.singleflight import SingleFlight
+
+def _forget_flights(user_id: Optional[str], key=None):
+    analytics_flights.forget(lambda flight_key: user_id is None or flight_key[0] == user_id)
+
+# Global analytics cache
+analytics_cache = SharedCache("analytics", ttl=settings.ANALYTICS_CACHE_TTL)
+analytics_flights = SingleFlight("analytics")
+invalidation_bus.register("analytics", _forget_flights)
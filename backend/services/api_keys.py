@@ -0,0 +1,198 @@
+"""
+API-key authentication
+
+Server-to-server clients send an API key as their bearer token instead of a
+JWT. Keys are random strings with the API_KEY_PREFIX; only an HMAC-SHA256
+digest keyed with SECRET_KEY is stored (`api_keys.key_hash`), which is
+enough for random keys and costs microseconds instead of a bcrypt hash.
+
+Active keys live in an in-process index from digest to key row. The index
+is loaded at startup, updated when a key is created or revoked here, and
+reloaded every API_KEY_REFRESH_INTERVAL seconds; revocations reach other
+workers at once through the invalidation bus. A digest missing from the
+index is looked up in the table (the key may have been created by another
+worker since the last reload); a digest that isn't there either is kept in
+the negative cache for NEGATIVE_CACHE_TTL seconds, so retries of an unknown
+or revoked key don't reach the database. `last_used` is collected in memory
+(to the second) and written every API_KEY_LAST_USED_INTERVAL seconds (0
+writes on every use), each key with its own time; keys last used in the
+same second share one statement.
+
+A key's `permissions` limit it to the routes they grant:
+`<resource>:read` allows GET requests under that resource and
+`<resource>:write` allows every method. A key with no permissions has its
+owner's full access.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+
+from core.config import settings
+from core.database import get_db
+from core.invalidation import invalidation_bus
+from core.dataloader import detach_loader
+from core.metrics import metrics
+from core.projections import API_KEY_INDEX_COLUMNS
+from services.negative_cache import negative_cache
+
+logger = logging.getLogger(__name__)
+
+API_KEY_PREFIX = "ask_"
+
+# Resources an API key's permissions can grant, as "<resource>:read" or "<resource>:write"
+API_KEY_RESOURCES = ("agents", "conversations", "analytics", "integrations", "users")
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def generate_key() -> str:
+    """A new random API key"""
+    return API_KEY_PREFIX + secrets.token_urlsafe(32)
+
+def key_digest(key: str) -> str:
+    """Keyed digest stored and indexed in place of the key"""
+    return hmac.new(settings.SECRET_KEY.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+def is_api_key(token: str) -> bool:
+    """Whether a bearer token is an API key rather than a JWT"""
+    return token.startswith(API_KEY_PREFIX)
+
+def unknown_permissions(permissions: List[str]) -> List[str]:
+    """The permissions in a list that grant nothing"""
+    known = {f"{resource}:{access}" for resource in API_KEY_RESOURCES for access in ("read", "write")}
+    return [permission for permission in permissions if permission not in known]
+
+def permits(permissions: List[str], resource: str, method: str) -> bool:
+    """Whether a key's permissions allow a request method on a resource"""
+    if not permissions:
+        return True
+    if f"{resource}:write" in permissions:
+        return True
+    return method in READ_METHODS and f"{resource}:read" in permissions
+
+def _expired(row: Dict[str, Any]) -> bool:
+    if not row.get('expires_at'):
+        return False
+    expires_at = datetime.fromisoformat(row['expires_at'])
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at <= datetime.now(timezone.utc)
+
+class ApiKeyIndex:
+    """In-memory index of active API keys by digest"""
+
+    def __init__(self, refresh_interval: Optional[float] = None, last_used_interval: Optional[float] = None):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else settings.API_KEY_REFRESH_INTERVAL
+        self.last_used_interval = last_used_interval if last_used_interval is not None else settings.API_KEY_LAST_USED_INTERVAL
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._last_used: Dict[str, str] = {}
+        self._refresher: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.Task] = None
+        invalidation_bus.register("api_keys", self._evict)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    async def warm(self):
+        """Load every active key and start the periodic reload"""
+        await self.reload()
+        if self.refresh_interval > 0 and (self._refresher is None or self._refresher.done()):
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def reload(self):
+        """Replace the index with the active keys in the table"""
+        result = await get_db().table('api_keys').select(API_KEY_INDEX_COLUMNS).eq('is_active', True).execute()
+        self._keys = {row['key_hash']: row for row in result.data}
+        metrics.increment("api_keys.reloads")
+        logger.info(f"🔑 Loaded {len(self._keys)} API keys")
+
+    async def _refresh_forever(self):
+        detach_loader()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"❌ Failed to reload API keys: {str(e)}")
+
+    async def authenticate(self, key: str) -> Optional[Dict[str, Any]]:
+        """The active, unexpired key row for a presented key, or None"""
+        digest = key_digest(key)
+        row = self._keys.get(digest)
+        if row is None:
+            # Created by another worker since the last reload
+            missing_key = ("api_key", digest)
+            if negative_cache.is_missing(missing_key):
+                return None
+            metrics.increment("api_keys.index_misses")
+            result = await get_db().table('api_keys').select(API_KEY_INDEX_COLUMNS).eq('key_hash', digest).eq('is_active', True).execute()
+            if not result.data:
+                negative_cache.remember(missing_key)
+                return None
+            row = result.data[0]
+            self._keys[digest] = row
+        if _expired(row):
+            return None
+
+        metrics.increment("api_keys.authenticated")
+        await self._mark_used(row['id'])
+        return row
+
+    def add(self, row: Dict[str, Any]):
+        """Index a key created in this process"""
+        if row.get('is_active', True):
+            self._keys[row['key_hash']] = row
+
+    async def revoke(self, user_id: str, key_id: Optional[str] = None):
+        """Drop a revoked key, or every key of a deleted user, in every worker"""
+        await invalidation_bus.publish("api_keys", user_id, key_id)
+
+    def _evict(self, user_id: Optional[str], key_id: Optional[str]):
+        if key_id is not None:
+            self._keys = {digest: row for digest, row in self._keys.items() if row['id'] != key_id}
+        elif user_id is not None:
+            self._keys = {digest: row for digest, row in self._keys.items() if row['user_id'] != user_id}
+
+    async def _mark_used(self, key_id: str):
+        self._last_used[key_id] = datetime.utcnow().replace(microsecond=0).isoformat()
+        if self.last_used_interval <= 0:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        detach_loader()
+        await asyncio.sleep(self.last_used_interval)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Write last_used for every key used since the last flush"""
+        if not self._last_used:
+            return
+        pending, self._last_used = self._last_used, {}
+        by_time: Dict[str, List[str]] = {}
+        for key_id, used in pending.items():
+            by_time.setdefault(used, []).append(key_id)
+        for used, key_ids in sorted(by_time.items()):
+            try:
+                await get_db().table('api_keys').update({'last_used': used}).in_('id', sorted(key_ids)).execute()
+            except Exception as e:
+                logger.error(f"❌ Failed to record API key use: {str(e)}")
+                for key_id in key_ids:
+                    self._last_used.setdefault(key_id, used)
+                continue
+            metrics.increment("api_keys.last_used_writes")
+
+    async def close(self):
+        """Stop the reload loop and write pending last_used times"""
+        for task in (self._refresher, self._timer):
+            if task is not None:
+                task.cancel()
+        self._refresher = self._timer = None
+        await self.flush()
+
+# Global API key index
+api_key_index = ApiKeyIndex()
@@ -1,14 +1,27 @@
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models.user import User
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
+from core.cache import LRUCache
 from core.config import settings
+from core.database import get_db
+from core.invalidation import invalidation_bus
+from core.projections import USER_COLUMNS
+from services.api_keys import api_key_index, is_api_key, permits
+from services.token_revocation import token_denylist, token_digest
+import asyncio
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Verified token claims by token digest, shared by every AuthService instance.
+# An entry never outlives its token's `exp`.
+token_cache = LRUCache("tokens", settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL)
+
 class AuthService:
     """Authentication service for JWT token management"""
     
@@ -22,9 +35,9 @@ class AuthService:
         try:
             to_encode = data.copy()
             
-            # Set expiration time
+            # Set expiration time; a unique id keeps tokens issued in the same second distinct
             expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-            to_encode.update({"exp": expire})
+            to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
             
             # Create JWT token
             encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
@@ -38,6 +51,17 @@ class AuthService:
     
     def decode_token(self, token: str) -> Dict[str, Any]:
         """Decode and validate JWT token"""
+        key = token_digest(token)
+        if token_denylist.is_revoked(key):
+            logger.warning("JWT decode error: Token has been revoked")
+            raise JWTError("Token has been revoked")
+        
+        payload = token_cache.get(key)
+        if payload is not None:
+            if time.time() < payload["exp"]:
+                return dict(payload)
+            token_cache.delete(key)
+        
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             
@@ -49,7 +73,8 @@ class AuthService:
             if datetime.utcnow() > datetime.fromtimestamp(exp):
                 raise JWTError("Token has expired")
             
-            return payload
+            token_cache.set(key, payload, ttl=min(token_cache.ttl, exp - time.time()))
+            return dict(payload)
             
         except JWTError as e:
             logger.warning(f"JWT decode error: {str(e)}")
@@ -58,6 +83,10 @@ class AuthService:
             logger.error(f"Token decode failed: {str(e)}")
             raise
     
+    def forget_token(self, token: str):
+        """Drop a token from the verified-token cache"""
+        token_cache.delete(token_digest(token))
+    
     def verify_token(self, token: str) -> bool:
         """Verify if token is valid"""
         try:
@@ -113,37 +142,127 @@ class AuthService:
         except:
             return None
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Bearer token scheme
+security = HTTPBearer()
 
 # Global auth service instance
 auth_service = AuthService()
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    """Get current user from JWT token"""
-    try:
-        payload = auth_service.decode_token(token)
-        user_id = payload.get("user_id")
-        
+class Principal:
+    """The authenticated caller of one request"""
+    
+    def __init__(self, user_id: str, claims: Dict[str, Any], token: str, api_key: Optional[Dict[str, Any]] = None):
+        self.user_id = user_id
+        self.claims = claims
+        self.token = token
+        self.api_key_id = api_key['id'] if api_key else None
+        self.permissions = list(api_key.get('permissions') or []) if api_key else []
+        self._user: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+    
+    async def user(self) -> Optional[Dict[str, Any]]:
+        """The caller's users row (loaded on first use), or None if it no longer exists"""
+        async with self._lock:
+            if not self._loaded:
+                result = await get_db().table('users').select(USER_COLUMNS).eq('id', self.user_id).execute()
+                self._user = result.data[0] if result.data else None
+                self._loaded = True
+        return self._user
+
+class ActiveUsers:
+    """Whether recently seen users are still active, so requests don't read the users row"""
+    
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.cache = LRUCache(
+            "user_status",
+            max_size if max_size is not None else settings.USER_STATUS_CACHE_SIZE,
+            ttl if ttl is not None else settings.USER_STATUS_CACHE_TTL,
+        )
+        self._generation = 0  # bumped by every eviction
+        invalidation_bus.register("users", self._evict)
+    
+    async def check(self, principal: Principal) -> bool:
+        """Whether the caller's account exists and is active (read through the principal's row on a miss)"""
+        active = self.cache.get(principal.user_id)
+        if active is None:
+            generation = self._generation
+            user = await principal.user()
+            active = bool(user and user['is_active'])
+            # A deactivation that landed while we were reading may have made this stale
+            if generation == self._generation:
+                self.cache.set(principal.user_id, active)
+        return active
+    
+    async def deactivate(self, user_id: str):
+        """Stop accepting the user's credentials in every worker"""
+        await invalidation_bus.publish("users", key=str(user_id))
+    
+    def _evict(self, tenant: Optional[str], user_id: Optional[str]):
+        self._generation += 1
         if user_id is None:
+            self.cache.clear()
+        else:
+            self.cache.delete(user_id)
+    
+    def clear(self):
+        """Forget every user's status"""
+        self._generation += 1
+        self.cache.clear()
+
+# Global active user cache
+active_users = ActiveUsers()
+
+async def get_principal(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Authenticate the request's bearer token (a JWT or an API key) once and keep the principal on request.state"""
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    
+    token = credentials.credentials
+    api_key = None
+    if is_api_key(token):
+        api_key = await api_key_index.authenticate(token)
+        claims = {"user_id": api_key['user_id']} if api_key else {}
+    else:
+        try:
+            claims = auth_service.decode_token(token)
+        except Exception:
+            claims = {}
+    user_id = claims.get("user_id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
+        )
+    
+    principal = Principal(user_id, claims, token, api_key)
+    # Deleted accounts lose access at once, even with tokens issued before
+    if not await active_users.check(principal):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Account is deactivated"
+        )
+    request.state.principal = principal
+    return principal
+
+def require_permission(resource: str):
+    """A router dependency that limits API keys to the routes their permissions grant"""
+    async def check(request: Request, principal: Principal = Depends(get_principal)):
+        if principal.api_key_id and not permits(principal.permissions, resource, request.method):
             raise HTTPException(
-                status_code=401,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"API key is not permitted to {request.method} {resource}"
             )
-        
-        # Get user from database
-        # For now, return a mock user
-        # TODO: Implement actual database lookup
-        return User(
-            id=user_id,
-            email=payload.get("sub", ""),
-            is_active=True
-        )
-        
-    except JWTError:
+    return check
+
+async def get_current_user(principal: Principal = Depends(get_principal)) -> User:
+    """Get the current user's record"""
+    user = await principal.user()
+    if user is None:
         raise HTTPException(
-            status_code=401,
+            status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return User(**user)
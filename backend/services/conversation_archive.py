@@ -0,0 +1,249 @@
+"""
+Cold storage for archived conversations
+
+Archiving a conversation packs its messages into one gzip-compressed JSON
+blob, stores it under a fresh key in a blob store (a local directory, or
+process memory as an object-store stand-in), records the key on the
+conversation and then deletes the hot `messages` rows in chunks. Reading
+an archived conversation's messages loads the blob on demand and merges
+any rows written since; blobs never change once written, so decoded blobs
+are cached by key. Re-archiving folds the old blob and any new rows into a
+new blob, which also makes an interrupted run safe to repeat.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+
+from core.config import settings
+from core.database import get_db
+from core.dataloader import detach_loader
+from core.metrics import metrics
+from core.projections import CONVERSATION_ARCHIVE_COLUMNS, MESSAGE_COLUMNS
+from services.message_buffer import message_buffer
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_KEYSET = ['timestamp', 'id']
+
+class BlobStore:
+    """Base class for blob stores"""
+
+    async def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    async def get(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+class FileBlobStore(BlobStore):
+    """Blobs as files under a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial blob
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._remove, key)
+
+class MemoryBlobStore(BlobStore):
+    """Blobs in process memory (object-store stand-in for local testing)"""
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+
+    async def put(self, key: str, data: bytes):
+        self.blobs[key] = data
+
+    async def get(self, key: str) -> bytes:
+        if key not in self.blobs:
+            raise FileNotFoundError(key)
+        return self.blobs[key]
+
+    async def delete(self, key: str):
+        self.blobs.pop(key, None)
+
+def create_blob_store() -> BlobStore:
+    """Create the blob store selected by ARCHIVE_STORE"""
+    if settings.ARCHIVE_STORE == "file":
+        return FileBlobStore(settings.ARCHIVE_PATH)
+    if settings.ARCHIVE_STORE == "memory":
+        return MemoryBlobStore()
+    raise ValueError(f"Unknown archive store: {settings.ARCHIVE_STORE}")
+
+def pack(rows: List[Dict[str, Any]]) -> bytes:
+    """Serialize message rows into a compressed blob"""
+    return gzip.compress(json.dumps(rows, separators=(",", ":")).encode(), compresslevel=6)
+
+def unpack(data: bytes) -> List[Dict[str, Any]]:
+    """Read message rows back from a blob"""
+    return json.loads(gzip.decompress(data))
+
+def _merge(*sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Combine message rows (later sources win by id) in (timestamp, id) order"""
+    rows = {}
+    for source in sources:
+        for row in source:
+            rows[row['id']] = row
+    return sorted(rows.values(), key=lambda row: (row['timestamp'], row['id']))
+
+class ConversationArchive:
+    """Moves archived conversations' messages to cold storage and reads them back"""
+
+    def __init__(self, store: Optional[BlobStore] = None, chunk_size: Optional[int] = None, cache_size: Optional[int] = None):
+        self._store = store
+        self.chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+        self.cache_size = cache_size if cache_size is not None else settings.ARCHIVE_CACHE_SIZE
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def store(self) -> BlobStore:
+        if self._store is None:
+            self._store = create_blob_store()
+        return self._store
+
+    def schedule(self, conversation_id: str) -> asyncio.Task:
+        """Archive a conversation in the background; joins the run already in progress, if any"""
+        task = self._tasks.get(conversation_id)
+        if task is None or task.done():
+            task = asyncio.create_task(self._archive_once(conversation_id))
+            task.add_done_callback(self._log_failure)
+            self._tasks[conversation_id] = task
+        return task
+
+    async def _archive_once(self, conversation_id: str) -> int:
+        detach_loader()
+        try:
+            return await self.archive(conversation_id)
+        finally:
+            self._tasks.pop(conversation_id, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"❌ Failed to archive conversation: {str(task.exception())}")
+
+    async def archive(self, conversation_id: str) -> int:
+        """Move an archived conversation's hot messages into its blob; returns the number moved"""
+        db = get_db()
+        if settings.MESSAGE_BUFFER_ENABLED and message_buffer.has_pending(conversation_id):
+            await message_buffer.flush()
+
+        result = await db.table('conversations').select(CONVERSATION_ARCHIVE_COLUMNS).eq('id', conversation_id).execute()
+        if not result.data or result.data[0]['status'] != "archived":
+            return 0
+        old_key = result.data[0]['archive_key']
+
+        hot = await self._hot_messages(conversation_id)
+        if not hot:
+            return 0
+
+        started = time.perf_counter()
+        cold = await self._load(old_key) if old_key else []
+        data = pack(_merge(cold, hot))
+        new_key = f"conversations/{conversation_id}/{uuid.uuid4()}.json.gz"
+        await self.store.put(new_key, data)
+
+        # Point at the new blob before dropping anything it replaces
+        await db.table('conversations').update({'archive_key': new_key}).eq('id', conversation_id).execute()
+        if old_key:
+            await self.store.delete(old_key)
+            self._cache.pop(old_key, None)
+
+        ids = [row['id'] for row in hot]
+        for start in range(0, len(ids), self.chunk_size):
+            await db.table('messages').delete().in_('id', ids[start:start + self.chunk_size]).execute()
+
+        metrics.increment("archive.conversations")
+        metrics.increment("archive.messages", len(hot))
+        metrics.increment("archive.bytes", len(data))
+        metrics.observe("archive.seconds", time.perf_counter() - started)
+        logger.info(f"🧊 Archived {len(hot)} messages of conversation {conversation_id} ({len(data)} bytes)")
+        return len(hot)
+
+    async def _hot_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """All of a conversation's rows in the messages table, read a keyset page at a time"""
+        db = get_db()
+        rows: List[Dict[str, Any]] = []
+        while True:
+            query = db.table('messages').select(MESSAGE_COLUMNS).eq('conversation_id', conversation_id)
+            if rows:
+                query = query.after(MESSAGE_KEYSET, [rows[-1][column] for column in MESSAGE_KEYSET])
+            page = await query.order('timestamp').order('id').limit(self.chunk_size).execute()
+            rows.extend(page.data)
+            if len(page.data) < self.chunk_size:
+                return rows
+
+    async def _load(self, key: str) -> List[Dict[str, Any]]:
+        """Decode a blob, from the cache when possible"""
+        rows = self._cache.get(key)
+        if rows is not None:
+            self._cache.move_to_end(key)
+            metrics.increment("archive.cache_hits")
+            return rows
+
+        rows = unpack(await self.store.get(key))
+        metrics.increment("archive.blob_reads")
+        if self.cache_size > 0:
+            self._cache[key] = rows
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    async def read(self, conversation_id: str, archive_key: str) -> List[Dict[str, Any]]:
+        """All messages of an archived conversation in (timestamp, id) order"""
+        cold = await self._load(archive_key)
+        hot = await get_db().table('messages').select(MESSAGE_COLUMNS).eq('conversation_id', conversation_id).execute()
+        return _merge(cold, hot.data)
+
+    async def discard(self, archive_key: Optional[str]):
+        """Delete a conversation's blob (the conversation is gone)"""
+        if archive_key:
+            self._cache.pop(archive_key, None)
+            await self.store.delete(archive_key)
+
+    async def close(self):
+        """Wait for background archiving to finish"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+# Global conversation archive
+conversation_archive = ConversationArchive()
@@ -3,15 +3,15 @@ from datetime import datetime
 import uuid
 from models.conversation import ConversationCreate, ConversationUpdate, ConversationResponse
 from models.user import User
-from core.database import get_supabase
+from core.database import get_db
+from core.projections import CONVERSATION_COLUMNS, CONVERSATION_STATS_COLUMNS
 
 class ConversationService:
     def __init__(self):
         pass
 
-    def _get_supabase(self):
-        return get_supabase()
-        pass
+    def _get_db(self):
+        return get_db()
 
     async def create_conversation(self, conversation_data: ConversationCreate, user: User) -> ConversationResponse:
         """Create a new conversation"""
@@ -29,7 +29,7 @@ class ConversationService:
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        result = self._get_supabase().table("conversations").insert(conversation).execute()
+        result = await self._get_db().table("conversations").insert(conversation).execute()
         
         if result.data:
             return ConversationResponse(**result.data[0])
@@ -37,7 +37,7 @@ class ConversationService:
 
     async def get_conversation(self, conversation_id: str, user: User) -> Optional[ConversationResponse]:
         """Get a specific conversation by ID"""
-        result = self._get_supabase().table("conversations").select("*").eq("id", conversation_id).eq("user_id", user.id).execute()
+        result = await self._get_db().table("conversations").select(CONVERSATION_COLUMNS).eq("id", conversation_id).eq("user_id", user.id).execute()
         
         if result.data:
             return ConversationResponse(**result.data[0])
@@ -52,14 +52,14 @@ class ConversationService:
         offset: int = 0
     ) -> List[ConversationResponse]:
         """Get conversations for a user with optional filters"""
-        query = self._get_supabase().table("conversations").select("*").eq("user_id", user.id)
+        query = self._get_db().table("conversations").select(CONVERSATION_COLUMNS).eq("user_id", user.id)
         
         if agent_id:
             query = query.eq("agent_id", agent_id)
         if status:
             query = query.eq("status", status)
             
-        result = query.order("updated_at", desc=True).range(offset, offset + limit - 1).execute()
+        result = await query.order("updated_at", desc=True).range(offset, offset + limit - 1).execute()
         
         return [ConversationResponse(**conv) for conv in result.data]
 
@@ -78,7 +78,7 @@ class ConversationService:
         update_data = updates.dict(exclude_unset=True)
         update_data["updated_at"] = datetime.utcnow().isoformat()
         
-        result = self._get_supabase().table("conversations").update(update_data).eq("id", conversation_id).execute()
+        result = await self._get_db().table("conversations").update(update_data).eq("id", conversation_id).execute()
         
         if result.data:
             return ConversationResponse(**result.data[0])
@@ -91,7 +91,7 @@ class ConversationService:
         if not existing:
             return False
             
-        result = self._get_supabase().table("conversations").delete().eq("id", conversation_id).execute()
+        result = await self._get_db().table("conversations").delete().eq("id", conversation_id).execute()
         return len(result.data) > 0
 
     async def add_message(
@@ -118,15 +118,13 @@ class ConversationService:
             "created_at": datetime.utcnow().isoformat()
         }
         
-        result = self._get_supabase().table("conversation_messages").insert(message).execute()
+        result = await self._get_db().table("conversation_messages").insert(message).execute()
         
         if result.data:
-            # Update conversation timestamp
-            await self.update_conversation(
-                conversation_id, 
-                ConversationUpdate(updated_at=datetime.utcnow()), 
-                user
-            )
+            # Update conversation timestamp (ownership was checked above)
+            await self._get_db().table("conversations").update({
+                "updated_at": datetime.utcnow().isoformat()
+            }).eq("id", conversation_id).execute()
             return result.data[0]
         raise Exception("Failed to add message")
 
@@ -143,7 +141,7 @@ class ConversationService:
         if not conversation:
             return []
             
-        result = self._get_supabase().table("conversation_messages").select("*").eq("conversation_id", conversation_id).order("created_at", desc=False).range(offset, offset + limit - 1).execute()
+        result = await self._get_db().table("conversation_messages").select("*").eq("conversation_id", conversation_id).order("created_at", desc=False).range(offset, offset + limit - 1).execute()
         
         return result.data
 
@@ -174,7 +172,7 @@ class ConversationService:
         else:
             start_date = now - timedelta(weeks=1)
             
-        result = self._get_supabase().table("conversations").select("*").eq("user_id", user.id).gte("created_at", start_date.isoformat()).execute()
+        result = await self._get_db().table("conversations").select(CONVERSATION_STATS_COLUMNS).eq("user_id", user.id).gte("created_at", start_date.isoformat()).execute()
         
         conversations = result.data
         total_conversations = len(conversations)
@@ -184,7 +182,7 @@ class ConversationService:
         # Get message count
         if conversations:
             conversation_ids = [c["id"] for c in conversations]
-            message_result = self._get_supabase().table("conversation_messages").select("id").in_("conversation_id", conversation_ids).execute()
+            message_result = await self._get_db().table("conversation_messages").select("id").in_("conversation_id", conversation_ids).execute()
             total_messages = len(message_result.data)
         else:
             total_messages = 0
@@ -0,0 +1,110 @@
+"""
+Per-user data versions and conditional GETs
+
+Every write that changes what a user's agent or conversation listings or
+analytics return calls `data_versions.bump(user_id)`. A version is a random
+token stored in the user's `data_versions` row, so every worker reads the
+same one and it survives cache expiry and restarts. The shared cache holds
+it in front of the database: a bump writes a new token and evicts the cached
+one in every worker, so reading the current version is an L1 lookup.
+
+`conditional_get` is a route dependency for those GET endpoints. It tags the
+response with a strong ETag derived from the user's version and the request
+URL, and answers 304 before the handler runs any query when If-None-Match
+already names that tag. Tagged responses carry `Cache-Control: private,
+no-cache`, so browsers revalidate them instead of reusing them.
+
+Writes deferred by MESSAGE_BUFFER_ENABLED or AGENT_COUNTERS_FLUSH_INTERVAL
+bump once per flush, for every user whose rows the flush wrote
+(`bump_many`), so buffered messages cost no round trip of their own.
+"""
+from datetime import datetime
+from typing import Iterable
+import hashlib
+import logging
+import uuid
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from core.config import settings
+from core.database import get_db
+from core.engines.base import DatabaseError
+from core.metrics import metrics
+from core.shared_cache import SharedCache
+from services.auth_service import Principal, get_principal
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "private, no-cache"
+
+# The version of a user who has not written anything yet
+INITIAL_VERSION = "0"
+
+class DataVersions:
+    """Per-user change tokens, stored in the database and cached by every worker"""
+
+    def __init__(self, cache=None):
+        self.cache = cache or SharedCache("data_versions", ttl=settings.DATA_VERSION_TTL)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.ttl > 0
+
+    async def current(self, user_id: str) -> str:
+        """The user's data version"""
+        async def load():
+            result = await get_db().table('data_versions').select('version').eq('id', user_id).execute()
+            return result.data[0]['version'] if result.data else INITIAL_VERSION
+
+        return await self.cache.get_or_load(user_id, "version", load)
+
+    async def bump(self, user_id: str):
+        """Store a new version after a write"""
+        db = get_db()
+        changes = {'version': uuid.uuid4().hex, 'updated_at': datetime.utcnow().isoformat()}
+        updated = await db.table('data_versions').update(changes).eq('id', user_id).execute()
+        if not updated.data:
+            try:
+                await db.table('data_versions').insert({'id': user_id, **changes}).execute()
+            except DatabaseError:
+                # A concurrent first bump inserted the row first
+                await db.table('data_versions').update(changes).eq('id', user_id).execute()
+        await self.cache.invalidate(user_id, "version")
+        metrics.increment("data_versions.bumps")
+
+    async def bump_many(self, user_ids: Iterable[str]):
+        """Store new versions after a deferred flush (failures are logged, not raised)"""
+        for user_id in sorted(set(user_ids)):
+            try:
+                await self.bump(user_id)
+            except Exception as e:
+                logger.error(f"❌ Failed to bump data version of user {user_id}: {str(e)}")
+
+def etag(version: str, user_id: str, request: Request) -> str:
+    """The strong ETag of a GET for one data version"""
+    source = f"{version}:{user_id}:{request.url.path}?{request.url.query}"
+    return '"' + hashlib.sha256(source.encode()).hexdigest()[:32] + '"'
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    # If-None-Match compares weakly, so a W/ prefix added by a proxy still matches
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+async def conditional_get(request: Request, response: Response, principal: Principal = Depends(get_principal)):
+    """Tag the response with the user's data version, or answer 304 if the client already has it"""
+    if not data_versions.enabled:
+        return
+    tag = etag(await data_versions.current(principal.user_id), principal.user_id, request)
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, tag):
+        metrics.increment("conditional_get.not_modified")
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    metrics.increment("conditional_get.full_responses")
+    response.headers.update(headers)
+
+# Global data versions
+data_versions = DataVersions()
@@ -0,0 +1,24 @@
+"""
+Integrations cache
+
+The integrations endpoints keep each user's integration rows in the shared
+cache for INTEGRATION_CACHE_TTL seconds. Every integration write (and a user
+purge) calls `integration_cache.invalidate(user_id)`, which drops that
+user's rows in every worker.
+"""
+from typing import Any, Dict, List
+
+from core.config import settings
+from core.database import get_db
+from core.shared_cache import SharedCache
+
+async def get_user_integrations(user_id: str) -> List[Dict[str, Any]]:
+    """A user's integration rows, through the cache"""
+    async def load():
+        result = await get_db().table('integrations').select('*').eq('user_id', user_id).execute()
+        return result.data or []
+
+    return await integration_cache.get_or_load(user_id, "all", load)
+
+# Global integrations cache
+integration_cache = SharedCache("integrations", ttl=settings.INTEGRATION_CACHE_TTL)
@@ -0,0 +1,182 @@
+"""
+Write-behind buffer for conversation messages
+
+Queued message rows are written as multi-row inserts when a batch fills
+up or the oldest queued row has waited MESSAGE_BUFFER_FLUSH_INTERVAL.
+Each flush bumps `conversations.updated_at` once per conversation instead
+of once per message, and the data version once per user whose messages it
+wrote. Rows that fail to insert are queued again and retried up to
+MESSAGE_BUFFER_RETRIES times, waiting MESSAGE_BUFFER_RETRY_DELAY seconds
+before the first retry and twice as long before each next one; only a row
+that fails every retry is dropped (logged and counted under
+`messages.dropped`). The application lifespan drains the buffer, retries
+included, on shutdown.
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import time
+
+from core.config import settings
+from core.database import get_db
+from core.dataloader import detach_loader
+from core.metrics import metrics
+from services.data_version import data_versions
+
+logger = logging.getLogger(__name__)
+
+async def insert_messages(db, rows: List[Dict[str, Any]], chunk_size: int) -> Dict[str, str]:
+    """Insert message rows as chunked multi-row inserts; returns errors by message id"""
+    failures: Dict[str, str] = {}
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            await db.table('messages').insert(chunk).execute()
+        except Exception as e:
+            # Fall back to single-row inserts so one bad row doesn't sink the chunk
+            logger.warning(f"⚠️ Batched message insert failed, retrying row by row: {str(e)}")
+            for row in chunk:
+                try:
+                    await db.table('messages').insert(row).execute()
+                except Exception as row_error:
+                    failures[row["id"]] = str(row_error)
+                    logger.error(f"❌ Failed to insert message {row['id']}: {str(row_error)}")
+    return failures
+
+class MessageBuffer:
+    """Queues message rows and writes them in batches"""
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+    ):
+        self.batch_size = batch_size or settings.MESSAGE_BUFFER_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.MESSAGE_BUFFER_FLUSH_INTERVAL
+        self.max_pending = max_pending or settings.MESSAGE_BUFFER_MAX_PENDING
+        self.retries = retries if retries is not None else settings.MESSAGE_BUFFER_RETRIES
+        self.retry_delay = retry_delay if retry_delay is not None else settings.MESSAGE_BUFFER_RETRY_DELAY
+        self._rows: List[Dict[str, Any]] = []
+        self._retrying: List[Dict[str, Any]] = []  # failed rows waiting out their backoff
+        self._attempts: Dict[str, int] = {}  # message id -> failed inserts so far
+        self._owners: Dict[str, str] = {}  # message id -> the user whose data version the write bumps
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None  # sleeping until the interval elapses
+        self._flushing: Optional[asyncio.Task] = None
+        self._retrier: Optional[asyncio.Task] = None  # sleeping until failed rows are retried
+
+    @property
+    def pending(self) -> int:
+        """Number of queued rows, including rows waiting to be retried"""
+        return len(self._rows) + len(self._retrying)
+
+    def has_pending(self, conversation_id: str) -> bool:
+        """Check whether a conversation has queued messages"""
+        return any(row["conversation_id"] == conversation_id for row in self._rows)
+
+    async def add(self, row: Dict[str, Any], user_id: Optional[str] = None):
+        """Queue a message row (of `user_id`'s conversation)"""
+        self._rows.append(row)
+        if user_id is not None:
+            self._owners[row["id"]] = user_id
+        metrics.increment("messages.buffered")
+
+        if len(self._rows) >= self.max_pending:
+            # Backpressure: the store is falling behind, write before accepting more
+            await self.flush()
+        elif len(self._rows) >= self.batch_size:
+            if self._flushing is None or self._flushing.done():
+                self._flushing = asyncio.create_task(self._flush_now())
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_now(self):
+        detach_loader()
+        await self.flush()
+
+    async def _flush_later(self):
+        detach_loader()
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    async def _retry_later(self, delay: float):
+        detach_loader()
+        await asyncio.sleep(delay)
+        self._retrier = None
+        # Failed rows go back in front of the queue, in their original order
+        self._rows = self._retrying + self._rows
+        self._retrying = []
+        await self.flush()
+
+    async def flush(self):
+        """Write every queued row (rows waiting to be retried keep waiting)"""
+        async with self._lock:
+            while self._rows:
+                rows, self._rows = self._rows, []
+                # Shielded so a cancelled caller can't strand rows already taken off the queue
+                await asyncio.shield(self._write(rows))
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        db = get_db()
+        started = time.perf_counter()
+        failures = await insert_messages(db, rows, self.batch_size)
+        written = [row for row in rows if row["id"] not in failures]
+        owners = {self._owners.pop(row["id"], None) for row in written}
+        for row in written:
+            self._attempts.pop(row["id"], None)
+        self._retry([row for row in rows if row["id"] in failures])
+
+        # One updated_at bump per conversation, to its newest message
+        latest: Dict[str, str] = {}
+        for row in written:
+            conversation_id = row["conversation_id"]
+            if row["timestamp"] > latest.get(conversation_id, ""):
+                latest[conversation_id] = row["timestamp"]
+        for conversation_id, timestamp in latest.items():
+            try:
+                await db.table('conversations').update({'updated_at': timestamp}).eq('id', conversation_id).execute()
+            except Exception as e:
+                logger.error(f"❌ Failed to bump conversation {conversation_id}: {str(e)}")
+        if written:
+            await data_versions.bump_many(owners - {None})
+
+        metrics.increment("messages.flushed", len(written))
+        metrics.increment("messages.conversation_updates", len(latest))
+        metrics.observe("messages.flush_seconds", time.perf_counter() - started)
+
+    def _retry(self, failed: List[Dict[str, Any]]):
+        """Queue failed rows for another attempt, or drop those out of retries"""
+        for row in failed:
+            self._attempts[row["id"]] = attempts = self._attempts.get(row["id"], 0) + 1
+            if attempts > self.retries:
+                del self._attempts[row["id"]]
+                self._owners.pop(row["id"], None)
+                metrics.increment("messages.dropped")
+                logger.error(f"❌ Dropped message {row['id']} after {self.retries} retries")
+                continue
+            self._retrying.append(row)
+            metrics.increment("messages.retried")
+        if self._retrying and (self._retrier is None or self._retrier.done()):
+            delay = self.retry_delay * 2 ** (min(self._attempts[row["id"]] for row in self._retrying) - 1)
+            self._retrier = asyncio.create_task(self._retry_later(delay))
+
+    async def close(self):
+        """Drain the buffer"""
+        if self._timer is not None:
+            # Still sleeping: the final flush below covers its rows
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is not None and not self._flushing.done():
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        self._flushing = None
+        await self.flush()
+        # Let failed rows run through their retries before giving up on them
+        while self._retrier is not None:
+            await asyncio.gather(self._retrier, return_exceptions=True)
+
+# Global message buffer
+message_buffer = MessageBuffer()
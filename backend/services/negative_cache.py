@@ -0,0 +1,41 @@
+"""
+Negative lookup cache
+
+Lookups that found nothing (a missing or deleted agent, a conversation
+that doesn't exist or belongs to another user) are remembered for
+NEGATIVE_CACHE_TTL seconds, so clients retrying against dead ids get their
+404 without a database round trip. At most NEGATIVE_CACHE_SIZE keys are
+kept, least recently used out first, so a scan of random ids can't grow
+memory. Nothing ever needs to be forgotten: creates get fresh
+server-generated ids, and a deleted agent or conversation never comes
+back, so entries simply expire.
+"""
+from typing import Optional, Tuple
+
+from core.cache import LRUCache
+from core.config import settings
+
+class NegativeCache:
+    """Bounded, short-lived set of keys known to have no row"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.cache = LRUCache(
+            "negative",
+            max_size if max_size is not None else settings.NEGATIVE_CACHE_SIZE,
+            ttl if ttl is not None else settings.NEGATIVE_CACHE_TTL,
+        )
+
+    def is_missing(self, key: Tuple[str, ...]) -> bool:
+        """Whether a lookup for `key` recently found nothing"""
+        return self.cache.get(key) is not None
+
+    def remember(self, key: Tuple[str, ...]):
+        """Record that `key` has no row"""
+        self.cache.set(key, True)
+
+    def clear(self):
+        """Forget every key"""
+        self.cache.clear()
+
+# Global negative lookup cache
+negative_cache = NegativeCache()
@@ -0,0 +1,141 @@
+"""
+Password hashing off the event loop
+
+A bcrypt hash or verify burns a few hundred milliseconds of CPU. Running it
+inside an `async def` handler stalls every other request on the worker, so
+hashing goes to a dedicated thread pool (bcrypt releases the GIL while it
+works) of PASSWORD_POOL_WORKERS threads. At most PASSWORD_POOL_QUEUE calls
+may wait for a thread; beyond that the request fails fast with 503 instead
+of queueing for seconds. Time spent waiting for a thread and hashing are
+reported as the `password_pool.wait_seconds` and `password_pool.run_seconds`
+timings.
+
+Hashes use BCRYPT_ROUNDS, or with BCRYPT_TARGET_MS set, the highest cost
+whose hash takes at most that long on this machine (calibrated at startup
+within CALIBRATION_ROUNDS). A successful login with a hash of any other
+cost stores a fresh hash at the current cost.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from core.config import settings
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Costs the target-latency policy may choose from
+CALIBRATION_ROUNDS = (10, 16)
+
+def make_context(rounds: int) -> CryptContext:
+    """bcrypt context that hashes at `rounds` and flags hashes of any other cost for update"""
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+def choose_rounds(target_seconds: float, timer: Callable[[int], float]) -> int:
+    """Highest cost in CALIBRATION_ROUNDS whose hash should take at most `target_seconds`"""
+    low, high = CALIBRATION_ROUNDS
+    # Each extra round doubles the work; time the cheapest cost twice and extrapolate
+    base = min(timer(low), timer(low))
+    rounds = low
+    while rounds < high and base * 2 ** (rounds + 1 - low) <= target_seconds:
+        rounds += 1
+    return rounds
+
+def time_hash(rounds: int) -> float:
+    """Seconds one hash at `rounds` takes here"""
+    context = make_context(rounds)
+    started = time.perf_counter()
+    context.hash("calibration")
+    return time.perf_counter() - started
+
+class PasswordPoolBusy(HTTPException):
+    """Every hashing thread is busy and the wait queue is full"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+class PasswordPool:
+    """Bounded thread pool for password hashing and verification"""
+
+    def __init__(self, workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.workers = workers or settings.PASSWORD_POOL_WORKERS or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.PASSWORD_POOL_QUEUE
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.configure(settings.BCRYPT_ROUNDS)
+
+    def configure(self, rounds: int):
+        """Hash at `rounds` from now on"""
+        self.rounds = rounds
+        self.context = make_context(rounds)
+
+    async def calibrate(self, target_ms: float) -> int:
+        """Pick the cost for the target hash latency on this machine"""
+        rounds = await asyncio.get_running_loop().run_in_executor(None, choose_rounds, target_ms / 1000, time_hash)
+        self.configure(rounds)
+        logger.info(f"🔐 bcrypt cost {rounds} chosen for a {target_ms:g} ms target")
+        return rounds
+
+    @property
+    def in_flight(self) -> int:
+        """Calls running or waiting for a thread"""
+        return self._in_flight
+
+    async def hash(self, password: str) -> str:
+        """Hash a password"""
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Check a password against its hash"""
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; on success also return a new hash if the stored one has another cost"""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        if self._in_flight >= self.workers + self.max_queue:
+            metrics.increment("password_pool.rejected")
+            raise PasswordPoolBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+
+        self._in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            waited, took, result = await asyncio.get_running_loop().run_in_executor(self._executor, _timed, submitted, fn, args)
+        finally:
+            self._in_flight -= 1
+        metrics.observe("password_pool.wait_seconds", waited)
+        metrics.observe("password_pool.run_seconds", took)
+        return result
+
+    def close(self):
+        """Stop the worker threads once running calls finish"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+def _timed(submitted: float, fn: Callable[..., Any], args) -> Tuple[float, float, Any]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return started - submitted, time.perf_counter() - started, result
+
+# Global password pool
+password_pool = PasswordPool()
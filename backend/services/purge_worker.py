@@ -0,0 +1,213 @@
+"""
+Background purge of deleted users and agents
+
+Deleting a user or agent only marks it deleted and queues a `purge_jobs`
+row, so the request returns immediately. The worker then removes the
+dependent rows in chunks of PURGE_CHUNK_SIZE (select a page of ids, delete
+by id), sleeps PURGE_CHUNK_PAUSE between chunks so the purge never holds
+long locks or crowds out live traffic, and records the rows deleted per
+table on the job. The parent row goes last, when nothing is left for
+`ON DELETE CASCADE` to do.
+
+Every step is idempotent, so a job interrupted by a restart simply runs
+again. A worker claims a job by bumping its `updated_at`; a running job
+whose `updated_at` is older than PURGE_LEASE is taken over.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import uuid
+
+from core.config import settings
+from core.database import get_db
+from core.dataloader import detach_loader
+from core.metrics import metrics
+from core.projections import ID_COLUMNS, CONVERSATION_ARCHIVE_COLUMNS
+from services.agent_cache import agent_cache
+from services.conversation_archive import conversation_archive
+from services.data_version import data_versions
+from services.integration_cache import integration_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows keyed by conversation, purged before their conversation
+CONVERSATION_CHILDREN = ("messages", "conversation_messages")
+
+# Rows keyed by agent or user, purged before their parent (revoked_tokens
+# outlive the user until they expire, see services/token_revocation.py)
+AGENT_CHILDREN = ("training_data", "training_sessions", "agent_performance")
+USER_CHILDREN = ("integrations", "api_keys")
+
+class _LeaseLost(Exception):
+    """Another worker took over the job"""
+
+class PurgeWorker:
+    """Runs queued purge jobs in throttled chunks"""
+
+    def __init__(self, chunk_size: Optional[int] = None, pause: Optional[float] = None):
+        self.chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+        self.pause = pause if pause is not None else settings.PURGE_CHUNK_PAUSE
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._job: Optional[Dict[str, Any]] = None  # the job being run (one at a time)
+
+    async def enqueue(self, target: str, target_id: str, user_id: str) -> Dict[str, Any]:
+        """Queue the purge of a soft-deleted user or agent"""
+        now = datetime.utcnow().isoformat()
+        result = await get_db().table('purge_jobs').insert({
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'target': target,
+            'target_id': target_id,
+            'status': "pending",
+            'progress': {},
+            'created_at': now,
+            'updated_at': now,
+        }).execute()
+        metrics.increment("purge.jobs_queued")
+        self._wake.set()
+        return result.data[0]
+
+    def start(self):
+        """Start processing jobs in the background"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop; unfinished jobs resume on the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        detach_loader()
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_pending()
+            except Exception as e:
+                logger.error(f"❌ Purge worker error: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.PURGE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_pending(self) -> int:
+        """Run every job that is queued or whose worker went away; returns the number finished"""
+        async with self._lock:
+            return await self._run_jobs()
+
+    async def _run_jobs(self) -> int:
+        db = get_db()
+        jobs = await db.table('purge_jobs').select('*').in_('status', ["pending", "running"]).order('created_at').execute()
+        stale_before = (datetime.utcnow() - timedelta(seconds=settings.PURGE_LEASE)).isoformat()
+
+        finished = 0
+        for job in jobs.data:
+            if job['status'] == "running" and job['updated_at'] > stale_before:
+                continue  # another worker holds it
+            claimed = await self._touch(job, status="running")
+            if claimed is None:
+                continue
+            if await self._process(claimed):
+                finished += 1
+        return finished
+
+    async def _touch(self, job: Dict[str, Any], **changes) -> Optional[Dict[str, Any]]:
+        """Update a job we still hold (its updated_at is unchanged); None if another worker took it"""
+        changes['updated_at'] = datetime.utcnow().isoformat()
+        result = await get_db().table('purge_jobs').update(changes).eq('id', job['id']).eq('updated_at', job['updated_at']).execute()
+        return result.data[0] if result.data else None
+
+    async def _process(self, job: Dict[str, Any]) -> bool:
+        logger.info(f"🧹 Purging {job['target']} {job['target_id']}")
+        self._job = job
+        try:
+            if job['target'] == "agent":
+                await self._purge_agent(job['target_id'])
+            elif job['target'] == "user":
+                await self._purge_user(job['target_id'])
+            else:
+                raise ValueError(f"Unknown purge target: {job['target']}")
+        except _LeaseLost:
+            logger.warning(f"⚠️ Purge job {job['id']} was taken over by another worker")
+            return False
+        except Exception as e:
+            logger.error(f"❌ Purge job {job['id']} failed: {str(e)}")
+            metrics.increment("purge.jobs_failed")
+            await self._touch(self._job, status="failed", error=str(e))
+            return False
+
+        await self._touch(self._job, status="completed", completed_at=datetime.utcnow().isoformat())
+        metrics.increment("purge.jobs_completed")
+        logger.info(f"✅ Purged {job['target']} {job['target_id']}: {self._job['progress']}")
+        return True
+
+    async def _purge_user(self, user_id: str):
+        db = get_db()
+        while True:
+            agents = await db.table('agents').select(ID_COLUMNS).eq('user_id', user_id).limit(self.chunk_size).execute()
+            if not agents.data:
+                break
+            for agent in agents.data:
+                await self._purge_agent(agent['id'])
+
+        await self._purge_conversations('user_id', user_id)
+        for table in USER_CHILDREN:
+            await self._purge_rows(table, 'user_id', [user_id])
+        await self._purge_rows('data_versions', 'id', [user_id])
+        await integration_cache.invalidate(user_id)
+        await self._purge_rows('users', 'id', [user_id])
+
+    async def _purge_agent(self, agent_id: str):
+        await self._purge_conversations('agent_id', agent_id)
+        for table in AGENT_CHILDREN:
+            await self._purge_rows(table, 'agent_id', [agent_id])
+        await self._purge_rows('agents', 'id', [agent_id])
+        await agent_cache.invalidate(agent_id)
+
+    async def _purge_conversations(self, column: str, value: str):
+        """Purge conversations a chunk at a time, each chunk's messages first and archived blobs last"""
+        db = get_db()
+        while True:
+            conversations = await db.table('conversations').select(CONVERSATION_ARCHIVE_COLUMNS).eq(column, value).limit(self.chunk_size).execute()
+            ids = [row['id'] for row in conversations.data]
+            if not ids:
+                return
+            for table in CONVERSATION_CHILDREN:
+                await self._purge_rows(table, 'conversation_id', ids)
+            await self._delete_chunk('conversations', ids)
+            await data_versions.bump(self._job['user_id'])
+            for row in conversations.data:
+                await conversation_archive.discard(row['archive_key'])
+
+    async def _purge_rows(self, table: str, column: str, values: List[str]):
+        """Delete every row of `table` whose `column` is in `values`, a chunk at a time"""
+        db = get_db()
+        while True:
+            rows = await db.table(table).select(ID_COLUMNS).in_(column, values).limit(self.chunk_size).execute()
+            ids = [row['id'] for row in rows.data]
+            if not ids:
+                return
+            await self._delete_chunk(table, ids)
+
+    async def _delete_chunk(self, table: str, ids: List[str]):
+        deleted = await get_db().table(table).delete().in_('id', ids).execute()
+        metrics.increment("purge.rows_deleted", len(deleted.data))
+
+        # Record progress; this also renews our claim on the job
+        progress = dict(self._job['progress'] or {})
+        progress[table] = progress.get(table, 0) + len(deleted.data)
+        job = await self._touch(self._job, progress=progress)
+        if job is None:
+            raise _LeaseLost()
+        self._job = job
+
+        if self.pause:
+            await asyncio.sleep(self.pause)
+
+# Global purge worker
+purge_worker = PurgeWorker()
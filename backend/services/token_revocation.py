@@ -0,0 +1,183 @@
+"""
+Access token revocation
+
+Logout and refresh revoke the presented token until it expires. Revoked
+tokens are stored in `revoked_tokens` by SHA-256 digest (the persistent
+store), held in an exact in-memory set, and fronted by a Bloom filter, so
+checking a token that was never revoked (almost every request) costs a few
+hashes and no database round trip; only a filter hit consults the exact
+set. The filter and set are rebuilt from the table at startup. A
+revocation is published on the invalidation bus, so other workers add it
+at once; as a fallback for missed messages they also re-read the table
+every TOKEN_REVOCATION_REFRESH_INTERVAL seconds. That poll starts
+TOKEN_REVOCATION_REFRESH_OVERLAP seconds before the newest created_at
+already seen, so rows stamped by a slower clock or committed after a
+later-stamped row are still picked up; re-adding a known row is a no-op.
+Expired rows are dropped on rebuild, since an expired token fails
+validation anyway; that is also the only cleanup, so purging a user keeps
+their revocations.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import asyncio
+import hashlib
+import logging
+import math
+
+from core.config import settings
+from core.database import get_db
+from core.dataloader import detach_loader
+from core.engines.base import DatabaseError
+from core.invalidation import invalidation_bus
+from core.metrics import metrics
+from core.projections import REVOKED_TOKEN_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+def token_digest(token: str) -> bytes:
+    """SHA-256 of a token, the key for the token cache and the denylist"""
+    return hashlib.sha256(token.encode()).digest()
+
+class BloomFilter:
+    """Bloom filter over 32-byte digests"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        # The digest is already uniform; derive k positions by double hashing
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class TokenDenylist:
+    """Revoked access tokens: Bloom filter, exact set, persistent table"""
+
+    def __init__(self, capacity: Optional[int] = None, error_rate: Optional[float] = None, refresh_interval: Optional[float] = None, refresh_overlap: Optional[float] = None):
+        self.capacity = capacity or settings.TOKEN_REVOCATION_CAPACITY
+        self.error_rate = error_rate or settings.TOKEN_REVOCATION_ERROR_RATE
+        self.refresh_interval = refresh_interval if refresh_interval is not None else settings.TOKEN_REVOCATION_REFRESH_INTERVAL
+        self._revoked: Dict[bytes, str] = {}  # digest -> expires_at
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._seen_until = ""  # created_at of the newest row loaded
+        self.refresh_overlap = refresh_overlap if refresh_overlap is not None else settings.TOKEN_REVOCATION_REFRESH_OVERLAP
+        self._refresher: Optional[asyncio.Task] = None
+        invalidation_bus.register("revoked_tokens", self._on_revoked)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, digest: bytes) -> bool:
+        """Whether a token digest has been revoked"""
+        if digest not in self._filter:
+            return False
+        if digest in self._revoked:
+            return True
+        metrics.increment("token_revocation.false_positives")
+        return False
+
+    async def revoke(self, token: str, exp: float, user_id: Optional[str] = None):
+        """Revoke a token until its expiry"""
+        digest = token_digest(token)
+        if digest in self._revoked:
+            return
+        expires_at = datetime.utcfromtimestamp(exp).isoformat()
+        db = get_db()
+        try:
+            await db.table('revoked_tokens').insert({
+                'id': digest.hex(),
+                'user_id': user_id,
+                'expires_at': expires_at,
+                'created_at': datetime.utcnow().isoformat()
+            }).execute()
+        except DatabaseError:
+            # Another worker revoked it first and this one hasn't refreshed yet: already done
+            existing = await db.table('revoked_tokens').select('id').eq('id', digest.hex()).execute()
+            if not existing.data:
+                raise
+        await invalidation_bus.publish("revoked_tokens", user_id, (digest.hex(), expires_at))
+        metrics.increment("token_revocation.revoked")
+
+    def _on_revoked(self, user_id: Optional[str], key):
+        """Add a revocation published by any worker, this one included"""
+        if key is not None:
+            digest, expires_at = key
+            self._add(bytes.fromhex(digest), expires_at)
+
+    def _add(self, digest: bytes, expires_at: str):
+        if digest in self._revoked:
+            return
+        self._revoked[digest] = expires_at
+        if self._filter.count >= self._filter.capacity:
+            self._rebuild_filter()
+        else:
+            self._filter.add(digest)
+
+    def _rebuild_filter(self):
+        """Size a new filter for the live entries, dropping expired ones"""
+        now = datetime.utcnow().isoformat()
+        self._revoked = {digest: expires_at for digest, expires_at in self._revoked.items() if expires_at > now}
+        bloom = BloomFilter(max(self.capacity, 2 * len(self._revoked)), self.error_rate)
+        for digest in self._revoked:
+            bloom.add(digest)
+        self._filter = bloom
+
+    async def rebuild(self):
+        """Reload every unexpired revocation from the table and prune expired rows"""
+        db = get_db()
+        now = datetime.utcnow().isoformat()
+        await db.table('revoked_tokens').delete().lte('expires_at', now).execute()
+        result = await db.table('revoked_tokens').select(REVOKED_TOKEN_COLUMNS).execute()
+        self._revoked = {bytes.fromhex(row['id']): row['expires_at'] for row in result.data}
+        self._seen_until = max((row['created_at'] for row in result.data), default="")
+        self._rebuild_filter()
+        logger.info(f"🚫 Loaded {len(self._revoked)} revoked tokens")
+
+    async def refresh(self):
+        """Pick up revocations written since the last load (e.g. by other workers)"""
+        query = get_db().table('revoked_tokens').select(REVOKED_TOKEN_COLUMNS)
+        if self._seen_until:
+            since = datetime.fromisoformat(self._seen_until) - timedelta(seconds=self.refresh_overlap)
+            query = query.gte('created_at', since.isoformat())
+        result = await query.execute()
+        for row in result.data:
+            self._add(bytes.fromhex(row['id']), row['expires_at'])
+        self._seen_until = max([self._seen_until] + [row['created_at'] for row in result.data])
+
+    async def warm(self):
+        """Rebuild from the table and start following it"""
+        await self.rebuild()
+        if self.refresh_interval > 0 and (self._refresher is None or self._refresher.done()):
+            self._refresher = asyncio.create_task(self._refresh_forever())
+
+    async def _refresh_forever(self):
+        detach_loader()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"❌ Failed to refresh revoked tokens: {str(e)}")
+
+    async def close(self):
+        """Stop following the table"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+# Global token denylist
+token_denylist = TokenDenylist()
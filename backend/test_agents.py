@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Agent tests: chat turns, the agent cache and conversation counters
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import USER_ID, run, make_db, auth_headers
+
+def test_chat_turn_over_api():
+    """A chat turn is stored with its response; other users can't chat with the agent"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "chat@example.com")
+    agent = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Chatty", "agent_type": "support"})
+    agent_id = agent.json()["id"]
+
+    turn = client.post(f"/api/v1/agents/{agent_id}/chat", headers=headers, json={"message": "Where is my order?"})
+    assert turn.status_code == 200
+    assert turn.json()["status"] == "completed"
+    assert "Where is my order?" in turn.json()["response"]
+
+    stored = client.get(f"/api/v1/conversations/{turn.json()['id']}", headers=headers)
+    assert stored.json()["status"] == "completed"
+
+    _, other_headers = auth_headers(client, "stranger@example.com")
+    denied = client.post(f"/api/v1/agents/{agent_id}/chat", headers=other_headers, json={"message": "hi"})
+    assert denied.status_code == 403
+    database.db = None
+
+def test_agent_cache_serves_chat_and_follows_writes():
+    """Repeated chats read the agent from the cache; updates and deletes invalidate it"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.agent_cache import agent_cache
+
+    engine = MemoryEngine()
+    agent_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'agents' and query.action == 'select':
+            agent_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "cached@example.com")
+    agent_id = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Cached", "agent_type": "support"}).json()["id"]
+
+    for _ in range(3):
+        assert client.post(f"/api/v1/agents/{agent_id}/chat", headers=headers, json={"message": "hi"}).status_code == 200
+    assert len(agent_reads) == 1
+
+    renamed = client.put(f"/api/v1/agents/{agent_id}", headers=headers, json={"name": "Renamed"})
+    assert renamed.status_code == 200
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).json()["name"] == "Renamed"
+
+    assert client.delete(f"/api/v1/agents/{agent_id}", headers=headers).status_code == 202
+    assert client.post(f"/api/v1/agents/{agent_id}/chat", headers=headers, json={"message": "hi"}).status_code == 404
+    agent_cache.clear()
+    database.db = None
+
+def test_agent_counters_merge_and_apply(engine_name):
+    from core import database
+    from services.agent_counters import AgentCounters
+
+    async def scenario():
+        db = await make_db(engine_name)
+        database.db = db
+        await db.table('agents').insert([
+            {'id': "agent-1", 'user_id': USER_ID, 'name': "One"},
+            {'id': "agent-2", 'user_id': USER_ID, 'name': "Two"},
+        ]).execute()
+
+        counters = AgentCounters(flush_interval=60)
+        await counters.conversation_created("agent-1", "active", "2025-01-02T00:00:00")
+        await counters.conversation_created("agent-1", "active", "2025-01-01T00:00:00")
+        await counters.status_changed("agent-1", "active", "completed", "2025-01-03T00:00:00")
+        await counters.conversation_created("agent-2", "failed", "2025-01-01T00:00:00")
+        await counters.conversation_deleted("agent-2", "failed")
+        assert counters.pending == 2
+
+        calls = []
+        original = db.engine.execute
+        async def counting(query):
+            calls.append(query.action)
+            return await original(query)
+        db.engine.execute = counting
+        await counters.close()
+        assert calls == ["rpc"] and counters.pending == 0
+
+        rows = await db.table('agents').select('id,total_conversations,completed_conversations,failed_conversations,last_active').order('id').execute()
+        assert rows.data == [
+            {'id': "agent-1", 'total_conversations': 2, 'completed_conversations': 1, 'failed_conversations': 0, 'last_active': "2025-01-03T00:00:00"},
+            {'id': "agent-2", 'total_conversations': 0, 'completed_conversations': 0, 'failed_conversations': 0, 'last_active': "2025-01-01T00:00:00"},
+        ]
+        await db.close()
+        database.db = None
+
+    run(scenario())
+
+def test_agent_stats_follow_conversations():
+    """Agent listings report counters kept up to date by conversation writes"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "stats@example.com")
+    agent = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Counted", "agent_type": "support"})
+    agent_id = agent.json()["id"]
+
+    ids = [client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id}).json()["id"] for _ in range(4)]
+    assert client.post(f"/api/v1/conversations/{ids[0]}/complete", headers=headers).status_code == 200
+    assert client.post(f"/api/v1/conversations/{ids[0]}/complete", headers=headers).status_code == 200
+    assert client.put(f"/api/v1/conversations/{ids[1]}", headers=headers, json={"status": "failed"}).status_code == 200
+    assert client.delete(f"/api/v1/conversations/{ids[3]}", headers=headers).status_code == 200
+    assert client.post(f"/api/v1/agents/{agent_id}/chat", headers=headers, json={"message": "hi"}).status_code == 200
+
+    listed = client.get("/api/v1/agents/", headers=headers).json()[0]
+    assert listed["total_conversations"] == 4
+    assert listed["success_rate"] == 50.0
+    assert listed["last_active"] is not None
+    database.db = None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+API key tests
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import run, auth_headers
+
+def test_api_key_auth_and_batched_last_used(monkeypatch):
+    """API keys authenticate through the in-memory index; revoking one takes effect at once"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.api_keys import ApiKeyIndex, api_key_index, key_digest
+    from services.negative_cache import negative_cache
+
+    database.db = Database(MemoryEngine())
+    monkeypatch.setattr(api_key_index, "last_used_interval", 0)
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "server@example.com")
+    created = client.post("/api/v1/users/me/api-keys", headers=headers, json={"name": "CI", "permissions": ["agents:read"]})
+    assert created.status_code == 201
+    key = created.json()["key"]
+    stored = run(database.db.table('api_keys').select('key_hash').execute()).data
+    assert stored == [{'key_hash': key_digest(key)}]
+
+    key_headers = {"Authorization": f"Bearer {key}"}
+    assert client.get("/api/v1/agents/", headers=key_headers).status_code == 200
+    assert client.post("/api/v1/users/me/api-keys", headers=key_headers, json={"name": "Nested"}).status_code == 403
+
+    # Permissions limit the key to reading agents
+    agent = {"user_id": user_id, "name": "Scoped", "agent_type": "support"}
+    assert client.post("/api/v1/agents/", headers=key_headers, json=agent).status_code == 403
+    assert client.get("/api/v1/conversations/", headers=key_headers).status_code == 403
+    assert client.get("/api/v1/users/me", headers=key_headers).status_code == 403
+    assert client.post("/api/v1/users/me/api-keys", headers=headers, json={"name": "Typo", "permissions": ["agent:read"]}).status_code == 400
+    writer = client.post("/api/v1/users/me/api-keys", headers=headers, json={"name": "Writer", "permissions": ["agents:write"]}).json()
+    writer_headers = {"Authorization": f"Bearer {writer['key']}"}
+    assert client.post("/api/v1/agents/", headers=writer_headers, json=agent).status_code == 201
+    assert client.get("/api/v1/agents/", headers=writer_headers).status_code == 200
+    unrestricted = client.post("/api/v1/users/me/api-keys", headers=headers, json={"name": "Full"}).json()
+    assert client.get("/api/v1/users/me", headers={"Authorization": f"Bearer {unrestricted['key']}"}).status_code == 200
+    listed = client.get("/api/v1/users/me/api-keys", headers=headers).json()
+    assert [entry["name"] for entry in listed] == ["CI", "Writer", "Full"]
+    assert "key" not in listed[0] and listed[0]["last_used"] is not None
+
+    assert client.delete(f"/api/v1/users/me/api-keys/{listed[0]['id']}", headers=headers).status_code == 200
+    assert client.get("/api/v1/agents/", headers=key_headers).status_code == 401
+    assert client.get("/api/v1/agents/", headers={"Authorization": "Bearer ask_unknown"}).status_code == 401
+
+    async def batched():
+        # A fresh index warms from the table and writes last_used once per interval
+        index = ApiKeyIndex(refresh_interval=0, last_used_interval=0.05)
+        key_id = str(uuid.uuid4())
+        await database.db.table('api_keys').insert({'id': key_id, 'user_id': user_id, 'name': "Batch", 'key_hash': key_digest("ask_batch")}).execute()
+        await index.warm()
+        assert len(index) == 3  # Writer, Full and Batch
+        writes, lookups = [], []
+        execute = database.db.engine.execute
+
+        async def counting_execute(query):
+            if query.table == 'api_keys' and query.action == 'update':
+                writes.append(query)
+            if query.table == 'api_keys' and query.action == 'select':
+                lookups.append(query)
+            return await execute(query)
+
+        database.db.engine.execute = counting_execute
+        for _ in range(5):
+            assert (await index.authenticate("ask_batch"))['id'] == key_id
+        assert writes == []
+        await asyncio.sleep(0.1)
+        assert len(writes) == 1
+
+        # Unknown keys reach the table once, then come from the negative cache
+        for _ in range(3):
+            assert await index.authenticate("ask_nope") is None
+        assert len(lookups) == 1
+
+        # Each key gets its own last_used
+        other_id = str(uuid.uuid4())
+        await database.db.table('api_keys').update({'last_used': None}).eq('id', key_id).execute()
+        await database.db.table('api_keys').insert({'id': other_id, 'user_id': user_id, 'name': "Other", 'key_hash': key_digest("ask_other")}).execute()
+        index._last_used = {key_id: "2025-01-01T00:00:00", other_id: "2025-01-02T00:00:00"}
+        await index.flush()
+        rows = await database.db.table('api_keys').select('id,last_used').in_('id', [key_id, other_id]).execute()
+        assert {row['id']: row['last_used'] for row in rows.data} == {key_id: "2025-01-01T00:00:00", other_id: "2025-01-02T00:00:00"}
+        await index.close()
+
+    run(batched())
+    negative_cache.clear()
+    database.db = None
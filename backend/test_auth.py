@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Authentication tests: tokens, revocation and password hashing
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import USER_ID, run, auth_headers
+
+def test_verified_token_cache_honors_exp_and_logout():
+    """Repeat checks of a token are served from the cache until it expires or is logged out"""
+    import time
+    from jose import JWTError, jwt
+    from services.auth_service import AuthService, token_cache, token_digest
+
+    auth_service = AuthService()
+    token = auth_service.create_access_token({"sub": "cache@example.com", "user_id": USER_ID})
+    token_cache.clear()
+    hits = token_cache.hits
+    assert auth_service.get_user_id_from_token(token) == USER_ID
+    assert auth_service.get_user_id_from_token(token) == USER_ID
+    assert token_cache.hits == hits + 1
+
+    # An entry past its exp is never served
+    token_cache.set(token_digest(token), {"user_id": USER_ID, "exp": time.time() - 1})
+    expired = jwt.encode({"user_id": USER_ID, "exp": int(time.time()) - 1}, auth_service.secret_key, algorithm=auth_service.algorithm)
+    token_cache.set(token_digest(expired), {"user_id": USER_ID, "exp": time.time() - 1})
+    assert auth_service.get_user_id_from_token(expired) is None
+    assert auth_service.get_user_id_from_token(token) == USER_ID  # re-verified
+
+    auth_service.forget_token(token)
+    assert token_cache.get(token_digest(token)) is None
+    with pytest.raises(JWTError):
+        auth_service.decode_token(expired)
+    token_cache.clear()
+
+def test_auth_dependency_decodes_and_loads_user_once(monkeypatch):
+    """A request decodes its token once and reads the user row at most once"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.auth_service import auth_service
+
+    engine = MemoryEngine()
+    user_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'users' and query.action == 'select':
+            user_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    _, headers = auth_headers(client, "principal@example.com")
+
+    decodes = []
+    decode_token = auth_service.decode_token
+    monkeypatch.setattr(auth_service, "decode_token", lambda token: decodes.append(token) or decode_token(token))
+    user_reads.clear()
+    me = client.get("/api/v1/auth/me", headers=headers)
+    assert me.status_code == 200 and me.json()["email"] == "principal@example.com"
+    assert len(decodes) == 1 and len(user_reads) == 1
+
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 200
+    assert len(decodes) == 2 and len(user_reads) == 1  # no user row needed
+
+    invalid = client.get("/api/v1/agents/", headers={"Authorization": "Bearer not-a-token"})
+    assert invalid.status_code == 401 and invalid.json()["detail"] == "Invalid token"
+    database.db = None
+
+def test_password_pool_rejects_when_saturated():
+    """Hashing runs off the event loop; calls beyond the threads and queue get a fast 503"""
+    import threading
+    from services.password_pool import PasswordPool, PasswordPoolBusy
+    from core.metrics import metrics
+
+    async def scenario():
+        pool = PasswordPool(workers=1, max_queue=1)
+        hashed = await pool.hash("password123")
+        assert await pool.verify("password123", hashed) and not await pool.verify("wrong", hashed)
+
+        release = threading.Event()
+        blocked = [asyncio.ensure_future(pool._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.in_flight == 2
+        with pytest.raises(PasswordPoolBusy) as busy:
+            await pool.verify("password123", hashed)
+        assert busy.value.status_code == 503
+        release.set()
+        await asyncio.gather(*blocked)
+        assert pool.in_flight == 0
+        pool.close()
+
+    waits = metrics.timings["password_pool.wait_seconds"].count
+    run(scenario())
+    assert metrics.timings["password_pool.wait_seconds"].count == waits + 5
+    assert metrics.counters["password_pool.rejected"] >= 1
+
+def test_bcrypt_cost_calibration_and_rehash_on_login():
+    """The target-latency policy picks a cost; logins move stored hashes to the current cost"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from core.config import settings
+    from main import app
+    from services.password_pool import password_pool, choose_rounds
+
+    # 10 ms at cost 10, doubling per round
+    assert choose_rounds(0.1, lambda rounds: 0.01 * 2 ** (rounds - 10)) == 13
+    assert choose_rounds(0.001, lambda rounds: 0.01) == 10
+    assert choose_rounds(60, lambda rounds: 0.01 * 2 ** (rounds - 10)) == 16
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    try:
+        password_pool.configure(4)
+        auth_headers(client, "rehash@example.com")
+        stored = lambda: run(database.db.table('users').select('hashed_password').eq('email', "rehash@example.com").execute()).data[0]['hashed_password']
+        assert stored().startswith("$2b$04$")
+
+        password_pool.configure(5)
+        assert client.post("/api/v1/auth/login", json={"email": "rehash@example.com", "password": "wrong-password"}).status_code == 401
+        assert stored().startswith("$2b$04$")
+        assert client.post("/api/v1/auth/login", json={"email": "rehash@example.com", "password": "password123"}).status_code == 200
+        assert stored().startswith("$2b$05$")
+    finally:
+        password_pool.configure(settings.BCRYPT_ROUNDS)
+        database.db = None
+
+def test_token_revocation_on_logout_and_refresh():
+    """Logged-out and refreshed-away tokens stop working, also after a rebuild from the table"""
+    import hashlib
+    import time
+    from datetime import datetime, timedelta
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.token_revocation import BloomFilter, TokenDenylist, token_denylist, token_digest
+
+    bloom = BloomFilter(1000, 0.01)
+    digests = [hashlib.sha256(str(i).encode()).digest() for i in range(11000)]
+    for digest in digests[:1000]:
+        bloom.add(digest)
+    assert all(digest in bloom for digest in digests[:1000])
+    assert sum(digest in bloom for digest in digests[1000:]) < 300
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    _, headers = auth_headers(client, "revoke@example.com")
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 401
+
+    login = client.post("/api/v1/auth/login", json={"email": "revoke@example.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    refreshed = client.post("/api/v1/auth/refresh", headers=headers)
+    assert refreshed.status_code == 200
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 401
+    new_headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+    assert client.get("/api/v1/agents/", headers=new_headers).status_code == 200
+
+    async def rebuilt():
+        await database.db.table('revoked_tokens').insert({'id': "00" * 32, 'expires_at': "2000-01-01T00:00:00", 'created_at': "2000-01-01T00:00:00"}).execute()
+        denylist = TokenDenylist(refresh_interval=0)
+        await denylist.rebuild()
+        assert len(denylist) == 2  # the expired row was pruned
+        assert denylist.is_revoked(token_digest(headers["Authorization"].split(" ", 1)[1]))
+        assert not denylist.is_revoked(token_digest(new_headers["Authorization"].split(" ", 1)[1]))
+
+    async def raced():
+        token = new_headers["Authorization"].split(" ", 1)[1]
+        worker_a, worker_b = TokenDenylist(refresh_interval=0), TokenDenylist(refresh_interval=0)
+        await worker_a.revoke(token, time.time() + 60)
+        assert worker_b.is_revoked(token_digest(token))  # published on the bus
+        # A worker that missed the message and hasn't refreshed yet
+        worker_c = TokenDenylist(refresh_interval=0)
+        worker_c._revoked.clear()
+        await worker_c.revoke(token, time.time() + 60)
+        assert worker_c.is_revoked(token_digest(token))
+        rows = await database.db.table('revoked_tokens').select('id').eq('id', token_digest(token).hex()).execute()
+        assert len(rows.data) == 1
+
+    async def skewed():
+        # A row stamped before the newest one already seen (slower clock, later commit)
+        denylist = TokenDenylist(refresh_interval=0, refresh_overlap=300)
+        await denylist.rebuild()
+        late = datetime.fromisoformat(denylist._seen_until) - timedelta(seconds=60)
+        await database.db.table('revoked_tokens').insert({'id': "11" * 32, 'expires_at': "2999-01-01T00:00:00", 'created_at': late.isoformat()}).execute()
+        await denylist.refresh()
+        assert denylist.is_revoked(bytes.fromhex("11" * 32))
+
+    run(rebuilt())
+    run(raced())
+    run(skewed())
+    token_denylist._revoked.clear()
+    database.db = None
+
+def test_deleted_account_loses_access_at_once():
+    """Tokens issued before an account deletion stop working, during the purge and after it"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.auth_service import active_users
+    from services.purge_worker import purge_worker
+
+    engine = MemoryEngine()
+    user_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'users' and query.action == 'select':
+            user_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    _, headers = auth_headers(client, "gone@example.com")
+    _, other_headers = auth_headers(client, "staying@example.com")
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 200
+    reads = len(user_reads)
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 200
+    assert len(user_reads) == reads  # the active check is cached
+
+    assert client.delete("/api/v1/users/me", headers=headers).status_code == 202
+    for path in ["/api/v1/agents/", "/api/v1/auth/me", "/api/v1/conversations/"]:
+        denied = client.get(path, headers=headers)
+        assert denied.status_code == 401 and denied.json()["detail"] == "Account is deactivated"
+    assert client.delete("/api/v1/users/me", headers=headers).status_code == 401
+
+    run(purge_worker.run_pending())
+    active_users.clear()
+    assert client.get("/api/v1/agents/", headers=headers).status_code == 401
+    assert client.get("/api/v1/agents/", headers=other_headers).status_code == 200
+    database.db = None
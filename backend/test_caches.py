@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Cache tests: the LRU and shared caches, invalidation, single-flight
+and the negative cache
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import TEST_DATABASE_URL, run, auth_headers
+
+def test_lru_cache_expires_and_evicts():
+    """Entries expire after their TTL and the least recently used entry is evicted first"""
+    from core.cache import LRUCache
+
+    now = [0.0]
+    cache = LRUCache("test", max_size=2, ttl=10.0, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 10.0
+    assert cache.get("a") is None and len(cache) == 1
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+    assert cache.stats() == {"size": 1, "max_size": 2, "hits": 2, "misses": 3, "evictions": 1, "hit_rate": 0.4}
+
+def test_shared_cache_tiers_tenants_and_stampedes():
+    """Workers share L2 entries, tenants stay apart, one miss loads once and L2 outages fail open"""
+    from core.metrics import metrics
+    from core.shared_cache import MemoryCacheBackend, SharedCache, decode, encode
+
+    row = {"id": "a1", "config": {"tags": ["support"] * 200}}
+    packed = encode(row)
+    assert packed[:1] == b"\x02" and len(packed) < 100
+    assert decode(packed) == row and encode({"n": 1}) == b'\x01{"n":1}'
+
+    now = [0.0]
+    backend = MemoryCacheBackend(clock=lambda: now[0])
+    worker_a = SharedCache("things", ttl=10.0, backend=backend)
+    worker_b = SharedCache("things", ttl=10.0, backend=backend)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return row
+
+    class DownBackend:
+        async def get(self, key):
+            raise ConnectionError("redis is down")
+        set = add = delete = get
+
+    async def scenario():
+        results = await asyncio.gather(*(
+            cache.get_or_load("tenant-1", ("agent", "a1"), load) for cache in [worker_a, worker_b] * 5
+        ))
+        assert results == [row] * 10 and len(loads) == 1
+        results[0]["id"] = "changed"  # callers get their own copy
+        assert (await worker_a.get("tenant-1", ("agent", "a1")))["id"] == "a1"
+        assert await worker_b.get("tenant-2", ("agent", "a1")) is None
+
+        # A fresh worker is filled from L2; entries expire there after their TTL
+        worker_c = SharedCache("things", backend=backend)
+        assert await worker_c.get("tenant-1", ("agent", "a1")) == row
+        now[0] = 10.0
+        assert await backend.get(worker_c.key("tenant-1", ("agent", "a1"))) is None
+        await worker_a.set("tenant-1", "k", [1, 2], ttl=5.0)
+        await worker_a.invalidate("tenant-1", "k")
+        assert await worker_a.get("tenant-1", "k") is None and len(backend) == 0
+
+        errors = metrics.counters["cache.backend_errors"]
+        down = SharedCache("things", backend=DownBackend())
+        assert await down.get_or_load("tenant-1", "k", load) == row
+        assert len(loads) == 2 and metrics.counters["cache.backend_errors"] > errors
+
+    run(scenario())
+
+def test_invalidation_bus_evicts_in_other_workers():
+    """Published invalidations run every worker's handlers once, over loopback and LISTEN/NOTIFY"""
+    from core.invalidation import InvalidationBus, LoopbackTransport, PostgresTransport
+    from core.metrics import metrics
+    from core.shared_cache import MemoryCacheBackend, SharedCache
+
+    async def deliver_between(transport_a, transport_b):
+        worker_a, worker_b = InvalidationBus(transport_a), InvalidationBus(transport_b)
+        evicted_a, evicted_b = [], []
+        worker_a.register("things", lambda tenant, key: evicted_a.append((tenant, key)))
+        worker_b.register("things", lambda tenant, key: evicted_b.append((tenant, key)))
+        await worker_a.start()
+        await worker_b.start()
+        received = metrics.timings["cache_invalidation.latency_seconds"].count
+        await worker_a.publish("things", "tenant-1", ("agent", "a1"))
+        await worker_a.publish("other", "tenant-1")
+        for _ in range(100):
+            if metrics.timings["cache_invalidation.latency_seconds"].count == received + 2:
+                break
+            await asyncio.sleep(0.02)
+        assert evicted_a == evicted_b == [("tenant-1", ("agent", "a1"))]
+        assert metrics.timings["cache_invalidation.latency_seconds"].count == received + 2
+        await worker_a.close()
+        await worker_b.close()
+
+    async def scenario():
+        loopback = LoopbackTransport()
+        await deliver_between(loopback, loopback)
+        if TEST_DATABASE_URL:
+            await deliver_between(PostgresTransport(TEST_DATABASE_URL), PostgresTransport(TEST_DATABASE_URL))
+
+        # A tenant-wide invalidation drops the tenant's L2 entries and every L1 copy
+        backend = MemoryCacheBackend()
+        cache = SharedCache("bus-test", backend=backend)
+        await cache.set("tenant-1", "a", 1)
+        await cache.set("tenant-1", "b", 2)
+        await cache.set("tenant-2", "a", 3)
+        await cache.invalidate("tenant-1")
+        assert await cache.get("tenant-1", "a") is None and await cache.get("tenant-1", "b") is None
+        assert await cache.get("tenant-2", "a") == 3 and len(backend) == 1
+
+    run(scenario())
+
+def test_analytics_served_from_shared_cache():
+    """Repeated analytics reads are answered from the shared cache until a write invalidates them"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from core.invalidation import InvalidationBus, invalidation_bus
+    from main import app
+
+    engine = MemoryEngine()
+    conversation_reads = []
+    agent_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'conversations' and query.action == 'select':
+            conversation_reads.append(query)
+        if query.table == 'agents' and query.action == 'select':
+            agent_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "analytics@example.com")
+    _, other_headers = auth_headers(client, "analytics-other@example.com")
+
+    first = client.get("/api/v1/analytics/costs?timeframe=7d", headers=headers)
+    assert first.status_code == 200
+    assert client.get("/api/v1/analytics/costs?timeframe=7d", headers=headers).json() == first.json()
+    assert len(conversation_reads) == 1
+    client.get("/api/v1/analytics/costs?timeframe=90d", headers=headers)
+    client.get("/api/v1/analytics/costs?timeframe=7d", headers=other_headers)
+    assert len(conversation_reads) == 3
+
+    # Writes invalidate the user's analytics, here and in other workers
+    agent_id = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Counted", "agent_type": "support"}).json()["id"]
+    client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id, "title": "One"})
+    assert client.get("/api/v1/analytics/costs?timeframe=7d", headers=headers).json()["total_conversations"] == 1
+    assert len(conversation_reads) == 4
+
+    other_worker = InvalidationBus(invalidation_bus.transport)
+    run(invalidation_bus.start())
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).status_code == 200
+    reads = len(agent_reads)
+    run(other_worker.publish("agents", key=agent_id))
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).status_code == 200
+    assert len(agent_reads) == reads + 1
+    run(invalidation_bus.close())
+    database.db = None
+
+def test_integrations_cached_until_an_integration_write(monkeypatch, caplog):
+    """Integration reads come from the shared cache; writes evict them, and loopback refuses several workers"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from core.config import settings
+    from core.invalidation import InvalidationBus, LoopbackTransport
+    from main import app
+
+    engine = MemoryEngine()
+    integration_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'integrations' and query.action == 'select':
+            integration_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    _, headers = auth_headers(client, "integrations@example.com")
+    _, other_headers = auth_headers(client, "integrations-other@example.com")
+
+    assert client.get("/api/v1/integrations/", headers=headers).json() == []
+    assert client.get("/api/v1/integrations/status", headers=headers).json() == {}
+    assert len(integration_reads) == 1
+
+    assert client.post("/api/v1/integrations/slack", headers=headers, json={"channel": "ops"}).status_code == 200
+    assert client.get("/api/v1/integrations/status", headers=headers).json()["slack"]["config"] == {"channel": "ops"}
+    assert client.get("/api/v1/integrations/", headers=other_headers).json() == []
+    client.post("/api/v1/integrations/slack", headers=headers, json={"channel": "support"})
+    assert client.get("/api/v1/integrations/", headers=headers).json()[0]["config"] == {"channel": "support"}
+    assert client.delete("/api/v1/integrations/slack", headers=headers).status_code == 200
+    assert client.get("/api/v1/integrations/", headers=headers).json() == []
+    database.db = None
+
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    bus = InvalidationBus(LoopbackTransport())
+    run(bus.start())  # development only warns
+    assert "CACHE_INVALIDATION_TRANSPORT=loopback" in caplog.text
+    run(bus.close())
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+    with pytest.raises(RuntimeError):
+        run(InvalidationBus(LoopbackTransport()).start())
+
+def test_single_flight_collapses_concurrent_identical_reads():
+    """Concurrent identical GETs share one computation; a cancelled leader hands over"""
+    import httpx
+    from fastapi.testclient import TestClient
+    from core import database
+    from core.config import settings
+    from core.singleflight import SingleFlight
+    from main import app
+    from services.analytics_cache import analytics_cache, analytics_flights
+
+    flights = SingleFlight("test")
+    started = []
+
+    async def compute(value):
+        started.append(value)
+        await asyncio.sleep(0.05)
+        if value == "boom":
+            raise ValueError(value)
+        return {"value": value}
+
+    async def unit():
+        results = await asyncio.gather(*(flights.run("a", lambda: compute("a")) for _ in range(4)), flights.run("b", lambda: compute("b")))
+        assert results == [{"value": "a"}] * 4 + [{"value": "b"}] and started == ["a", "b"]
+        assert flights.stats() == {"in_flight": 0, "calls": 5, "collapsed": 3, "collapse_ratio": 0.6}
+        errors = await asyncio.gather(*(flights.run("boom", lambda: compute("boom")) for _ in range(2)), return_exceptions=True)
+        assert [str(e) for e in errors] == ["boom", "boom"] and started.count("boom") == 1
+
+        leader = asyncio.create_task(flights.run("c", lambda: compute("c")))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.run("c", lambda: compute("c")))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == {"value": "c"} and started.count("c") == 2
+
+    run(unit())
+
+    engine = MemoryEngine()
+    scans = []
+    execute = engine.execute
+
+    async def slow_execute(query):
+        if query.table == 'conversations' and query.action == 'select':
+            scans.append(query)
+            await asyncio.sleep(0.05)
+        return await execute(query)
+
+    engine.execute = slow_execute
+    database.db = Database(engine)
+    _, headers = auth_headers(TestClient(app), "burst@example.com")
+    calls, collapsed = analytics_flights.calls, analytics_flights.collapsed
+    analytics_cache.ttl = 0  # every burst computes unless collapsed
+
+    async def burst():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await asyncio.gather(*(client.get(path, headers=headers) for path in ["/api/v1/analytics/trends"] * 3 + ["/api/v1/analytics/costs?timeframe=7d"] * 2))
+
+    try:
+        responses = run(burst())
+    finally:
+        analytics_cache.ttl = settings.ANALYTICS_CACHE_TTL
+        database.db = None
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len(scans) == 2
+    assert (analytics_flights.calls - calls, analytics_flights.collapsed - collapsed) == (5, 3)
+
+def test_negative_cache_answers_repeat_misses():
+    """Repeat lookups of missing agents and conversations skip the database until the key expires"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.negative_cache import NegativeCache, negative_cache
+
+    bounded = NegativeCache(max_size=2, ttl=5.0)
+    for key in [("agent", "a"), ("agent", "b"), ("agent", "c")]:
+        bounded.remember(key)
+    assert len(bounded.cache) == 2 and not bounded.is_missing(("agent", "a"))
+    assert bounded.is_missing(("agent", "b")) and bounded.is_missing(("agent", "c"))
+    expired = NegativeCache(max_size=2, ttl=0.01)
+    expired.remember(("agent", "a"))
+    time.sleep(0.02)
+    assert not expired.is_missing(("agent", "a"))
+
+    engine = MemoryEngine()
+    reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table in ('agents', 'conversations') and query.action == 'select':
+            reads.append(query.table)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "negative@example.com")
+    missing = str(uuid.uuid4())
+
+    for _ in range(3):
+        assert client.get(f"/api/v1/agents/{missing}", headers=headers).status_code == 404
+        assert client.get(f"/api/v1/conversations/{missing}", headers=headers).status_code == 404
+        assert client.post(f"/api/v1/conversations/{missing}/messages", headers=headers, json={"content": "hi"}).status_code == 404
+        assert client.get(f"/api/v1/conversations/{missing}/messages", headers=headers).status_code == 404
+    assert reads == ['agents', 'conversations']
+
+    agent_id = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Here", "agent_type": "support"}).json()["id"]
+    conversation_id = client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id}).json()["id"]
+    assert client.delete(f"/api/v1/conversations/{conversation_id}", headers=headers).status_code == 200
+    reads.clear()
+    assert client.get(f"/api/v1/conversations/{conversation_id}", headers=headers).status_code == 404
+    assert reads == []
+
+    # Creates get fresh ids, so they never hit a remembered key
+    assert client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id}).status_code == 201
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).status_code == 200
+    negative_cache.clear()
+    database.db = None
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Conditional GET tests: ETags and 304s on listings and analytics
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import USER_ID, auth_headers, make_db, run, seed
+
+def test_conditional_get_answers_304_until_a_write():
+    """Listings and analytics send ETags and skip every query while the client's copy is current"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.data_version import _matches
+
+    assert _matches('"a", W/"b"', '"b"') and _matches("*", '"c"') and not _matches('"a"', '"b"')
+
+    engine = MemoryEngine()
+    reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table in ('agents', 'conversations') and query.action == 'select':
+            reads.append(query.table)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "etag@example.com")
+    _, other_headers = auth_headers(client, "etag-other@example.com")
+    agent_id = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Tagged", "agent_type": "support"}).json()["id"]
+
+    paths = ["/api/v1/agents/", "/api/v1/conversations/", "/api/v1/conversations/?limit=5", "/api/v1/analytics/overview"]
+    tags = {}
+    for path in paths:
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200 and response.headers["cache-control"] == "private, no-cache"
+        tags[path] = response.headers["etag"]
+    assert len(set(tags.values())) == len(paths)
+    assert client.get(paths[0], headers=other_headers).headers["etag"] != tags[paths[0]]
+
+    reads.clear()
+    for path in paths:
+        response = client.get(path, headers={**headers, "If-None-Match": tags[path]})
+        assert response.status_code == 304 and response.headers["etag"] == tags[path] and response.content == b""
+    assert reads == []
+
+    # Each kind of write starts a new version
+    conversation_id = client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id}).json()["id"]
+    response = client.get(paths[1], headers={**headers, "If-None-Match": tags[paths[1]]})
+    assert response.status_code == 200 and len(response.json()) == 1
+    tag = response.headers["etag"]
+    assert client.post(f"/api/v1/conversations/{conversation_id}/messages", headers=headers, json={"content": "hi"}).status_code == 200
+    assert client.get(paths[1], headers={**headers, "If-None-Match": tag}).status_code == 200
+    database.db = None
+
+def test_data_versions_agree_across_workers(engine_name):
+    """Versions live in the database: every worker reads the same one, and cache expiry keeps it"""
+    from core import database
+    from core.shared_cache import MemoryCacheBackend, SharedCache
+    from services.data_version import INITIAL_VERSION, DataVersions
+
+    async def scenario():
+        database.db = await make_db(engine_name)
+        # Each worker has its own in-process L2; the invalidation bus connects them
+        worker_a = DataVersions(SharedCache("data_versions_test", ttl=60, backend=MemoryCacheBackend()))
+        worker_b = DataVersions(SharedCache("data_versions_test", ttl=60, backend=MemoryCacheBackend()))
+        assert await worker_a.current(USER_ID) == await worker_b.current(USER_ID) == INITIAL_VERSION
+
+        await worker_a.bump(USER_ID)
+        version = await worker_b.current(USER_ID)
+        assert version != INITIAL_VERSION and await worker_a.current(USER_ID) == version
+
+        # An expired cache entry reloads the same version
+        worker_b.cache.l1.clear()
+        worker_b.cache.backend.clear()
+        assert await worker_b.current(USER_ID) == version
+
+        await worker_b.bump(USER_ID)
+        assert await worker_a.current(USER_ID) not in (version, INITIAL_VERSION)
+        stored = await database.db.table('data_versions').select('id').execute()
+        assert [row['id'] for row in stored.data] == [USER_ID]
+        await database.db.close()
+        database.db = None
+
+    run(scenario())
+
+def test_deferred_writes_bump_once_per_flush():
+    """Buffered messages and batched agent counters bump each owner's version when their flush lands"""
+    from core import database
+    from services.agent_counters import AgentCounters
+    from services.data_version import data_versions
+    from services.message_buffer import MessageBuffer
+
+    async def scenario():
+        database.db = Database(MemoryEngine())
+        await seed(database.db)
+        await database.db.table('agents').insert({'id': "agent-1", 'user_id': USER_ID, 'name': "One"}).execute()
+        writes = []
+        execute = database.db.engine.execute
+
+        async def counting_execute(query):
+            if query.table == 'data_versions' and query.action != 'select':
+                writes.append(query.action)
+            return await execute(query)
+
+        database.db.engine.execute = counting_execute
+        before = await data_versions.current(USER_ID)
+
+        buffer = MessageBuffer(batch_size=100, flush_interval=60)
+        for n in range(3):
+            await buffer.add({'id': f"msg-{n}", 'conversation_id': "conv-1", 'role': "user", 'content': "hi", 'metadata': {}, 'timestamp': f"2025-02-01T00:00:0{n}"}, USER_ID)
+        assert writes == [] and await data_versions.current(USER_ID) == before
+        await buffer.close()
+        assert len(writes) == 2  # the first bump finds no row and inserts it
+        after_messages = await data_versions.current(USER_ID)
+        assert after_messages != before
+
+        counters = AgentCounters(flush_interval=60)
+        await counters.conversation_created("agent-1", "active", "2025-02-02T00:00:00", USER_ID)
+        await counters.status_changed("agent-1", "active", "completed", "2025-02-02T00:00:01", USER_ID)
+        assert await data_versions.current(USER_ID) == after_messages
+        await counters.close()
+        assert len(writes) == 3 and await data_versions.current(USER_ID) != after_messages
+        database.db = None
+
+    run(scenario())
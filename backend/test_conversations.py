@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Conversation tests: message appends, pagination and the message buffer
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import run, seed, auth_headers
+
+def test_bulk_message_append():
+    """One call appends many messages and reports per-item results"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "bulk@example.com")
+    agent = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Relay", "agent_type": "support"})
+    conversation = client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent.json()["id"]})
+    conversation_id = conversation.json()["id"]
+
+    response = client.post(f"/api/v1/conversations/{conversation_id}/messages/batch", headers=headers, json={"messages": [
+        {"role": "user", "content": "first", "timestamp": "2025-01-01T09:00:00+02:00"},
+        {"role": "robot", "content": "bad role"},
+        {"role": "assistant", "content": "second"},
+        {"content": "third"},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (3, 1)
+    assert [r["status"] for r in body["results"]] == ["created", "failed", "created", "created"]
+    assert body["results"][1]["error"] == "Role must be 'user' or 'assistant'"
+
+    messages = client.get(f"/api/v1/conversations/{conversation_id}/messages", headers=headers).json()
+    assert [m["content"] for m in messages] == ["first", "second", "third"]
+    assert messages[0]["timestamp"] == "2025-01-01T07:00:00"
+
+    _, other_headers = auth_headers(client, "other@example.com")
+    denied = client.post(f"/api/v1/conversations/{conversation_id}/messages/batch", headers=other_headers, json={
+        "messages": [{"content": "intrusion"}],
+    })
+    assert denied.status_code == 404
+    database.db = None
+
+def test_cursor_pagination_over_api():
+    """Cursor pages walk every conversation once; offset parameters still return a plain list"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "pages@example.com")
+    agent = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Pager", "agent_type": "support"})
+    created = {client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent.json()["id"]}).json()["id"] for _ in range(5)}
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = client.get("/api/v1/conversations/", headers=headers, params={"limit": 2, "cursor": cursor}).json()
+        seen.extend(c["id"] for c in page["data"])
+        cursor = page["next_cursor"]
+    assert len(seen) == 5 and set(seen) == created
+
+    legacy = client.get("/api/v1/conversations/", headers=headers, params={"limit": 2, "offset": 2})
+    assert [c["id"] for c in legacy.json()] == seen[2:4]
+
+    invalid = client.get("/api/v1/conversations/", headers=headers, params={"cursor": "not-a-cursor", "status": "active"})
+    assert invalid.status_code == 400
+    database.db = None
+
+def test_message_buffer_batches_and_drains():
+    """Queued messages are written in multi-row inserts with one updated_at bump per conversation"""
+    from core import database
+    from services.message_buffer import MessageBuffer
+
+    async def scenario():
+        database.db = Database(MemoryEngine())
+        await seed(database.db)
+        buffer = MessageBuffer(batch_size=2, flush_interval=60)
+        try:
+            for n, conv_id in enumerate(["conv-1", "conv-1", "conv-2"]):
+                await buffer.add({
+                    'id': f"msg-{n}",
+                    'conversation_id': conv_id,
+                    'role': "user",
+                    'content': f"hello {n}",
+                    'metadata': {},
+                    'timestamp': f"2025-02-01T00:00:0{n}",
+                })
+            assert buffer.has_pending("conv-2")
+
+            # Shutdown drains everything still queued
+            await buffer.close()
+            assert buffer.pending == 0
+
+            messages = await database.db.table('messages').select('id').order('id').execute()
+            assert [m['id'] for m in messages.data] == ["msg-0", "msg-1", "msg-2"]
+            conversations = await database.db.table('conversations').select('id,updated_at').in_(
+                'id', ["conv-1", "conv-2"]
+            ).order('id').execute()
+            assert [c['updated_at'] for c in conversations.data] == ["2025-02-01T00:00:01", "2025-02-01T00:00:02"]
+        finally:
+            database.db = None
+
+    run(scenario())
+
+def test_message_buffer_retries_failed_rows():
+    """Rows that fail to insert are retried with backoff and only dropped after the last retry"""
+    from core import database
+    from core.engines.base import DatabaseError
+    from core.metrics import metrics
+    from services.message_buffer import MessageBuffer
+
+    async def scenario():
+        engine = MemoryEngine()
+        database.db = Database(engine)
+        await seed(database.db)
+        down = [True]
+        execute = engine.execute
+
+        async def failing_execute(query):
+            if query.table == 'messages' and query.action == 'insert':
+                rows = query.payload if isinstance(query.payload, list) else [query.payload]
+                if down[0] or any(row['id'] == "msg-bad" for row in rows):
+                    raise DatabaseError("connection lost")
+            return await execute(query)
+
+        engine.execute = failing_execute
+        buffer = MessageBuffer(batch_size=10, flush_interval=60, retries=2, retry_delay=0.01)
+        row = {'conversation_id': "conv-1", 'role': "user", 'content': "hello", 'metadata': {}, 'timestamp': "2025-02-01T00:00:00"}
+        try:
+            await buffer.add({**row, 'id': "msg-0"})
+            await buffer.flush()
+            assert buffer.pending == 1  # waiting out its backoff
+
+            down[0] = False
+            await asyncio.sleep(0.05)
+            assert buffer.pending == 0
+            messages = await database.db.table('messages').select('id').execute()
+            assert [m['id'] for m in messages.data] == ["msg-0"]
+
+            dropped = metrics.counters["messages.dropped"]
+            await buffer.add({**row, 'id': "msg-bad"})
+            await buffer.close()
+            assert buffer.pending == 0 and metrics.counters["messages.dropped"] == dropped + 1
+        finally:
+            database.db = None
+
+    run(scenario())
+
+def test_conversations_only_open_on_own_agents():
+    """Another tenant can't open, complete or delete conversations on an agent, so its counters stay put"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "owner-agent@example.com")
+    _, other_headers = auth_headers(client, "intruder@example.com")
+    agent_id = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Mine", "agent_type": "support"}).json()["id"]
+    conversation_id = client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id}).json()["id"]
+
+    foreign = client.post("/api/v1/conversations/", headers=other_headers, json={"agent_id": agent_id})
+    assert foreign.status_code == 404 and foreign.json()["detail"] == "Agent not found"
+    assert client.post("/api/v1/conversations/", headers=other_headers, json={"agent_id": str(uuid.uuid4())}).status_code == 404
+    assert client.post(f"/api/v1/conversations/{conversation_id}/complete", headers=other_headers).status_code == 404
+    assert client.delete(f"/api/v1/conversations/{conversation_id}", headers=other_headers).status_code == 404
+    assert client.get("/api/v1/conversations/", headers=other_headers).json() == []
+
+    listed = client.get("/api/v1/agents/", headers=headers).json()[0]
+    assert listed["total_conversations"] == 1 and listed["success_rate"] == 0.0
+    database.db = None
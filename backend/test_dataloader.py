@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Request loader tests: coalescing, batching and the metrics endpoint
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.dataloader import RequestLoader, _current_loader
+from core.engines.memory import MemoryEngine
+from testutils import run, seed
+
+def test_request_loader_coalesces_and_batches():
+    """Identical reads share one round trip, concurrent id lookups share one in_ query"""
+    async def scenario():
+        db = Database(MemoryEngine())
+        await seed(db)
+        loader = RequestLoader()
+        token = _current_loader.set(loader)
+        try:
+            first = await db.table('conversations').select('id,status').eq('id', "conv-1").execute()
+            second = await db.table('conversations').select('id,status').eq('id', "conv-1").execute()
+            assert first.data == second.data == [{'id': "conv-1", 'status': "completed"}]
+            assert (loader.requested, loader.round_trips) == (2, 1)
+
+            results = await asyncio.gather(*(
+                db.table('conversations').select('status').eq('id', conv_id).execute()
+                for conv_id in ["conv-2", "conv-3", "missing"]
+            ))
+            assert [r.data for r in results] == [[{'status': "completed"}], [{'status': "active"}], []]
+            assert (loader.requested, loader.round_trips) == (5, 2)
+
+            # A write drops the table's cached reads
+            await db.table('conversations').update({'status': "failed"}).eq('id', "conv-1").execute()
+            after = await db.table('conversations').select('id,status').eq('id', "conv-1").execute()
+            assert after.data == [{'id': "conv-1", 'status': "failed"}]
+            assert loader.saved == 3
+        finally:
+            _current_loader.reset(token)
+
+    run(scenario())
+
+def test_request_loader_survives_a_cancelled_leader():
+    """Callers that joined a batch or a shared read run their own query when its leader is cancelled"""
+    async def scenario():
+        engine = MemoryEngine()
+        db = Database(engine)
+        await seed(db)
+        stalled = []
+        execute = engine.execute
+
+        async def stalling_execute(query):
+            if not stalled:  # the first query to reach the engine hangs until cancelled
+                stalled.append(query)
+                await asyncio.Event().wait()
+            return await execute(query)
+
+        engine.execute = stalling_execute
+        token = _current_loader.set(RequestLoader())
+        try:
+            lookups = [
+                asyncio.create_task(db.table('conversations').select('status').eq('id', conv_id).execute())
+                for conv_id in ["conv-1", "conv-2", "conv-3"]
+            ]
+            await asyncio.sleep(0.01)
+            assert stalled[0].filters == [("in", "id", ["conv-1", "conv-2", "conv-3"])]
+            lookups[0].cancel()
+            results = await asyncio.wait_for(asyncio.gather(*lookups[1:]), timeout=1)
+            assert [r.data for r in results] == [[{'status': "completed"}], [{'status': "active"}]]
+
+            stalled.clear()
+            reads = [
+                asyncio.create_task(db.table('conversations').select('id').eq('status', "active").order('id').execute())
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.01)
+            reads[0].cancel()
+            result = await asyncio.wait_for(reads[1], timeout=1)
+            assert [row['id'] for row in result.data] == ["conv-3", "conv-4", "conv-5"]
+        finally:
+            _current_loader.reset(token)
+
+    run(scenario())
+
+def test_metrics_require_the_metrics_token(monkeypatch):
+    """/metrics is off without METRICS_TOKEN and otherwise only answers callers holding it"""
+    from fastapi.testclient import TestClient
+    from core.config import settings
+    from main import app
+
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200 and "counters" in response.json()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Purge tests: soft deletes and the background purge worker
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import USER_ID, run, make_db, auth_headers
+
+def test_purge_worker_deletes_in_chunks(engine_name):
+    from core import database
+    from services.purge_worker import PurgeWorker
+
+    async def scenario():
+        db = await make_db(engine_name)
+        database.db = db
+        await db.table('agents').insert([
+            {'id': "agent-1", 'user_id': USER_ID, 'name': "Doomed", 'status': "deleted"},
+            {'id': "agent-2", 'user_id': USER_ID, 'name': "Kept"},
+        ]).execute()
+        await db.table('conversations').insert([
+            {'id': f"conv-{i}", 'user_id': USER_ID, 'agent_id': "agent-1" if i < 5 else "agent-2"} for i in range(6)
+        ]).execute()
+        await db.table('messages').insert([
+            {'id': f"msg-{i}", 'conversation_id': f"conv-{i % 6}", 'role': "user", 'content': "hi"} for i in range(12)
+        ]).execute()
+        await db.table('training_data').insert({'id': "train-1", 'agent_id': "agent-1"}).execute()
+
+        worker = PurgeWorker(chunk_size=2, pause=0)
+        job = await worker.enqueue('agent', "agent-1", USER_ID)
+        # A job another worker renewed recently is left alone
+        await db.table('purge_jobs').update({'status': "running"}).eq('id', job['id']).execute()
+        assert await worker.run_pending() == 0
+        await db.table('purge_jobs').update({'updated_at': "2000-01-01T00:00:00"}).eq('id', job['id']).execute()
+        assert await worker.run_pending() == 1
+
+        finished = await db.table('purge_jobs').select('status,progress').eq('id', job['id']).execute()
+        assert finished.data[0]['status'] == "completed"
+        assert finished.data[0]['progress'] == {'messages': 10, 'conversations': 5, 'training_data': 1, 'agents': 1}
+
+        agents = await db.table('agents').select('id').execute()
+        conversations = await db.table('conversations').select('id').execute()
+        messages = await db.table('messages').select('count').execute()
+        assert [row['id'] for row in agents.data] == ["agent-2"]
+        assert [row['id'] for row in conversations.data] == ["conv-5"]
+        assert messages.data == [{'count': 2}]
+        await db.close()
+        database.db = None
+
+    run(scenario())
+
+def test_delete_returns_immediately_and_purges_later():
+    """Deleting an agent or user hides it at once; the worker removes its data"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+    from services.purge_worker import purge_worker
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+    user_id, headers = auth_headers(client, "leaving@example.com")
+    agent = client.post("/api/v1/agents/", headers=headers, json={"user_id": user_id, "name": "Old", "agent_type": "support"})
+    agent_id = agent.json()["id"]
+    client.post("/api/v1/conversations/", headers=headers, json={"agent_id": agent_id})
+
+    # Only DELETE soft-deletes, since only it queues the purge
+    assert client.put(f"/api/v1/agents/{agent_id}", headers=headers, json={"status": "deleted"}).status_code == 422
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).json()["status"] == "inactive"
+
+    deleted = client.delete(f"/api/v1/agents/{agent_id}", headers=headers)
+    assert deleted.status_code == 202
+    assert client.get(f"/api/v1/agents/{agent_id}", headers=headers).status_code == 404
+    assert client.get("/api/v1/agents/", headers=headers).json() == []
+
+    job_url = f"/api/v1/users/me/purge-jobs/{deleted.json()['purge_job_id']}"
+    assert client.get(job_url, headers=headers).json()["status"] == "pending"
+    run(purge_worker.run_pending())
+    job = client.get(job_url, headers=headers).json()
+    assert job["status"] == "completed" and job["progress"] == {"conversations": 1, "agents": 1}
+
+    # A logged-out token stays revoked after its user is purged
+    login = client.post("/api/v1/auth/login", json={"email": "leaving@example.com", "password": "password123"})
+    assert client.post("/api/v1/auth/logout", headers={"Authorization": f"Bearer {login.json()['access_token']}"}).status_code == 200
+
+    assert client.delete("/api/v1/users/me", headers=headers).status_code == 202
+    login = client.post("/api/v1/auth/login", json={"email": "leaving@example.com", "password": "password123"})
+    assert login.status_code != 200
+    run(purge_worker.run_pending())
+    remaining = run(database.db.table('users').select('id').eq('id', user_id).execute())
+    assert remaining.data == []
+    assert len(run(database.db.table('revoked_tokens').select('id').eq('user_id', user_id).execute()).data) == 1
+    database.db = None
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Rate limit tests
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from testutils import run
+
+def test_login_rate_limits_reject_before_any_work(monkeypatch):
+    """Sliding windows limit attempts per key; excess logins get 429 without a query or hash"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from core.metrics import metrics
+    from core.rate_limit import MemoryWindowStore, RateLimiter, reset_rate_limits
+    from api.v1 import auth
+    from main import app
+
+    async def windows():
+        now = [1000.0]
+        store = MemoryWindowStore(max_keys=2)
+        limiter = RateLimiter("test", 3, window=10, store=store, clock=lambda: now[0])
+        assert [await limiter.hit("a") for _ in range(4)][:3] == [0.0, 0.0, 0.0]
+        assert await limiter.hit("a") > 0
+        now[0] = 1017.0  # 70% into the next window: 5 * 0.3 + 1 <= 3
+        assert await limiter.hit("a") == 0.0
+        now[0] = 1030.0
+        assert await limiter.hit("b") == 0.0 and await limiter.hit("c") == 0.0
+        assert len(store) == 2  # "a" was evicted
+
+    run(windows())
+
+    engine = MemoryEngine()
+    user_reads = []
+    execute = engine.execute
+
+    async def counting_execute(query):
+        if query.table == 'users':
+            user_reads.append(query)
+        return await execute(query)
+
+    engine.execute = counting_execute
+    database.db = Database(engine)
+    monkeypatch.setattr(auth.login_email_limiter, "limit", 2)
+    client = TestClient(app)
+    attempt = {"email": "Limited@example.com", "password": "wrong-password"}
+    assert [client.post("/api/v1/auth/login", json=attempt).status_code for _ in range(2)] == [401, 401]
+    reads, hashes = len(user_reads), metrics.timings["password_pool.run_seconds"].count
+    limited = client.post("/api/v1/auth/login", json={**attempt, "email": "limited@example.com"})
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+    assert len(user_reads) == reads and metrics.timings["password_pool.run_seconds"].count == hashes
+
+    # A successful login clears the email's failures
+    form = {"email": "regular@example.com", "password": "password123", "confirm_password": "password123"}
+    assert client.post("/api/v1/auth/register", json=form).status_code == 201
+    attempt = {"email": "regular@example.com", "password": "password123"}
+    assert [client.post("/api/v1/auth/login", json=attempt).status_code for _ in range(3)] == [200, 200, 200]
+    attempt["password"] = "wrong-password"
+    assert [client.post("/api/v1/auth/login", json=attempt).status_code for _ in range(3)] == [401, 401, 429]
+
+    monkeypatch.setattr(auth.register_email_limiter, "limit", 1)
+    assert client.post("/api/v1/auth/register", json={**form, "email": "Taken@example.com"}).status_code == 201
+    assert client.post("/api/v1/auth/register", json={**form, "email": "taken@example.com"}).status_code == 429
+
+    reset_rate_limits()
+    monkeypatch.setattr(auth.register_ip_limiter, "limit", 1)
+    form = {"email": "new@example.com", "password": "password123", "confirm_password": "password123"}
+    assert client.post("/api/v1/auth/register", json=form).status_code == 201
+    assert client.post("/api/v1/auth/register", json={**form, "email": "other@example.com"}).status_code == 429
+    database.db = None
+
+def test_client_ip_ignores_forwarded_entries_the_client_sent(monkeypatch):
+    """Behind trusted proxies the client IP is the hop they appended, so a spoofed entry can't dodge the limit"""
+    from starlette.requests import Request
+    from core.config import settings
+    from core.rate_limit import client_ip
+
+    def request(forwarded=None):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request({"type": "http", "headers": headers, "client": ("10.0.0.2", 5000)})
+
+    assert client_ip(request("1.2.3.4")) == "10.0.0.2"  # no trusted proxies: the peer address
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 1)
+    assert client_ip(request("1.2.3.4, 203.0.113.9")) == "203.0.113.9"
+    assert client_ip(request("5.6.7.8, 203.0.113.9")) == "203.0.113.9"
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUSTED_PROXIES", 2)
+    assert client_ip(request("1.2.3.4, 203.0.113.9, 10.0.0.1")) == "203.0.113.9"
+    assert client_ip(request("203.0.113.9")) == "203.0.113.9"
+    assert client_ip(request()) == "10.0.0.2"
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Storage tests: the memory, SQLite and Postgres engines must answer the
+router queries identically; procedures, projections and the hosted schema
+"""
+
+import os
+import sys
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from core.database import Database
+from core.engines.base import DatabaseError, NotFoundError
+from core.engines.memory import MemoryEngine
+from testutils import USER_ID, OTHER_USER_ID, run, make_db, seed
+
+def test_select_filters_order_range(engine_name):
+    async def scenario():
+        db = await make_db(engine_name)
+        await seed(db)
+
+        result = await db.table('conversations').select('*').eq('user_id', USER_ID).gte(
+            'created_at', "2025-01-02T00:00:00"
+        ).order('updated_at', desc=True).range(0, 1).execute()
+
+        assert [row['id'] for row in result.data] == ["conv-4", "conv-3"]
+        assert result.data[0]['metadata'] == {"day": 4}
+        assert result.data[0]['title'] == "New Conversation"
+
+        projected = await db.table('conversations').select('id,status').in_(
+            'id', ["conv-1", "conv-2", "missing"]
+        ).order('id').execute()
+        assert projected.data == [
+            {'id': "conv-1", 'status': "completed"},
+            {'id': "conv-2", 'status': "completed"},
+        ]
+
+        counted = await db.table('conversations').select('id', count="exact").eq('agent_id', "agent-1").range(0, 0).execute()
+        assert counted.count == 3
+        assert len(counted.data) == 1
+        await db.close()
+
+    run(scenario())
+
+def test_keyset_filter(engine_name):
+    async def scenario():
+        db = await make_db(engine_name)
+        await seed(db)
+        # Two rows share an updated_at so the id tiebreaker matters
+        await db.table('conversations').update({'updated_at': "2025-01-03T12:00:00"}).eq('id', "conv-2").execute()
+
+        pages, after = [], None
+        while True:
+            query = db.table('conversations').select('id,updated_at').eq('user_id', USER_ID)
+            if after:
+                query = query.after(['updated_at', 'id'], after, desc=True)
+            result = await query.order('updated_at', desc=True).order('id', desc=True).limit(2).execute()
+            if not result.data:
+                break
+            pages.append([row['id'] for row in result.data])
+            after = [result.data[-1]['updated_at'], result.data[-1]['id']]
+
+        assert pages == [["conv-4", "conv-3"], ["conv-2", "conv-1"]]
+
+        ascending = await db.table('conversations').select('id').after(
+            ['updated_at', 'id'], ["2025-01-03T12:00:00", "conv-2"]
+        ).order('updated_at').order('id').execute()
+        assert [row['id'] for row in ascending.data] == ["conv-3", "conv-4", "conv-5"]
+        await db.close()
+
+    run(scenario())
+
+def test_insert_update_delete(engine_name):
+    async def scenario():
+        db = await make_db(engine_name)
+
+        created = await db.table('users').insert({'id': USER_ID, 'email': "a@example.com"}).execute()
+        assert created.data[0]['is_active'] is True
+        assert created.data[0]['last_login'] is None
+
+        updated = await db.table('users').update({'last_login': "2025-01-01T00:00:00"}).eq('id', USER_ID).execute()
+        assert updated.data[0]['last_login'] == "2025-01-01T00:00:00"
+        assert updated.data[0]['email'] == "a@example.com"
+
+        with pytest.raises(DatabaseError):
+            await db.table('users').update({'not_a_column': 1}).eq('id', USER_ID).execute()
+
+        deleted = await db.table('users').delete().eq('id', USER_ID).execute()
+        assert len(deleted.data) == 1
+        remaining = await db.table('users').select('count').execute()
+        assert remaining.data == [{'count': 0}]
+        await db.close()
+
+    run(scenario())
+
+def test_record_chat_turn_procedure(engine_name):
+    async def scenario():
+        db = await make_db(engine_name)
+        await db.table('agents').insert({'id': "agent-1", 'user_id': USER_ID, 'name': "Helper"}).execute()
+
+        turn = {
+            'id': "conv-1",
+            'user_id': USER_ID,
+            'agent_id': "agent-1",
+            'metadata': {"source": "test"},
+            'message': "hi",
+            'response': "hello",
+            'status': "completed",
+            'created_at': "2025-01-01T00:00:00",
+            'updated_at': "2025-01-01T00:00:01",
+        }
+        recorded = await db.rpc('record_chat_turn', {'p_turn': turn}).execute()
+        assert recorded.data[0]['id'] == "conv-1"
+        assert recorded.data[0]['response'] == "hello"
+        assert recorded.data[0]['metadata'] == {"source": "test"}
+        # Columns the turn leaves out keep their defaults
+        assert recorded.data[0]['title'] == "New Conversation" and recorded.data[0]['cost'] == 0.0
+
+        with pytest.raises(NotFoundError):
+            await db.rpc('record_chat_turn', {'p_turn': {**turn, 'id': "conv-2", 'user_id': OTHER_USER_ID}}).execute()
+        with pytest.raises(DatabaseError):
+            await db.rpc('not_a_procedure', {}).execute()
+        # A failed insert undoes the counter bump before it
+        with pytest.raises(DatabaseError):
+            await db.rpc('record_chat_turn', {'p_turn': turn}).execute()
+
+        stored = await db.table('conversations').select('id,status').execute()
+        assert stored.data == [{'id': "conv-1", 'status': "completed"}]
+        counters = await db.table('agents').select('total_conversations,completed_conversations,last_active').execute()
+        assert counters.data == [{'total_conversations': 1, 'completed_conversations': 1, 'last_active': "2025-01-01T00:00:01"}]
+        await db.close()
+
+    run(scenario())
+
+def test_api_round_trip_on_memory_engine():
+    """Register, log in and create an agent with no external services"""
+    from fastapi.testclient import TestClient
+    from core import database
+    from main import app
+
+    database.db = Database(MemoryEngine())
+    client = TestClient(app)
+
+    user = client.post("/api/v1/auth/register", json={
+        "email": "owner@example.com",
+        "password": "password123",
+        "confirm_password": "password123",
+    })
+    assert user.status_code == 201
+
+    login = client.post("/api/v1/auth/login", json={"email": "owner@example.com", "password": "password123"})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    agent = client.post("/api/v1/agents/", headers=headers, json={
+        "user_id": user.json()["id"],
+        "name": "Support Bot",
+        "agent_type": "support",
+    })
+    assert agent.status_code == 201
+
+    agents = client.get("/api/v1/agents/", headers=headers)
+    assert [a["name"] for a in agents.json()] == ["Support Bot"]
+    assert agents.headers["x-db-round-trips-saved"] == "0"
+    database.db = None
+
+def test_projection_from_model_and_fields():
+    """Projections keep stored model fields in table order and reject unknown columns"""
+    from core.projections import project
+    from models.conversation import ChatMessage
+
+    assert project('messages', ChatMessage) == "role,content,metadata,timestamp"
+    assert project('messages', ChatMessage, fields=['id']) == "id,role,content,metadata,timestamp"
+    assert project('conversations', fields=['created_at', 'status']) == "status,created_at"
+    with pytest.raises(ValueError):
+        project('conversations', fields=['not_a_column'])
+
+def test_schema_status_checks_allow_every_status():
+    """The hosted schema's status CHECKs accept every status the API writes"""
+    import re
+    from models.agent import AgentStatus
+    from models.conversation import ConversationStatus
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "database_schema.sql")) as schema_file:
+        schema = schema_file.read()
+
+    def allowed(table):
+        definition = re.search(rf"CREATE TABLE IF NOT EXISTS {table} \((.*?)\n\);", schema, re.S).group(1)
+        values = re.search(r"\bstatus VARCHAR\(50\)[^\n]*CHECK \(status IN \(([^)]*)\)\)", definition).group(1)
+        return set(re.findall(r"'(\w+)'", values))
+
+    assert {status.value for status in ConversationStatus} <= allowed("conversations")
+    assert {status.value for status in AgentStatus} <= allowed("agents")
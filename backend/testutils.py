@@ -0,0 +1,62 @@
+"""
+Helpers shared by the test modules
+"""
+
+import asyncio
+import os
+import uuid
+
+from core.database import Database
+from core.engines.memory import MemoryEngine
+from core.engines.sqlite import SQLiteEngine
+from core.engines.postgres import PostgresEngine
+from core.tables import TABLES
+
+# Set to a throwaway database to include the Postgres engine, e.g.
+# TEST_DATABASE_URL=postgresql://postgres@localhost:5432/agent_synergy_test
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+USER_ID = str(uuid.uuid4())
+OTHER_USER_ID = str(uuid.uuid4())
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def make_db(engine_name: str) -> Database:
+    if engine_name == "memory":
+        engine = MemoryEngine()
+    elif engine_name == "sqlite":
+        engine = SQLiteEngine(":memory:")
+    else:
+        engine = PostgresEngine(TEST_DATABASE_URL, create_tables=True)
+    await engine.connect()
+
+    if engine_name == "postgres":
+        async with engine.pool.acquire() as connection:
+            await connection.execute(f"TRUNCATE {', '.join(TABLES)}")
+    return Database(engine)
+
+async def seed(db: Database):
+    rows = []
+    for day in range(1, 6):
+        rows.append({
+            'id': f"conv-{day}",
+            'user_id': USER_ID if day != 5 else OTHER_USER_ID,
+            'agent_id': "agent-1" if day % 2 else "agent-2",
+            'status': "completed" if day < 3 else "active",
+            'metadata': {"day": day},
+            'cost': day * 0.5,
+            'created_at': f"2025-01-0{day}T00:00:00",
+            'updated_at': f"2025-01-0{day}T12:00:00",
+        })
+    await db.table('conversations').insert(rows).execute()
+
+def auth_headers(client, email: str):
+    """Register and log in a user on the test client"""
+    user = client.post("/api/v1/auth/register", json={
+        "email": email,
+        "password": "password123",
+        "confirm_password": "password123",
+    })
+    login = client.post("/api/v1/auth/login", json={"email": email, "password": "password123"})
+    return user.json()["id"], {"Authorization": f"Bearer {login.json()['access_token']}"}